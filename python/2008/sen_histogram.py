@@ -15,6 +15,10 @@
 # You may use or modify this software, but only for noncommericial purposes.
 # To seek a commercial-use license, contact sswang@princeton.edu
 #
+# Each line of Sen_histogram.csv holds a number of Democratic seats and its
+# probability, as written by senate.py, and the bars are drawn at those
+# numbers of seats.
+#
 # Update History:
 #    Nov  2, 2008 -- Initial version 
 #
@@ -27,11 +31,14 @@ matplotlib.use('Agg')
 from pylab import *
 
 hfile = open("../matlab/Sen_histogram.csv")
+seats = array([], dtype=int)
 sen_dist = array([])
 
 for line in hfile:
+	(seat, prob) = line[:-1].split(",")
+	seats = append(seats, int(seat))
 	try:
-		sen_dist = append(sen_dist, float(line[:-1]))
+		sen_dist = append(sen_dist, float(prob))
 	except ValueError:
 		sen_dist = append(sen_dist, float(0.0))
 
@@ -39,6 +46,8 @@ hfile.close()
 
 assert len(sen_dist) == 7 
 sen_dist_max = max(sen_dist)
+first_seat = seats[0]
+last_seat = seats[-1]
 
 ############################################################################
 #
@@ -49,14 +58,14 @@ sen_dist_max = max(sen_dist)
 
 subplot(111, axisbelow=True)
 
-bar(arange(56, 63), sen_dist, 1.0, edgecolor='none')
+bar(seats, sen_dist, 1.0, edgecolor='none')
 
 # Draw a red line at 60 seats 
 plot((60, 60), (0, sen_dist_max * 1.05), '-r', linewidth=1.5)
 
-xlim(56, 63)
+xlim(first_seat, last_seat + 1)
 ylim(0, sen_dist_max * 1.05)
-xticks(arange(56.5, 63.5, 1), arange(56, 63, 1), fontsize=22)
+xticks(seats + 0.5, seats, fontsize=22)
 
 grid(color='#aaaaaa')
 
@@ -68,7 +77,7 @@ label_begins = 4
 label_ends = 6 
 max_height_under_label = max(sen_dist[label_begins:label_ends])
 
-text(float(56.5) + label_begins, sen_dist_max * float(0.05)
+text(float(first_seat + 0.5) + label_begins, sen_dist_max * float(0.05)
 		+ max_height_under_label, time.strftime("%d-%b\n%I:%M%p %Z"),
 		fontsize=21)
 
@@ -85,14 +94,14 @@ clf()
 
 subplot(111, axisbelow=True)
 
-bar(arange(56, 63), sen_dist, 1.0, edgecolor='none')
+bar(seats, sen_dist, 1.0, edgecolor='none')
 
 # Draw a red line at 60 seats
 plot((60, 60), (0, sen_dist_max * 1.05), '-r', linewidth=1.5)
 
-xlim(56, 63)
+xlim(first_seat, last_seat + 1)
 ylim(0, sen_dist_max * 1.05)
-xticks(arange(56.5, 63.5, 1), arange(56, 63, 1), fontsize=16)
+xticks(seats + 0.5, seats, fontsize=16)
 
 grid(color='#aaaaaa')
 
@@ -104,10 +113,10 @@ label_begins = 4
 label_ends = 6 
 max_height_under_label = max(sen_dist[label_begins:label_ends])
 
-text(float(56.5) + label_begins, sen_dist_max * float(0.10)
+text(float(first_seat + 0.5) + label_begins, sen_dist_max * float(0.10)
 		+ max_height_under_label, time.strftime("%d-%b %I:%M%p %Z"),
 		fontsize=14)
-text(float(56.5) + label_begins, sen_dist_max * float(0.04) 
+text(float(first_seat + 0.5) + label_begins, sen_dist_max * float(0.04) 
 		+ max_height_under_label, 'election.princeton.edu', fontsize=14)
 
 show()
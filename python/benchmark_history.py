@@ -0,0 +1,246 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script checks and times the poll history generation of
+# update_polls.py, which sweeps forward through each state's polls once,
+# against the original generation it replaced, which filters and cleans
+# each state's polls from scratch for each day. Both write the median
+# statistics of a synthetic campaign, and the two outputs must be
+# identical.
+#
+# Usage: benchmark_history.py [--polls N] [--mean]
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import sys, datetime, time, optparse, cStringIO
+from numpy import *
+from update_polls import state_names, state_polls, prev_outcome
+from update_polls import store_prev_outcome, select_working_subset
+from update_polls import compute_history, format_cell
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+midtype = "median"
+# The estimator written by both generations, "median" or "mean"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    global midtype
+
+    parser = optparse.OptionParser()
+    parser.add_option("--polls", type="int", metavar="N", default=20000,
+                      help="number of polls in the synthetic campaign "
+                      "(default: %default)")
+    parser.add_option("--mean", action="store_true", default=False,
+                      help="average the polls with the mean, not the median")
+    (options, args) = parser.parse_args()
+
+    if options.mean:
+        midtype = "mean"
+
+    if not benchmark_history(options.polls):
+        sys.exit(1)
+
+
+# Times write_history against write_history_by_day on a synthetic campaign,
+# and returns whether they write the same output
+
+def benchmark_history(num_polls):
+    rand = random.RandomState(2012)
+    election = datetime.date(2012, 11, 6)
+    days = []
+    day = election
+    while day >= datetime.date(2012, 5, 22):
+        days.append(day)
+        day = day - datetime.timedelta(1, 0, 0)
+
+    pollsters = map(lambda x: "Pollster %d" % x, range(40))
+    states = state_names.keys()
+    for state in states:
+        state_polls[state] = []
+    store_prev_outcome()
+
+    for i in xrange(num_polls):
+        start_date = datetime.date(2012, 5, 1) + \
+                     datetime.timedelta(int(rand.randint(186)), 0, 0)
+        end_date = start_date + datetime.timedelta(int(rand.randint(7)), 0, 0)
+        mid_date = start_date + ((end_date - start_date) / 2)
+        state_polls[states[rand.randint(len(states))]].append((
+            int(rand.randint(-20, 21)), start_date, end_date, mid_date,
+            int(rand.randint(300, 3001)),
+            pollsters[rand.randint(len(pollsters))]))
+
+    outputs = {}
+    for (name, writer) in (("by day", write_history_by_day),
+                           ("sweep", write_history)):
+        buf = cStringIO.StringIO()
+        start = time.time()
+        writer(buf, days)
+        elapsed = time.time() - start
+        outputs[name] = buf.getvalue()
+        print "%-8s %8.3fs for %d polls over %d days" % (name, elapsed,
+                                                         num_polls, len(days))
+
+    if outputs["by day"] == outputs["sweep"]:
+        print "Both produced identical output"
+        return True
+    else:
+        print "MISMATCH between sweep and per-day output"
+        return False
+
+
+# Writes the 51 lines of midtype output statistics for each of the given
+# days with the sweep of update_polls.py
+
+def write_history(pfile, days):
+    states = sorted(state_names, key=lambda x: state_names[x])
+    columns = compute_history(days, [midtype])
+
+    for day in days:
+        for state in states:
+            cell = columns[state]["cells"][midtype][day.toordinal()]
+            pfile.write(format_cell(cell))
+
+
+############################################################################
+#
+# The original history generation
+#
+############################################################################
+
+# Writes the same statistics as write_history, filtering and cleaning each
+# state's polls from scratch for each day
+
+def write_history_by_day(pfile, days):
+    # Make sure the polls are sorted with most recent first
+    for state in state_polls.keys():
+        polls = state_polls[state]
+        polls.sort(key=lambda x: x[2], reverse=True)
+
+    for day in days:
+        for state in sorted(state_names, key=lambda x: state_names[x]):
+            polls = state_polls[state]
+
+            # Remember, the format of the tuple for each list:
+            # (margin, start date, end date, mid date, pop, polling org)
+            polls_ended_before_day = filter(lambda x: x[2] < day, polls)
+
+            #  reject two polls by the same pollster if their
+            # [startdate,enddate] intervals overlap (i.e. if older
+            # enddate>=newer startdate).
+            cleaned_polls = drop_overlapping_polls(polls_ended_before_day)
+
+            if len(cleaned_polls) == 0:
+                cleaned_polls = [ prev_outcome[state] ]
+
+            write_statistics(pfile, cleaned_polls)
+            pfile.write("%s\n" % int(day.strftime("%j")))
+
+
+def write_statistics(pfile, polls):
+    (working_subset, oldest_mid_date) = select_working_subset(polls)
+    num = len(working_subset)
+
+    pfile.write("%s " % num)
+    pfile.write("%s " % int(oldest_mid_date.strftime("%j")))
+
+    if num == 1:
+        pfile.write("%s " % working_subset[0][0])
+        pfile.write("%s " % sqrt(1.0/working_subset[0][4]))
+    elif num == 2:
+        pfile.write("%s %s " % get_two_statistics(working_subset))
+    else:
+        pfile.write("%s %s " % get_statistics(working_subset))
+
+
+def drop_overlapping_polls(polls):
+    if len(polls) <= 1:
+        return polls
+
+    cleaned_polls = []
+
+    # sort by: pollster, start date (old to new), end date (old to new)
+    by_pollster = sorted(polls, key=lambda x: (x[5], x[1], x[2]))
+
+    prev_pollster = by_pollster[0][5]
+    prev_start    = by_pollster[0][1]
+    prev_end      = by_pollster[0][2]
+    prev_poll     = by_pollster[0]
+    cleaned_polls.append(by_pollster[0])
+
+    for poll in by_pollster[1:]:
+        if prev_pollster != poll[5]:
+            prev_pollster = poll[5]
+        else:
+            if prev_end > poll[1]:
+                cleaned_polls.pop()
+
+        prev_start    = poll[1]
+        prev_end      = poll[2]
+        prev_poll     = poll
+        cleaned_polls.append(poll)
+
+    # write_statistics expects polls to be sorted from newest to oldest
+    # by mid-date
+    cleaned_polls.sort(key=lambda x: x[3], reverse=True)
+    return cleaned_polls
+
+
+# Returns the median (or mean) and std. error of three or more polls, as
+# described in update_polls.py
+
+def get_statistics(set):
+    [margins, sdates, edates, mdates, pop, poll_orgs] = zip(*set)
+    set = array(margins)
+
+    num = set.size
+    assert num >= 3
+
+    if midtype == "median":
+        median_margin = median(set)
+        mad = median(abs(set - median_margin))
+        sem_est = mad/0.6745/sqrt(num)
+
+        return (median_margin, sem_est)
+
+    else:
+        assert midtype == "mean"
+
+        mean_margin = mean(set)
+        sem = std(set) / sqrt(num)
+
+        return (mean_margin, sem)
+
+# Special case for when only two polls are available
+
+def get_two_statistics(set):
+    [margins, sdates, edates, mdates, pop, poll_args] = zip(*set)
+    set = array(margins)
+
+    assert set.size == 2
+
+    mean_margin = mean(set)
+    sem = max(std(set) / sqrt(set.size), 3)
+
+    return (mean_margin, sem)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script estimates the EV distribution by Monte Carlo simulation,
+# without EV_median.m's assumption that the states' outcomes are
+# independent. Each simulated election draws a national swing, a swing for
+# each region and an error for each state, and the state's margin is
+#
+#    margin + SEM (sqrt(national_share) national
+#                  + sqrt(regional_share) regional
+#                  + sqrt(1 - national_share - regional_share) state)
+#
+# where the three errors are standard normals. Each state's margin thus
+# has the same normal distribution as in EV_median.m, and so the same win
+# probability, but the states move together: any two states are correlated
+# by national_share, or by national_share + regional_share in the same
+# region. The distribution of the EV is wider as a result.
+#
+# The simulations are run in chunks of chunk_size, so that memory use does
+# not grow with the number of simulations, and the chunks are spread over a
+# pool of processes. Only the count of each EV outcome and of each state's
+# wins is kept. All of the chunks are handed to the pool at once, and the
+# counts of each are added in the order of the chunks as they arrive. Each
+# chunk has its own seed, so the results do not depend on the number of
+# processes. After every check_chunks chunks, the cumulative distribution
+# is compared with the one at the previous check, and the simulation stops
+# early, and the pool with it, once it moves by less than
+# convergence_tolerance.
+#
+# It writes the same files as ev_estimator.py, with _correlated added to
+# their names: EV_estimates_correlated.csv, EV_histogram_correlated.csv and
+# stateprobs_correlated.csv. The meta-margin is not calculated, and is
+# written as -999, as ev_estimator.py --no-metamargin writes it.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import time, optparse, itertools, multiprocessing
+from numpy import *
+import ev_estimator
+from ev_estimator import state_abbrevs, state_evs, num_states, total_evs
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+# Census regions
+regions = {
+    "Northeast": ["CT", "ME", "MA", "NH", "NJ", "NY", "PA", "RI", "VT"],
+    "Midwest": ["IL", "IN", "IA", "KS", "MI", "MN", "MO", "NE", "ND", "OH",
+                "SD", "WI"],
+    "South": ["AL", "AR", "DE", "DC", "FL", "GA", "KY", "LA", "MD", "MS",
+              "NC", "OK", "SC", "TN", "TX", "VA", "WV"],
+    "West": ["AK", "AZ", "CA", "CO", "HI", "ID", "MT", "NV", "NM", "OR",
+             "UT", "WA", "WY"],
+}
+region_names = sorted(regions.keys())
+
+# The region of each state, as an index into region_names
+state_regions = zeros(num_states, dtype=int)
+for (r, name) in enumerate(region_names):
+    for abbrev in regions[name]:
+        state_regions[state_abbrevs.index(abbrev)] = r
+assert sum(map(len, regions.values())) == num_states
+
+# Shares of each state's variance which are national and regional
+national_share = 0.3
+regional_share = 0.1
+
+num_simulations = 10000000
+chunk_size = 50000
+check_chunks = 10
+convergence_tolerance = 0.0005
+seed = 2012
+# The simulation stops after num_simulations, or once the cumulative
+# distribution moves by less than convergence_tolerance over check_chunks
+# chunks
+
+estimates_filename = "EV_estimates_correlated.csv"
+histogram_filename = "EV_histogram_correlated.csv"
+stateprobs_filename = "stateprobs_correlated.csv"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    global national_share, regional_share, chunk_size
+
+    parser = optparse.OptionParser()
+    parser.add_option("--polls", metavar="FILE",
+                      default=ev_estimator.polls_filename,
+                      help="summary statistics to read, either text or a "
+                      "pollsfile.py binary file (default: %default)")
+    parser.add_option("--analysisdate", type="int", metavar="DAY", default=0,
+                      help="day of the year to analyze (default: the newest)")
+    parser.add_option("--bias", type="float", metavar="PCT", default=0.0,
+                      help="add PCT points to the margin of every state")
+    parser.add_option("--simulations", type="int", metavar="N",
+                      default=num_simulations,
+                      help="run at most N simulations (default: %default)")
+    parser.add_option("--national", type="float", metavar="SHARE",
+                      default=national_share,
+                      help="share of each state's variance which is national "
+                      "(default: %default)")
+    parser.add_option("--regional", type="float", metavar="SHARE",
+                      default=regional_share,
+                      help="share of each state's variance which is regional "
+                      "(default: %default)")
+    parser.add_option("--chunk-size", type="int", metavar="N",
+                      default=chunk_size,
+                      help="simulations per chunk (default: %default)")
+    parser.add_option("--processes", type="int", metavar="N", default=0,
+                      help="number of processes (default: one per CPU)")
+    parser.add_option("--seed", type="int", default=seed,
+                      help="random seed (default: %default)")
+    (options, args) = parser.parse_args()
+
+    if options.national < 0 or options.regional < 0 or \
+       options.national + options.regional > 1:
+        parser.error("the national and regional shares must be non-negative "
+                     "and add up to at most 1")
+
+    national_share = options.national
+    regional_share = options.regional
+    chunk_size = options.chunk_size
+
+    polldata = ev_estimator.load_polldata(options.polls, options.analysisdate)
+    (margins, sems) = ev_estimator.polldata_margins(polldata)
+
+    start = time.time()
+    result = simulate(margins, sems, options.bias, options.simulations,
+                      options.processes or None, options.seed)
+    print "%d simulations in %.2fs" % (result["simulations"],
+                                       time.time() - start)
+    if result["converged"]:
+        print "Converged: the cumulative distribution moved by %g" % \
+              result["change"]
+    else:
+        print "Not converged: the cumulative distribution moved by %g" % \
+              result["change"]
+
+    estimate = correlated_estimate(polldata, result, options.bias)
+    write_correlated_estimate(estimate)
+
+
+############################################################################
+#
+# The simulation
+#
+############################################################################
+
+# Returns the number of simulations in chunk i of num_simulations
+
+def chunk_length(i, simulations):
+    return min(chunk_size, simulations - i * chunk_size)
+
+
+# Runs one chunk of simulations. Returns the chunk's number, and the count
+# of each number of EV for the Democrat, from 0 to 538, and of each state's
+# Democratic wins.
+
+def simulate_chunk(args):
+    (margins, sems, bias, shares, length, chunk_seed) = args
+    (national, regional) = shares
+    state = 1 - national - regional
+
+    random_state = random.RandomState(chunk_seed)
+    national_errors = random_state.standard_normal((length, 1))
+    regional_errors = random_state.standard_normal((length, len(region_names)))
+    errors = random_state.standard_normal((length, num_states))
+
+    # errors becomes the error of each state in units of its SEM
+    errors *= sqrt(state)
+    errors += sqrt(regional) * regional_errors[:, state_regions]
+    errors += sqrt(national) * national_errors
+
+    wins = errors > -(margins + bias) / sems
+    dem_evs = dot(wins, state_evs)
+
+    return (chunk_seed[1], bincount(dem_evs, minlength=total_evs + 1),
+            sum(wins, axis=0))
+
+
+# Runs up to simulations simulations, in chunks on a pool of processes
+# (or in this process, if processes is 1). Returns the counts of the EV
+# outcomes and the state wins, the number of simulations run, and whether
+# the simulation converged.
+
+def simulate(margins, sems, bias=0.0, simulations=num_simulations,
+             processes=None, seed=seed):
+    num_chunks = (simulations + chunk_size - 1) / chunk_size
+    shares = (national_share, regional_share)
+
+    def chunk_args(i):
+        return (margins, sems, bias, shares, chunk_length(i, simulations),
+                [seed, i])
+
+    if processes == 1:
+        pool = None
+        imap = itertools.imap
+    else:
+        pool = multiprocessing.Pool(processes)
+        imap = pool.imap_unordered
+
+    ev_counts = zeros(total_evs + 1, dtype=int64)
+    win_counts = zeros(num_states, dtype=int64)
+    done = 0
+    previous = None
+    change = inf
+    converged = False
+
+    # Chunks which have arrived ahead of an earlier one wait in arrived, so
+    # that the checks always see the same chunks
+    arrived = {}
+    added = 0
+
+    try:
+        results = imap(simulate_chunk,
+                       itertools.imap(chunk_args, xrange(num_chunks)))
+        for (i, evs, wins) in results:
+            arrived[i] = (evs, wins)
+
+            while added in arrived and not converged:
+                (evs, wins) = arrived.pop(added)
+                ev_counts += evs
+                win_counts += wins
+                added += 1
+                done = min(added * chunk_size, simulations)
+
+                if added % check_chunks != 0 and added != num_chunks:
+                    continue
+
+                cumulative_prob = cumsum(ev_counts) / float(done)
+                if previous is not None:
+                    change = abs(cumulative_prob - previous).max()
+                    if change < convergence_tolerance:
+                        converged = True
+                previous = cumulative_prob
+
+            if converged:
+                break
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    return {"ev_counts": ev_counts, "win_counts": win_counts,
+            "simulations": done, "converged": converged, "change": change}
+
+
+############################################################################
+#
+# The estimates
+#
+############################################################################
+
+# Returns the estimate from the simulation, with the same entries as
+# ev_estimator.run_estimator returns
+
+def correlated_estimate(polldata, result, bias=0.0):
+    simulations = float(result["simulations"])
+    (margins, sems) = ev_estimator.polldata_margins(polldata)
+
+    # The histogram leaves out 0 EV for the Democrat, as EV_median.m's does
+    histogram = result["ev_counts"][1:] / simulations
+    estimate = ev_estimator.histogram_summaries(histogram[newaxis])
+    for key in estimate:
+        estimate[key] = estimate[key][0]
+
+    probs = result["win_counts"] / simulations
+    stateprobs = ev_estimator.matlab_round(probs * 100)
+    dem_ev = sum(where(stateprobs >= 95, state_evs, 0))
+    gop_ev = sum(where(stateprobs <= 5, state_evs, 0))
+
+    # assume DC has no polls
+    totalpollsused = sum(polldata[:, 0]) - 1
+
+    estimate.update({"bias": bias, "margins": margins, "sems": sems,
+                     "probs": probs, "stateprobs": stateprobs,
+                     "histogram": histogram, "metamargin": -999})
+    estimate["outputs"] = [estimate["median"], total_evs - estimate["median"],
+                           estimate["mode"], total_evs - estimate["mode"],
+                           dem_ev, gop_ev, total_evs - dem_ev - gop_ev] + \
+                          list(estimate["confidenceintervals"]) + \
+                          [totalpollsused, estimate["metamargin"]]
+    return estimate
+
+
+def write_correlated_estimate(estimate):
+    dlm_format = ev_estimator.dlm_format
+
+    f = open(estimates_filename, "w")
+    f.write(",".join(map(dlm_format, estimate["outputs"])) + "\n")
+    f.close()
+
+    f = open(histogram_filename, "w")
+    for p in estimate["histogram"]:
+        f.write(dlm_format(p) + "\n")
+    f.close()
+
+    ev_estimator.write_stateprobs(estimate, stateprobs_filename)
+
+
+if __name__ == '__main__':
+    main()
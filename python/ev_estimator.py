@@ -0,0 +1,676 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script is a NumPy port of EV_estimator.m and EV_median.m. From the
+# summary statistics in polls.median.txt (or polls.median.bin) for a single
+# day, it calculates the exact probability distribution of the electoral
+# votes, the median and mode EV, the confidence bands, the assigned EV, the
+# state-by-state win probabilities and the meta-margin, and writes the same
+# files as the MATLAB scripts:
+#
+#    EV_estimates.csv         - the 13 outputs on one line
+#    EV_histogram.csv         - probability of each EV outcome for Obama
+#    stateprobs.csv           - win probability, margin, D+2 and R+2
+#                               probabilities and abbreviation of each state
+#    EV_estimate_history.csv  - the date followed by the 13 outputs, appended
+#
+# With --history, it instead rebuilds EV_estimate_history.csv from every day
+# in the file at once, in place of regenerate-history.sh running MATLAB
+# once for each day.
+#
+# With --sweep, it instead evaluates a grid of uniform swings (biases) of
+# every state's margin in one batched pass, for what-if displays such as a
+# swing slider, and writes:
+#
+#    EV_bias_sweep.csv        - for each bias: the median EV, the
+#                               confidence bands, the probability of a
+#                               Dem win, and each state's probability
+#    EV_bias_histograms.csv   - for each bias: the EV histogram, in parts
+#                               per million
+#
+# The calculations follow the MATLAB scripts step for step, so the outputs
+# agree with theirs to floating point tolerance, except that the meta-margin
+# is found by bisection rather than by scanning (see metamargin_solve).
+# Numbers are written as dlmwrite and num2str write them.
+#
+# With --engine mixture, the states' errors are instead correlated through
+# a national swing, which is integrated out by Gauss-Hermite quadrature (see
+# mixture_distributions). The same files are written, the meta-margin
+# included.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, sys, math, optparse
+from numpy import *
+from numpy.polynomial.hermite_e import hermegauss
+import pollsfile, ev_tree
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+# The states in the order of the MATLAB scripts (and of polls.median.txt)
+state_abbrevs = ["AL", "AK", "AZ", "AR", "CA", "CO", "CT", "DC", "DE", "FL",
+    "GA", "HI", "ID", "IL", "IN", "IA", "KS", "KY", "LA", "ME", "MD", "MA",
+    "MI", "MN", "MS", "MO", "MT", "NE", "NV", "NH", "NJ", "NM", "NY", "NC",
+    "ND", "OH", "OK", "OR", "PA", "RI", "SC", "SD", "TN", "TX", "UT", "VT",
+    "VA", "WA", "WV", "WI", "WY"]
+state_evs = array([9, 3, 11, 6, 55, 9, 7, 3, 3, 29, 16, 4, 4, 20, 11, 6, 6, 8,
+    8, 4, 10, 11, 16, 10, 6, 10, 3, 5, 6, 4, 14, 5, 29, 15, 3, 18, 7, 7, 20, 4,
+    9, 3, 11, 38, 6, 3, 13, 12, 5, 10, 3])
+num_states = len(state_evs)
+total_evs = 538
+assert sum(state_evs) == total_evs
+
+# The effective SEM of each state is at least this many points
+min_sem = 2
+
+metamargin_method = "solve"
+metamargin_tolerance = 0.001
+metamargin_bracket_step = 0.5
+# The meta-margin is found by bracketing the tie and bisecting down to
+# metamargin_tolerance, or with "scan", by the 0.02-step scan of
+# EV_estimator.m. The bracket starts metamargin_bracket_step wide and
+# doubles in width each time it is moved.
+
+tree_cache_filename = "EV_tree.cache"
+# With --tree, the EV distribution is kept in the tree of partial products
+# of ev_tree.py, cached in tree_cache_filename, and only the states whose
+# probabilities changed since the last run are recomputed
+
+engine = "exact"
+mixture_national_share = 0.3
+mixture_nodes = 20
+# With the "mixture" engine, mixture_national_share of each state's
+# variance is a national swing shared by all of the states, and the EV
+# distribution is averaged over mixture_nodes quadrature points of the swing
+
+sweep_low = -8.0
+sweep_high = 8.0
+sweep_steps_per_point = 10
+# The bias sweep runs from sweep_low to sweep_high points in steps of
+# 1 / sweep_steps_per_point
+
+polls_filename = "polls.median.txt"
+estimates_filename = "EV_estimates.csv"
+histogram_filename = "EV_histogram.csv"
+stateprobs_filename = "stateprobs.csv"
+history_filename = "EV_estimate_history.csv"
+sweep_filename = "EV_bias_sweep.csv"
+sweep_histograms_filename = "EV_bias_histograms.csv"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    global metamargin_method, metamargin_tolerance, engine
+    global mixture_national_share
+
+    parser = optparse.OptionParser()
+    parser.add_option("--polls", metavar="FILE", default=polls_filename,
+                      help="summary statistics to read, either text or a "
+                      "pollsfile.py binary file (default: %default)")
+    parser.add_option("--analysisdate", type="int", metavar="DAY", default=0,
+                      help="day of the year to analyze (default: the newest)")
+    parser.add_option("--bias", type="float", metavar="PCT", default=0.0,
+                      help="add PCT points to the margin of every state")
+    parser.add_option("--no-metamargin", action="store_true", default=False,
+                      help="do not calculate the meta-margin")
+    parser.add_option("--scan", action="store_true", default=False,
+                      help="find the meta-margin with the 0.02-step scan of "
+                      "EV_estimator.m")
+    parser.add_option("--tolerance", type="float", metavar="PCT",
+                      default=metamargin_tolerance,
+                      help="find the meta-margin to within PCT points "
+                      "(default: %default)")
+    parser.add_option("--history", action="store_true", default=False,
+                      help="rebuild %s from every day in the file" %
+                      history_filename)
+    parser.add_option("--engine", type="choice", default=engine,
+                      choices=["exact", "mixture"],
+                      help="calculate the EV distribution assuming the "
+                      "states are independent (exact), or correlated by a "
+                      "national swing (mixture) (default: %default)")
+    parser.add_option("--national-share", type="float", metavar="SHARE",
+                      default=mixture_national_share,
+                      help="with --engine mixture, the share of each "
+                      "state's variance which is national (default: "
+                      "%default)")
+    parser.add_option("--tree", action="store_true", default=False,
+                      help="update the cached tree of partial products "
+                      "instead of recomputing the EV distribution")
+    parser.add_option("--verify-tree", action="store_true", default=False,
+                      help="with --tree, check the distribution against a "
+                      "full recompute")
+    parser.add_option("--sweep", action="store_true", default=False,
+                      help="write the EV distribution for each bias from "
+                      "%g to %g points" % (sweep_low, sweep_high))
+    (options, args) = parser.parse_args()
+
+    if not 0 <= options.national_share < 1:
+        parser.error("the national share must be at least 0 and less than 1")
+    if options.tree and options.engine != "exact":
+        parser.error("--tree only works with the exact engine")
+    engine = options.engine
+    mixture_national_share = options.national_share
+
+    if options.sweep:
+        polldata = load_polldata(options.polls, options.analysisdate)
+        biases = sweep_biases()
+        write_bias_sweep(biases, bias_sweep(polldata, biases))
+        return
+
+    if options.scan:
+        metamargin_method = "scan"
+    metamargin_tolerance = options.tolerance
+
+    if options.history:
+        polldata = load_all_polldata(options.polls)
+        estimates = run_estimators(polldata, 0.0, not options.no_metamargin)
+        write_history(polldata, estimates)
+    else:
+        polldata = load_polldata(options.polls, options.analysisdate)
+        dist = None
+        if options.tree:
+            dist = tree_distribution(polldata, options.bias,
+                                     options.verify_tree)
+        estimates = run_estimator(polldata, options.bias,
+                                  not options.no_metamargin, dist)
+        write_estimate(polldata, estimates)
+
+    if not options.no_metamargin:
+        print "Meta-margin found with %d convolutions" % \
+              sum(estimates["convolutions"])
+
+
+############################################################################
+#
+# Loading the summary statistics
+#
+############################################################################
+
+# Returns the 51 x 5 array of summary statistics for the analysis date, a
+# day of the year, or for the newest day if analysisdate is 0 or not in
+# the file, as EV_estimator.m selects them
+
+def load_polldata(filename, analysisdate=0):
+    if os.path.splitext(filename)[1] == ".bin":
+        return load_polldata_binary(filename, analysisdate)
+
+    polldata = loadtxt(filename, ndmin=2)
+    numlines = polldata.shape[0]
+    if numlines % num_states > 0:
+        print >> sys.stderr, "Warning: %s is not a multiple of %d lines long" \
+              % (filename, num_states)
+
+    # The file is in reverse time order
+    newest = flatnonzero(polldata[:, 4] == polldata[:, 4].max())[0]
+    start = newest
+    if analysisdate > 0:
+        matches = flatnonzero(polldata[:, 4] == analysisdate)
+        if len(matches) > 0:
+            start = max(newest, matches[0])
+
+    return polldata[start:start + num_states, :]
+
+
+def load_polldata_binary(filename, analysisdate=0):
+    polls = pollsfile.load_polls(filename)
+    records = None
+    if analysisdate > 0:
+        records = pollsfile.day_records(polls, analysisdate)
+    if records is None:
+        records = polls["records"][:num_states]
+
+    return polldata_from_records(records)
+
+
+# Returns the summary statistics of every day in the file as a
+# days x 51 x 5 array, oldest day first
+
+def load_all_polldata(filename):
+    if os.path.splitext(filename)[1] == ".bin":
+        records = pollsfile.load_polls(filename)["records"]
+        polldata = polldata_from_records(records)
+    else:
+        polldata = loadtxt(filename, ndmin=2)
+
+    if polldata.shape[0] % num_states > 0:
+        raise ValueError("%s is not a multiple of %d lines long" %
+                         (filename, num_states))
+
+    polldata = polldata.reshape((-1, num_states, 5))[::-1]
+
+    # Each day's block must be for a single day
+    assert (polldata[:, :, 4] == polldata[:, :1, 4]).all()
+    return polldata
+
+
+def polldata_from_records(records):
+    return column_stack((records["num"], records["oldest"], records["margin"],
+                        records["sem"], records["day"])).astype(float64)
+
+
+############################################################################
+#
+# The calculation (EV_median.m)
+#
+############################################################################
+
+# MATLAB's round, which rounds halves away from zero
+
+def matlab_round(x):
+    return sign(x) * floor(abs(x) + 0.5)
+
+
+def erf_array(x):
+    return array(map(math.erf, ravel(x))).reshape(shape(x))
+
+
+# Returns the probability of a Democratic win in each state, assuming that
+# the margin is normally distributed
+
+def win_probabilities(margins, sems, bias=0.0):
+    z = (margins + bias) / sems
+    return (erf_array(z / sqrt(2)) + 1) / 2
+
+
+# The calculations below work on many days (or biases) at once: each row
+# of probs, margins and sems is one day's 51 states.
+
+# Returns the exact probability distribution of the Republican electoral
+# votes for each row of probs: element k is the probability of exactly k
+# EV. Each state contributes the polynomial
+# prob_Dem_win + (1 - prob_Dem_win) x^EV, and the distribution is the
+# product of the 51 polynomials.
+
+def ev_distributions(probs, evs=state_evs):
+    probs = atleast_2d(probs)
+    dist = zeros((probs.shape[0], sum(evs) + 1))
+    dist[:, 0] = 1.0
+    size = 1
+
+    for j in xrange(len(evs)):
+        ev = evs[j]
+        p = probs[:, j:j + 1]
+        gop = (1 - p) * dist[:, :size]
+        dist[:, :size] *= p
+        dist[:, ev:ev + size] += gop
+        size += ev
+
+    return dist
+
+
+def ev_distribution(probs, evs=state_evs):
+    return ev_distributions(probs, evs)[0]
+
+
+# Returns the histograms of EV outcomes for the Democrat, in which element
+# i is the probability of i + 1 EV, as EV_median.m computes them
+
+def ev_histograms(dists):
+    return dists[:, total_evs - 1::-1]
+
+
+# Returns the median and mode EV for the Democrat, the four confidence
+# interval bounds (as columns), and the probability of a GOP win, from
+# each histogram
+
+def histogram_summaries(histograms):
+    cumulative_prob = cumsum(histograms, axis=1)
+
+    # The cumulative probabilities are non-decreasing, so the first EV at
+    # which they reach a level follows from how many are below it
+    def first_at_least(level):
+        return sum(cumulative_prob < level, axis=1) + 1
+
+    def last_at_most(level):
+        return sum(cumulative_prob <= level, axis=1)
+
+    # 1-sigma lower and upper limits, then 95-pct lower and upper limits
+    confidenceintervals = column_stack((last_at_most(0.15865),
+                                        first_at_least(0.84135),
+                                        last_at_most(0.025),
+                                        first_at_least(0.975)))
+
+    return {"median": first_at_least(0.5),
+            "mode": argmax(histograms, axis=1) + 1,
+            "confidenceintervals": confidenceintervals,
+            "probability_GOP_win": cumulative_prob[:, 269 - 1]}
+
+
+# Returns, for each row, the distribution of the Republican EV when the
+# states' errors are correlated by a national swing. Each state's error,
+# in units of its SEM, is
+#
+#    sqrt(mixture_national_share) swing + sqrt(1 - mixture_national_share) e
+#
+# where the swing and e are standard normals, so each state's win
+# probability is the same as EV_median.m's. Given the swing, the states are
+# independent, so the distribution is the usual product of polynomials,
+# and the distribution is its average over the swing. The average is taken
+# by Gauss-Hermite quadrature, with the distributions for every row and
+# quadrature point calculated together.
+
+def mixture_distributions(margins, sems, biases):
+    (swings, weights) = hermegauss(mixture_nodes)
+    weights = weights / sum(weights)
+
+    z = (margins + asarray(biases)[:, newaxis]) / sems
+    z = z[:, newaxis, :] + sqrt(mixture_national_share) * swings[:, newaxis]
+    z /= sqrt(1 - mixture_national_share)
+    probs = (erf_array(z / sqrt(2)) + 1) / 2
+
+    dists = ev_distributions(probs.reshape((-1, num_states)))
+    dists = dists.reshape((z.shape[0], mixture_nodes, -1))
+    return sum(dists * weights[:, newaxis], axis=1)
+
+
+# Runs EV_median.m for each row, at the bias for that row: returns the
+# state probabilities, the histograms and their summaries. If the EV
+# distributions have already been computed, they can be passed in.
+
+def ev_medians(margins, sems, biases, dists=None):
+    probs = win_probabilities(margins, sems, asarray(biases)[:, newaxis])
+    if dists is None:
+        if engine == "mixture":
+            dists = mixture_distributions(margins, sems, biases)
+        else:
+            dists = ev_distributions(probs)
+    histograms = ev_histograms(dists)
+
+    result = histogram_summaries(histograms)
+    result["probs"] = probs
+    result["histograms"] = histograms
+    result["stateprobs"] = matlab_round(probs * 100)
+    return result
+
+
+# Returns the EV distribution for the day of polldata, updated from the
+# cached tree of partial products. If verify is set, it is checked against
+# a full recompute.
+
+def tree_distribution(polldata, bias=0.0, verify=False):
+    (margins, sems) = polldata_margins(polldata)
+    probs = win_probabilities(margins, sems, bias)
+    tree = ev_tree.cached_tree(tree_cache_filename, probs, state_evs)
+    print "EV distribution updated with %d convolutions" % tree["convolutions"]
+
+    dist = ev_tree.tree_distribution(tree)
+    if verify:
+        error = ev_tree.tree_error(tree, ev_distribution(probs))
+        print "Largest difference from a full recompute: %g" % error
+        assert error < 1e-12
+
+    return dist
+
+
+############################################################################
+#
+# The estimates (EV_estimator.m)
+#
+############################################################################
+
+# Returns the margins and the SEMs, with the minimum SEM applied
+
+def polldata_margins(polldata):
+    return (polldata[..., 2], maximum(polldata[..., 3], min_sem))
+
+
+# Returns the estimates for each day of polldata, a days x 51 x 5 array,
+# as a dictionary of arrays with one row per day. The outputs entry holds
+# the 13 outputs of EV_estimates.csv.
+
+def run_estimators(polldata, bias=0.0, metacalc=True, dists=None):
+    (margins, sems) = polldata_margins(polldata)
+    num_days = polldata.shape[0]
+    result = ev_medians(margins, sems, zeros(num_days) + bias, dists)
+
+    stateprobs = result["stateprobs"]
+    dem_ev = sum(where(stateprobs >= 95, state_evs, 0), axis=1)
+    gop_ev = sum(where(stateprobs <= 5, state_evs, 0), axis=1)
+
+    # assume DC has no polls
+    totalpollsused = sum(polldata[:, :, 0], axis=1) - 1
+
+    if not metacalc:
+        metamargins = zeros(num_days) - 999
+        convolutions = zeros(num_days, dtype=int)
+    elif metamargin_method == "scan":
+        (metamargins, convolutions) = metamargin_scan(margins, sems,
+                                                      result["median"])
+    else:
+        (metamargins, convolutions) = metamargin_solve(margins, sems,
+                                                       result["median"])
+
+    result["bias"] = bias
+    result["margins"] = margins
+    result["sems"] = sems
+    result["metamargin"] = metamargins
+    result["convolutions"] = convolutions
+    result["outputs"] = column_stack((
+        result["median"], total_evs - result["median"],
+        result["mode"], total_evs - result["mode"],
+        dem_ev, gop_ev, total_evs - dem_ev - gop_ev,
+        result["confidenceintervals"], totalpollsused, metamargins))
+    return result
+
+
+# Returns the estimate for the day of polldata, a 51 x 5 array
+
+def run_estimator(polldata, bias=0.0, metacalc=True, dist=None):
+    if dist is not None:
+        dist = dist[newaxis]
+    result = run_estimators(polldata[newaxis], bias, metacalc, dist)
+
+    estimate = {"bias": bias}
+    for key in result:
+        if key != "bias":
+            estimate[key] = result[key][0]
+
+    estimate["histogram"] = estimate.pop("histograms")
+
+    stateprobs = estimate["stateprobs"]
+    estimate["uncertain"] = flatnonzero((stateprobs < 95) & (stateprobs > 5))
+    estimate["outputs"] = list(estimate["outputs"])
+    return estimate
+
+
+# The meta-margin is the bias which brings the median EV to a tie: minus
+# the smallest bias at which the median EV for the Democrat is at least
+# 269. The functions below return the meta-margin of each day, and the
+# number of EV distributions each day needed to find it.
+
+# Like EV_estimator.m, this scans upwards in steps of 0.02 from a guess
+# below the tie until the median EV reaches 269. All of the days are
+# scanned together, each until it reaches the tie.
+
+def metamargin_scan(margins, sems, median_evs):
+    biases = matlab_round((269 - median_evs) / 1.25) / 10 - 2
+    convolutions = zeros(len(biases), dtype=int)
+    active = arange(len(biases))
+
+    while len(active) > 0:
+        medians = ev_medians(margins[active], sems[active],
+                             biases[active])["median"]
+        convolutions[active] += 1
+        active = active[medians < 269]
+        biases[active] = biases[active] + .02
+
+    return (-biases, convolutions)
+
+
+# The median EV never decreases as the bias increases, so instead of
+# scanning, the tie can be bracketed and then bisected. Starting from the
+# same point as the scan, the bracket is moved up, doubling its width each
+# time, until its high end reaches the tie, and then it is halved until it
+# is no wider than metamargin_tolerance. As with the scan, if the median EV
+# already reaches 269 at the starting point, that is the meta-margin. The
+# result is within metamargin_tolerance below the scan's result or 0.02
+# above it.
+
+def metamargin_solve(margins, sems, median_evs):
+    num_days = len(median_evs)
+    convolutions = zeros(num_days, dtype=int)
+
+    def ties(rows, biases):
+        convolutions[rows] += 1
+        return ev_medians(margins[rows], sems[rows], biases)["median"] >= 269
+
+    low = matlab_round((269 - median_evs) / 1.25) / 10 - 2
+    high = low.copy()
+    steps = zeros(num_days) + metamargin_bracket_step
+
+    rows = arange(num_days)
+    rows = rows[~ties(rows, low)]
+    high[rows] = low[rows] + steps[rows]
+    while len(rows) > 0:
+        tied = ties(rows, high[rows])
+        rows = rows[~tied]
+        low[rows] = high[rows]
+        steps[rows] *= 2
+        high[rows] = high[rows] + steps[rows]
+
+    rows = flatnonzero(high - low > metamargin_tolerance)
+    while len(rows) > 0:
+        middle = (low[rows] + high[rows]) / 2
+        tied = ties(rows, middle)
+        high[rows[tied]] = middle[tied]
+        low[rows[~tied]] = middle[~tied]
+        rows = rows[high[rows] - low[rows] > metamargin_tolerance]
+
+    return (-high, convolutions)
+
+
+############################################################################
+#
+# The bias sweep
+#
+############################################################################
+
+# Returns the grid of biases, which are exact to the nearest step
+
+def sweep_biases():
+    low = int(round(sweep_low * sweep_steps_per_point))
+    high = int(round(sweep_high * sweep_steps_per_point))
+    return arange(low, high + 1) / float(sweep_steps_per_point)
+
+
+# Returns EV_median.m's results for the day of polldata at each of the
+# biases, one row per bias, all computed together
+
+def bias_sweep(polldata, biases):
+    (margins, sems) = polldata_margins(polldata)
+    rows = len(biases)
+    return ev_medians(tile(margins, (rows, 1)), tile(sems, (rows, 1)),
+                      biases)
+
+
+def write_bias_sweep(biases, sweep):
+    f = open(sweep_filename, "w")
+    f.write("# bias,median EV,1-sigma low,1-sigma high,95-pct low,"
+            "95-pct high,prob. of Dem win,%s\n" % ",".join(state_abbrevs))
+    for i in xrange(len(biases)):
+        values = [biases[i], sweep["median"][i]] + \
+                 list(sweep["confidenceintervals"][i]) + \
+                 [1 - sweep["probability_GOP_win"][i]]
+        f.write(",".join(map(dlm_format, values)))
+        f.write(",%s\n" % ",".join(map(num2str, sweep["stateprobs"][i])))
+    f.close()
+
+    f = open(sweep_histograms_filename, "w")
+    f.write("# bias,probability of 1 to 538 EV in parts per million\n")
+    ppm = matlab_round(sweep["histograms"] * 1e6).astype(int)
+    for i in xrange(len(biases)):
+        f.write("%s,%s\n" % (dlm_format(biases[i]),
+                             ",".join(map(str, ppm[i]))))
+    f.close()
+
+
+############################################################################
+#
+# Output, formatted as MATLAB's dlmwrite and num2str format numbers
+#
+############################################################################
+
+def dlm_format(x):
+    return "%.5g" % x
+
+
+def num2str(x):
+    if x == round(x):
+        return "%d" % x
+
+    digits = max(int(math.floor(math.log10(abs(x)))) + 5, 5)
+    return "%.*g" % (min(digits, 16), x)
+
+
+def write_estimate(polldata, estimate):
+    outputs = estimate["outputs"]
+
+    f = open(estimates_filename, "w")
+    f.write(",".join(map(dlm_format, outputs)) + "\n")
+    f.close()
+
+    # Only the unbiased estimate goes in the histogram, the state
+    # probabilities and the history
+    if estimate["bias"] != 0:
+        return
+
+    f = open(histogram_filename, "w")
+    for p in estimate["histogram"]:
+        f.write(dlm_format(p) + "\n")
+    f.close()
+
+    write_stateprobs(estimate)
+
+    f = open(history_filename, "a")
+    f.write(",".join(map(dlm_format, [polldata[0, 4]] + outputs)) + "\n")
+    f.close()
+
+
+# Rewrites the history with one line, of the date followed by the 13
+# outputs, for each day, oldest first
+
+def write_history(polldata, estimates):
+    f = open(history_filename, "w")
+    for i in xrange(polldata.shape[0]):
+        values = [polldata[i, 0, 4]] + list(estimates["outputs"][i])
+        f.write(",".join(map(dlm_format, values)) + "\n")
+    f.close()
+
+
+# Each line includes hypothetical probabilities for D+2% and R+2% biases
+
+def write_stateprobs(estimate, filename=stateprobs_filename):
+    margins = estimate["margins"]
+    sems = estimate["sems"]
+
+    d2probs = matlab_round((erf_array((margins + 2) / sems / sqrt(2)) + 1) * 50)
+    r2probs = matlab_round((erf_array((margins - 2) / sems / sqrt(2)) + 1) * 50)
+
+    f = open(filename, "w")
+    for i in xrange(num_states):
+        f.write("%s,%s,%s,%s,%s\n" % (num2str(estimate["stateprobs"][i]),
+                                      num2str(margins[i]),
+                                      num2str(d2probs[i]),
+                                      num2str(r2probs[i]),
+                                      state_abbrevs[i]))
+    f.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This module loads EV_estimate_history.csv, as written by EV_estimator.m
+# (or ev_estimator.py), for the plotting scripts. Each line of the file
+# holds, for one day:
+#
+#    1 value - date code (day of the year)
+#    2 values - medianEV for the two candidates, where a margin>0 favors the
+#               first candidate (in our case, Obama);
+#    2 values - modeEV for the two candidates;
+#    3 values - assigned (>95% prob) EV for each candidate, with a third
+#               entry for undecided;
+#    4 values - confidence intervals for candidate 1's EV: +/-1 sigma, then
+#               95% band;
+#    1 value - number of state polls used to make the estimates; and
+#    1 value - metamargin
+#
+# Lines starting with # are comments. The file is parsed into one array for
+# each value, named in history_columns, which are cached in a sidecar file
+# (the name of the CSV file with history_cache_suffix added) together with
+# the size and modification time of the CSV file. The cache is used as long
+# as those are unchanged. If lines have only been appended to the file
+# since, only the new lines are parsed.
+#
+# Usage: ev_history.py [EV_estimate_history.csv]
+# loads the file and reports how long it took with and without the cache.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, sys, time, cPickle
+from numpy import *
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+history_filename = "../matlab/EV_estimate_history.csv"
+
+# The columns of each line, in order. All but the meta-margin are whole
+# numbers.
+history_columns = ["date", "median_dem", "median_gop", "mode_dem", "mode_gop",
+                   "assigned_dem", "assigned_gop", "assigned_undecided",
+                   "low_1sigma", "high_1sigma", "low_95", "high_95",
+                   "num_polls", "metamargin"]
+float_columns = ["metamargin"]
+
+history_cache_suffix = ".cache"
+history_cache_version = 1
+
+# Length of the end of the parsed text which is kept in the cache, to check
+# that an appended file still starts with the text which was parsed
+check_length = 256
+
+############################################################################
+#
+# Loading
+#
+############################################################################
+
+# Returns the history as a dictionary of arrays, one for each of
+# history_columns, with one element per day in file order
+
+def load_history(filename=history_filename, use_cache=True):
+    cache_filename = filename + history_cache_suffix
+    st = os.stat(filename)
+
+    cached = None
+    if use_cache:
+        cached = load_history_cache(cache_filename)
+
+    if cached is not None and cached["size"] == st.st_size and \
+       cached["mtime"] == st.st_mtime:
+        return cached["columns"]
+
+    f = open(filename, "rb")
+    offset = 0
+    columns = None
+
+    # Lines appended since the cache was written
+    if cached is not None and cached["offset"] <= st.st_size:
+        tail = cached["tail"]
+        f.seek(cached["offset"] - len(tail))
+        if f.read(len(tail)) == tail:
+            offset = cached["offset"]
+            columns = cached["columns"]
+
+    f.seek(offset)
+    text = f.read()
+    f.close()
+
+    # A last line without a newline may still be being written
+    end = text.rfind("\n") + 1
+    new_columns = parse_history(text[:end])
+
+    if columns is None:
+        columns = new_columns
+        tail = text[:end][-check_length:]
+    else:
+        for name in history_columns:
+            columns[name] = concatenate((columns[name], new_columns[name]))
+        tail = (cached["tail"] + text[:end])[-check_length:]
+
+    if use_cache:
+        save_history_cache(cache_filename, columns, st, offset + end, tail)
+
+    return columns
+
+
+# Parses lines of the file into a dictionary of arrays
+
+def parse_history(text):
+    lines = filter(lambda x: x.strip() != "" and x[0] != "#",
+                   text.splitlines())
+
+    columns = {}
+    if len(lines) == 0:
+        for name in history_columns:
+            columns[name] = zeros(0, dtype=column_type(name))
+        return columns
+
+    values = array(map(lambda x: x.split(","), lines), dtype=float64)
+    assert values.shape[1] == len(history_columns)
+
+    for (i, name) in enumerate(history_columns):
+        columns[name] = values[:, i].astype(column_type(name))
+    return columns
+
+
+def column_type(name):
+    if name in float_columns:
+        return float64
+    return int32
+
+
+############################################################################
+#
+# The cache
+#
+############################################################################
+
+# Returns the cached history, or None if there is no usable cache
+
+def load_history_cache(filename):
+    if not os.path.exists(filename):
+        return None
+
+    try:
+        f = open(filename, "rb")
+        (version, cached) = cPickle.load(f)
+        f.close()
+    except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+        return None
+
+    if version != history_cache_version:
+        return None
+    return cached
+
+
+# Writes the cache under a temporary name and then renames it, so readers
+# never see a partly written cache. A cache which cannot be written is not
+# an error.
+
+def save_history_cache(filename, columns, st, offset, tail):
+    cached = {"columns": columns, "size": st.st_size, "mtime": st.st_mtime,
+              "offset": offset, "tail": tail}
+
+    try:
+        f = open(filename + ".new", "wb")
+        cPickle.dump((history_cache_version, cached), f,
+                     cPickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(filename + ".new", filename)
+    except (IOError, OSError):
+        pass
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        history_filename = sys.argv[1]
+
+    start = time.time()
+    history = load_history(history_filename, False)
+    parse_time = time.time() - start
+
+    load_history(history_filename)
+    start = time.time()
+    load_history(history_filename)
+    cache_time = time.time() - start
+
+    print "%d days" % len(history["date"])
+    print "parse   %.4fs" % parse_time
+    print "cache   %.4fs" % cache_time
@@ -0,0 +1,333 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script is a NumPy port of EV_prediction.m. It predicts the
+# meta-margin on election day by combining the drift expected from today's
+# meta-margin, a t-distribution with 3 degrees of freedom whose width grows
+# with the time left, with a long-tailed prior from the long-term
+# prediction, and converts the prediction to EV with the spline through
+# the mmf/evf table of EV_prediction.m. It reads the meta-margin from
+# EV_estimates.csv (as written by ev_estimator.py) and writes the same
+# files as EV_prediction.m:
+#
+#    EV_prediction.csv        - the 1-sigma and 2-sigma EV bands
+#    EV_prediction_probs.csv  - the Bayesian and drift-only probabilities
+#                               of a Dem win
+#    EV_prediction_MM.csv     - the 1-sigma and 2-sigma meta-margin bands
+#
+# With --history, it instead predicts from every day of
+# EV_estimate_history.csv at once, and writes EV_prediction_history.csv,
+# with one line for each day:
+#
+#    day of year, predicted EV, 4 EV bands, 2 probabilities, 4 MM bands
+#
+# The days are grouped by the width of their drift, which sets the size of
+# their grid of meta-margins, and each group is predicted as one array.
+# Most days share the widest drift, so the drift distribution on the grid
+# is computed once for each width and cached.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import math, datetime, optparse
+from numpy import *
+import ev_estimator
+from ev_estimator import matlab_round, dlm_format
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+election_date = datetime.date(2012, 11, 6)
+
+# The drift is min(sqrt(drift_per_day^2 * days + min_drift_variance),
+# max_drift), and at least min_drift
+drift_per_day = 0.4
+min_drift_variance = 0.25
+max_drift = 1.8
+min_drift = 0.2
+drift_df = 3
+
+# Parameters of the long-term prediction
+prior_mean = 3.26
+prior_sd = 2.2
+prior_df = 1
+
+grid_step = 0.02
+grid_sigmas = 4
+
+# Conversion from meta-margin to EV, from data from mid-August and some
+# added points at the ends. If the race swings far, these endpoints need to
+# be re-evaluated.
+mmf = array([-1.48, -.74, 0, .74, 1.4800, 1.8125, 2.1383, 2.5667, 3.3200,
+    3.7400, 4.2000, 4.6600, 5.1050, 6, 7, 8, 9, 10, 11, 12])
+evf = array([247, 258, 269, 280, 290.0000, 299.2500, 304.1667, 310.0000,
+    321.6667, 328, 343, 347, 347, 347, 347, 347, 347, 358, 369, 383])
+
+# The second derivatives of the spline through mmf and evf, and the drift
+# distribution on the grid for each drift width, computed when first used
+mmf_spline = None
+drift_cache = {}
+
+prediction_filename = "EV_prediction.csv"
+probs_filename = "EV_prediction_probs.csv"
+mm_filename = "EV_prediction_MM.csv"
+prediction_history_filename = "EV_prediction_history.csv"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--metamargin", type="float", metavar="PCT",
+                      help="today's meta-margin (default: from %s)" %
+                      ev_estimator.estimates_filename)
+    parser.add_option("--analysisdate", type="int", metavar="DAY", default=0,
+                      help="day of the year to predict from (default: today)")
+    parser.add_option("--history", action="store_true", default=False,
+                      help="predict from every day of %s" %
+                      ev_estimator.history_filename)
+    (options, args) = parser.parse_args()
+
+    if options.history:
+        history = loadtxt(ev_estimator.history_filename, delimiter=",",
+                          ndmin=2)
+        days = history[:, 0]
+        write_prediction_history(days, predictions(history[:, -1],
+                                                   days_to_election(days)))
+        return
+
+    if options.metamargin is None:
+        estimates = loadtxt(ev_estimator.estimates_filename, delimiter=",",
+                            ndmin=1)
+        metamargin = estimates[-1]
+    else:
+        metamargin = options.metamargin
+
+    if options.analysisdate > 0:
+        days = days_to_election(options.analysisdate)
+    else:
+        days = (election_date - datetime.date.today()).days
+
+    write_prediction(predictions(array([metamargin]), array([days]), 0))
+
+
+# Returns the number of days from each day of the election year to the
+# election
+
+def days_to_election(days):
+    return election_date.timetuple().tm_yday - asarray(days)
+
+
+############################################################################
+#
+# The prediction
+#
+############################################################################
+
+# Returns the predictions from each of the meta-margins, with the number of
+# days to the election for each. If row is given, the predictions for that
+# row alone are returned.
+
+def predictions(metamargins, days, row=None):
+    drifts = drift_widths(days)
+
+    num_days = len(metamargins)
+    result = {"prediction": zeros(num_days), "mean": zeros(num_days),
+              "ev_bands": zeros((num_days, 4)),
+              "mm_bands": zeros((num_days, 4)),
+              "bayesian_winprob": zeros(num_days),
+              "drift_winprob": t_cdf(metamargins / drifts, drift_df)}
+
+    for drift in unique(drifts):
+        rows = flatnonzero(drifts == drift)
+        (offsets, now) = drift_distribution(drift)
+
+        # grid[i] is the grid of meta-margins for row i, and pred[i] the
+        # prediction on it
+        grid = (metamargins[rows] - grid_sigmas * drift)[:, newaxis] + \
+               offsets
+        prior = t_pdf((grid - prior_mean) / prior_sd, prior_df)
+        prior /= sum(prior, axis=1)[:, newaxis]
+
+        pred = now * prior
+        pred /= sum(pred, axis=1)[:, newaxis]
+        total = sum(pred, axis=1)
+
+        result["mean"][rows] = sum(pred * grid, axis=1) / total
+        result["bayesian_winprob"][rows] = \
+            sum(where(grid >= 0, pred, 0), axis=1) / total
+
+        # The first meta-margin at which the cumulative probability exceeds
+        # each level
+        cumulative_prob = cumsum(pred, axis=1)
+        for (j, z) in enumerate([-1, 1, -2, 2]):
+            level = (1 + math.erf(z / sqrt(2))) / 2
+            first = minimum(sum(cumulative_prob <= level, axis=1),
+                            len(offsets) - 1)
+            result["mm_bands"][rows, j] = grid[arange(len(rows)), first]
+
+    bands = matlab_round(mm_to_ev(column_stack((result["mean"],
+                                                result["mm_bands"]))))
+    result["prediction"] = bands[:, 0]
+    result["ev_bands"] = bands[:, 1:]
+
+    if row is not None:
+        for key in result:
+            result[key] = result[key][row]
+    return result
+
+
+# Returns the width of the drift of the meta-margin by the election for
+# each number of days left. On and after election day, it is the width on
+# election day.
+
+def drift_widths(days):
+    days = maximum(asarray(days, dtype=float64), 0)
+    drifts = minimum(sqrt(drift_per_day * drift_per_day * days
+                          + min_drift_variance), max_drift)
+    return maximum(drifts, min_drift)
+
+
+# Returns the offsets of the grid from its low end, and the drift
+# distribution on the grid, for a drift width. The grid covers
+# grid_sigmas drift widths on either side of today's meta-margin.
+
+def drift_distribution(drift):
+    if drift not in drift_cache:
+        span = 2 * grid_sigmas * drift
+        num_points = int(math.floor(span / grid_step + 1e-10)) + 1
+        offsets = grid_step * arange(num_points)
+
+        # long-tailed distribution. you never know.
+        now = t_pdf((offsets - grid_sigmas * drift) / drift, drift_df)
+        drift_cache[drift] = (offsets, now / sum(now))
+
+    return drift_cache[drift]
+
+
+# Student's t-distribution
+
+def t_pdf(x, df):
+    scale = math.exp(math.lgamma((df + 1) / 2.0) - math.lgamma(df / 2.0)) / \
+            math.sqrt(df * math.pi)
+    return scale * (1 + x * x / df) ** (-(df + 1) / 2.0)
+
+
+# The cumulative distribution, for whole numbers of degrees of freedom
+# (Abramowitz and Stegun 26.7.3 and 26.7.4). df may be an array, one for
+# each element of x.
+
+def t_cdf(x, df):
+    (x, df) = broadcast_arrays(asarray(x, dtype=float64), asarray(df))
+    odd = df % 2 == 1
+    theta = arctan(x / sqrt(df))
+    cos_squared = cos(theta) ** 2
+
+    # The series has (df - 1) / 2 terms in cos(theta)^(2k + 1) for odd df,
+    # and df / 2 terms in cos(theta)^2k for even df
+    num_terms = where(odd, (df - 1) / 2, df / 2)
+    series = zeros(x.shape)
+    term = where(odd, cos(theta), 1.0)
+    for k in xrange(int(num_terms.max()) if num_terms.size else 0):
+        series += where(k < num_terms, term, 0)
+        term = term * cos_squared * where(odd, (2.0 * k + 2) / (2 * k + 3),
+                                          (2.0 * k + 1) / (2 * k + 2))
+
+    return where(odd, 0.5 + (theta + sin(theta) * series) / math.pi,
+                 0.5 + sin(theta) * series / 2)
+
+
+############################################################################
+#
+# Conversion to EV
+#
+############################################################################
+
+# Returns the EV for each meta-margin from the cubic spline through mmf and
+# evf, with MATLAB's not-a-knot end conditions, as interp1(..., 'spline')
+# interpolates. Outside of mmf, the end pieces are extended.
+
+def mm_to_ev(mm):
+    global mmf_spline
+
+    if mmf_spline is None:
+        mmf_spline = spline_second_derivatives(mmf, evf)
+    second = mmf_spline
+
+    h = diff(mmf)
+    slopes = diff(evf) / h
+
+    i = clip(searchsorted(mmf, mm, side="right") - 1, 0, len(mmf) - 2)
+    s = mm - mmf[i]
+    return evf[i] + s * (slopes[i] - h[i] * (2 * second[i] + second[i + 1]) / 6) \
+           + s * s * second[i] / 2 \
+           + s * s * s * (second[i + 1] - second[i]) / (6 * h[i])
+
+
+# Returns the second derivative of the spline at each knot. The first and
+# last two pieces are each a single cubic (not-a-knot).
+
+def spline_second_derivatives(x, y):
+    n = len(x)
+    h = diff(x)
+    slopes = diff(y) / h
+
+    a = zeros((n, n))
+    b = zeros(n)
+    for i in xrange(1, n - 1):
+        a[i, i - 1:i + 2] = [h[i - 1], 2 * (h[i - 1] + h[i]), h[i]]
+        b[i] = 6 * (slopes[i] - slopes[i - 1])
+
+    # The third derivative is continuous at the second and next-to-last knots
+    a[0, :3] = [h[1], -(h[0] + h[1]), h[0]]
+    a[n - 1, n - 3:] = [h[n - 2], -(h[n - 3] + h[n - 2]), h[n - 3]]
+
+    return linalg.solve(a, b)
+
+
+############################################################################
+#
+# Output
+#
+############################################################################
+
+def write_prediction(prediction):
+    write_csv(prediction_filename, prediction["ev_bands"])
+    write_csv(probs_filename, [prediction["bayesian_winprob"],
+                               prediction["drift_winprob"]])
+    write_csv(mm_filename, prediction["mm_bands"])
+
+
+def write_prediction_history(days, predictions):
+    f = open(prediction_history_filename, "w")
+    for i in xrange(len(days)):
+        values = [days[i], predictions["prediction"][i]] + \
+                 list(predictions["ev_bands"][i]) + \
+                 [predictions["bayesian_winprob"][i],
+                  predictions["drift_winprob"][i]] + \
+                 list(predictions["mm_bands"][i])
+        f.write(",".join(map(dlm_format, values)) + "\n")
+    f.close()
+
+
+def write_csv(filename, values):
+    f = open(filename, "w")
+    f.write(",".join(map(dlm_format, values)) + "\n")
+    f.close()
+
+
+if __name__ == '__main__':
+    main()
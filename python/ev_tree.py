@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This module keeps the EV distribution as a balanced binary tree of
+# partial products, so that when the win probabilities of only a few
+# states change, the distribution can be updated without redoing the whole
+# 51-state convolution. Each leaf is one state's EV polynomial,
+#
+#    prob_Dem_win + (1 - prob_Dem_win) x^EV
+#
+# (or the constant 1, to pad the leaves to a power of two), and each node
+# is the product of its two children, so the root is the distribution of
+# the Republican EV. Changing k states only changes the nodes on their
+# paths to the root, so the update takes O(k log n) convolutions.
+#
+# The nodes are stored heap-style: node i has children 2i and 2i + 1, and
+# the leaves are nodes size to 2 size - 1. The tree can be cached between
+# runs with save_tree and load_tree.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, cPickle
+from numpy import *
+
+tree_version = 1
+
+############################################################################
+#
+# Building and updating
+#
+############################################################################
+
+# Returns a new tree for the given win probabilities and EV of each state
+
+def build_tree(probs, evs):
+    size = 1
+    while size < len(evs):
+        size *= 2
+
+    nodes = [None] * (2 * size)
+    for i in xrange(size):
+        if i < len(evs):
+            nodes[size + i] = state_polynomial(probs[i], evs[i])
+        else:
+            nodes[size + i] = array([1.0])
+
+    for i in xrange(size - 1, 0, -1):
+        nodes[i] = convolve(nodes[2 * i], nodes[2 * i + 1])
+
+    return {"evs": list(evs), "probs": array(probs, dtype=float64),
+            "size": size, "nodes": nodes, "convolutions": size - 1}
+
+
+def state_polynomial(prob, ev):
+    poly = zeros(ev + 1)
+    poly[0] = prob
+    poly[ev] = 1 - prob
+    return poly
+
+
+# Brings the tree up to date with new win probabilities for the states.
+# Only the states whose probability changed, and their ancestors, are
+# recomputed. Returns the indices of the changed states, and records the
+# number of convolutions the update took in the tree.
+
+def update_tree(tree, probs):
+    probs = asarray(probs, dtype=float64)
+    changed = flatnonzero(tree["probs"] != probs)
+    size = tree["size"]
+    nodes = tree["nodes"]
+
+    dirty = set()
+    for state in changed:
+        node = size + state
+        nodes[node] = state_polynomial(probs[state], tree["evs"][state])
+        node /= 2
+        while node >= 1 and node not in dirty:
+            dirty.add(node)
+            node /= 2
+
+    # Children have larger indices than their parents, so this recomputes
+    # every child before its parent
+    for node in sorted(dirty, reverse=True):
+        nodes[node] = convolve(nodes[2 * node], nodes[2 * node + 1])
+
+    tree["probs"] = probs.copy()
+    tree["convolutions"] = len(dirty)
+    return changed
+
+
+# Replaces one state's win probability, and returns the new distribution
+
+def set_state_probability(tree, state, prob):
+    probs = tree["probs"].copy()
+    probs[state] = prob
+    update_tree(tree, probs)
+    return tree_distribution(tree)
+
+
+# Returns the distribution of the Republican EV: element k is the
+# probability of exactly k EV
+
+def tree_distribution(tree):
+    return tree["nodes"][1]
+
+
+# Returns the largest difference between the tree's distribution and a
+# distribution computed from scratch
+
+def tree_error(tree, full_distribution):
+    return abs(tree_distribution(tree) - full_distribution).max()
+
+
+############################################################################
+#
+# Caching between runs
+#
+############################################################################
+
+# Returns the cached tree, or None if there is none for these states
+
+def load_tree(filename, evs):
+    if not os.path.exists(filename):
+        return None
+
+    try:
+        f = open(filename, "rb")
+        (version, tree) = cPickle.load(f)
+        f.close()
+    except (EOFError, ValueError, cPickle.UnpicklingError):
+        return None
+
+    if version != tree_version or tree["evs"] != list(evs):
+        return None
+
+    return tree
+
+
+def save_tree(filename, tree):
+    f = open(filename + ".new", "wb")
+    cPickle.dump((tree_version, tree), f, cPickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.rename(filename + ".new", filename)
+
+
+# Returns the tree for the given probabilities, updating the cached tree if
+# there is one and building a new one otherwise, and caches the result
+
+def cached_tree(filename, probs, evs):
+    tree = load_tree(filename, evs)
+    if tree is None:
+        tree = build_tree(probs, evs)
+    else:
+        update_tree(tree, probs)
+
+    save_tree(filename, tree)
+    return tree
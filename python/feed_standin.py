@@ -0,0 +1,282 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script is a local stand-in for the Huffington Post poll feed, which
+# serves canned pages over HTTP with keep-alive and gzip, as the feed does.
+# The pages hold synthetic 2012-president polls, newest first and
+# polls_per_page to a page, and past the last page the feed returns an
+# empty page.
+#
+# By default, it checks the incremental crawl of update_polls.py: in a
+# scratch directory, it runs update_polls.py --url against the stand-in
+# several times, adding new polls to the feed between runs, and checks how
+# many pages of the feed each run reads:
+#
+#   - a first crawl with an empty archive reads the whole feed
+#   - a crawl with new polls stops at the first page at or below the
+#     high-water mark
+#   - a crawl with no new polls stops on the first page
+#   - without the high-water mark, a crawl stops after --incremental pages
+#     of archived polls
+#
+# With --serve PORT, it only serves the canned pages, for trying
+# update_polls.py --url http://localhost:PORT/ by hand.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, sys, re, shutil, tempfile, threading, subprocess, optparse
+import datetime, random, gzip, StringIO
+import BaseHTTPServer, SocketServer
+import update_polls
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+polls_per_page = 10
+first_poll_id = 1000
+poll_states = ["FL", "OH", "VA", "NC", "CO", "IA", "NV", "NH", "WI", "PA",
+               "MI", "MN", "NM", "US"]
+
+feed_polls = []
+# feed_polls holds the polls of the feed as XML, newest first. The oldest
+# polls are one from each state, from before the campaign season, so that
+# update_polls.py has a poll for every state on every day.
+
+requested_pages = []
+requests_lock = threading.Lock()
+# requested_pages holds the page number of each request the stand-in has
+# served since it was last cleared
+
+update_polls_script = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                   "update_polls.py")
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--serve", type="int", metavar="PORT", default=None,
+                      help="only serve the canned pages on PORT")
+    parser.add_option("--polls", type="int", metavar="N", default=120,
+                      help="number of polls in the feed (default: %default)")
+    parser.add_option("--incremental", type="int", metavar="N", default=3,
+                      help="--incremental passed to update_polls.py "
+                      "(default: %default)")
+    parser.add_option("--concurrency", type="int", metavar="N", default=4,
+                      help="--concurrency passed to update_polls.py "
+                      "(default: %default)")
+    (options, args) = parser.parse_args()
+
+    add_polls(options.polls)
+
+    if options.serve is not None:
+        server = start_server(options.serve)
+        print "Serving %d pages on http://localhost:%d/" % \
+                (num_pages(), server.server_address[1])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        return
+
+    if not check_crawl(options.incremental, options.concurrency):
+        sys.exit(1)
+
+
+############################################################################
+#
+# The canned feed
+#
+############################################################################
+
+# Adds num polls to the front of the feed, with ids above those of the
+# polls already in it
+
+def add_polls(num):
+    rand = random.Random(first_poll_id + len(feed_polls))
+    new_polls = []
+
+    all_states = sorted(update_polls.state_names)
+
+    for poll_id in range(first_poll_id + len(feed_polls),
+                         first_poll_id + len(feed_polls) + num):
+        if poll_id - first_poll_id < len(all_states):
+            state = all_states[poll_id - first_poll_id]
+            start_date = datetime.date(2012, 4, 1)
+        else:
+            state = rand.choice(poll_states)
+            start_date = datetime.date(2012, 6, 1) + \
+                    datetime.timedelta(rand.randint(0, 120))
+        end_date = start_date + datetime.timedelta(rand.randint(0, 4))
+        obama = rand.randint(40, 55)
+        romney = rand.randint(40, 55)
+
+        new_polls.append(
+            "<poll><id>%d</id><pollster>Pollster %d</pollster>"
+            "<start_date>%s</start_date><end_date>%s</end_date>"
+            "<method>Phone</method><questions><question>"
+            "<topic>2012-president</topic><state>%s</state>"
+            "<subpopulations><subpopulation><name>Likely Voters</name>"
+            "<observations>%d</observations><responses>"
+            "<response><choice>Obama</choice><value>%d</value></response>"
+            "<response><choice>Romney</choice><value>%d</value></response>"
+            "<response><choice>Undecided</choice><value>%d</value>"
+            "</response></responses></subpopulation></subpopulations>"
+            "</question></questions></poll>" %
+            (poll_id, rand.randint(1, 8), start_date, end_date,
+             state, rand.randint(400, 1500), obama,
+             romney, 100 - obama - romney))
+
+    new_polls.reverse()
+    feed_polls[0:0] = new_polls
+
+
+def num_pages():
+    return (len(feed_polls) + polls_per_page - 1) / polls_per_page
+
+
+# Returns the numbered page of the feed, which is empty past the last page
+
+def feed_page(page_num):
+    first = (page_num - 1) * polls_per_page
+    polls = feed_polls[first:first + polls_per_page]
+    return '<?xml version="1.0" ?><polls>%s</polls>' % "".join(polls)
+
+
+############################################################################
+#
+# The server
+#
+############################################################################
+
+class FeedHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        match = re.search(r"(\d+)$", self.path)
+        if match is None:
+            self.send_error(404)
+            return
+
+        page_num = int(match.group(1))
+        requests_lock.acquire()
+        requested_pages.append(page_num)
+        requests_lock.release()
+
+        data = feed_page(page_num)
+        self.send_response(200)
+        if "gzip" in self.headers.get("Accept-Encoding", ""):
+            buf = StringIO.StringIO()
+            f = gzip.GzipFile(fileobj=buf, mode="wb")
+            f.write(data)
+            f.close()
+            data = buf.getvalue()
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Type", "text/xml")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FeedServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
+# Starts the stand-in on port, or on any free port if port is 0
+
+def start_server(port=0):
+    return FeedServer(("127.0.0.1", port), FeedHandler)
+
+
+############################################################################
+#
+# Checking the incremental crawl
+#
+############################################################################
+
+def check_crawl(incremental, concurrency):
+    server = start_server()
+    thread = threading.Thread(target=server.serve_forever)
+    thread.setDaemon(True)
+    thread.start()
+    url = "http://localhost:%d/page" % server.server_address[1]
+
+    work_dir = tempfile.mkdtemp(prefix="feed_standin.")
+    os.mkdir(os.path.join(work_dir, "archive"))
+    ok = True
+
+    try:
+        # The first crawl reads every page, and the empty page after them
+        ok &= check_run(work_dir, url, incremental, concurrency,
+                        "first crawl", num_pages() + 1)
+
+        # The new polls fill the first page and part of the second, and
+        # the third is the first entirely at or below the mark
+        add_polls(polls_per_page + polls_per_page / 2)
+        ok &= check_run(work_dir, url, incremental, concurrency,
+                        "crawl with new polls", 3)
+
+        ok &= check_run(work_dir, url, incremental, concurrency,
+                        "crawl with no new polls", 1)
+
+        # Without the mark, the crawl reads the new polls and then
+        # incremental pages of archived polls
+        os.remove(os.path.join(work_dir, "archive.hwm"))
+        add_polls(polls_per_page)
+        ok &= check_run(work_dir, url, incremental, concurrency,
+                        "crawl without the mark", 1 + incremental)
+    finally:
+        server.shutdown()
+        shutil.rmtree(work_dir)
+
+    if ok:
+        print "All crawls read the expected pages"
+    return ok
+
+
+# Runs update_polls.py against the stand-in, and returns whether it read
+# expected pages of the feed. A crawl may also request a few pages ahead of
+# the last one it reads, up to one for each concurrent fetch.
+
+def check_run(work_dir, url, incremental, concurrency, name, expected):
+    del requested_pages[:]
+
+    command = [sys.executable, update_polls_script, "--url", url,
+               "--incremental", str(incremental),
+               "--concurrency", str(concurrency), "--rate", "0"]
+    process = subprocess.Popen(command, cwd=work_dir, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT)
+    output = process.communicate()[0]
+
+    pages_read = len(re.findall(r"^Fetching page: ", output, re.M))
+    num_requests = len(requested_pages)
+
+    ok = process.returncode == 0 and pages_read == expected and \
+            pages_read <= num_requests <= pages_read + concurrency
+    print "%-24s read %d pages (expected %d), %d requests  %s" % \
+            (name, pages_read, expected, num_requests, ok and "ok" or "FAIL")
+
+    if not ok:
+        print output
+    return ok
+
+
+if __name__ == '__main__':
+    main()
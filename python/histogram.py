@@ -8,6 +8,15 @@
 # plotted by those scripts for stand-alone display, but we redraw them with
 # Python's matplotlib for better web display.
 #
+# The inputs are read by load_inputs, and each graphic is drawn by one of
+# the functions in figures, so that render.py can draw them together with
+# the other graphics. Run on its own, the script draws all of them.
+#
+# Each size of the graphic is drawn on a template from plot_templates.py,
+# which is built once with the bars, axes and labels. For each day, only
+# the heights and colors of the bars, the 269 EV line, the heights of the
+# labels and the timestamp are updated.
+#
 # Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
 #
 # Script written for election.princeton.edu run by Samuel S.-H. Wang under
@@ -28,29 +37,141 @@ import time
 import matplotlib
 matplotlib.use('Agg')
 from pylab import *
+import plot_templates
+
+input_dir = "../matlab/"
+
+# The files in input_dir which the graphics are drawn from. render.py
+# draws the graphics again only when one of these, or this script, has
+# changed.
+input_files = ["EV_histogram.csv", "EV_estimates.csv"]
+
+############################################################################
+#
+# Inputs
+#
+############################################################################
+
+# Adds the inputs of the graphics to the dictionary inputs, unless they
+# are already there, and returns it
+
+def load_inputs(inputs=None):
+    if inputs is None:
+        inputs = {}
+
+    if "ev_dist" not in inputs:
+        hfile = open(input_dir + "EV_histogram.csv")
+        ev_dist = array([])
+
+        for line in hfile:
+            try:
+                ev_dist = append(ev_dist, float(line[:-1]))
+            except ValueError:
+                ev_dist = append(ev_dist, float(0.0))
+
+        hfile.close()
+
+        assert len(ev_dist) == 538
+        inputs["ev_dist"] = ev_dist
+
+    # Get the boundaries for the 95% Confidence Interval
+    if "ev_estimates" not in inputs:
+        efile = open(input_dir + "EV_estimates.csv")
+        inputs["ev_estimates"] = efile.read()[:-1].split(",")
+        efile.close()
+
+    return inputs
+
+
+# Draws the histogram bars and the 269 EV line which both sizes share, and
+# returns the template of the size with them
 
-hfile = open("../matlab/EV_histogram.csv")
-ev_dist = array([])
+def build_histogram(inputs):
+    ev_dist = inputs["ev_dist"]
+    ev_dist_max = max(ev_dist)
+    low95bound = int(inputs["ev_estimates"][9])
+    high95bound = int(inputs["ev_estimates"][10])
 
-for line in hfile:
-	try:
-		ev_dist = append(ev_dist, float(line[:-1]))
-	except ValueError:
-		ev_dist = append(ev_dist, float(0.0))
+    figure = plot_templates.new_figure()
+    ax = figure.add_subplot(111, axisbelow=True)
 
-hfile.close()
+    # Split the histogram so that the outer 5% (2.5% on each side) are drawn
+    # in mint green
+    bars = []
+    bars.extend(ax.bar(arange(low95bound-1), ev_dist[:low95bound-1] *
+            float(100.0), 1.0, color="#8bd98b", edgecolor='#8bd98b'))
+    ci_bars = ax.bar(arange(low95bound-1, high95bound),
+            ev_dist[low95bound-1:high95bound] * float(100.0), 1.0,
+            edgecolor='blue')
+    bars.extend(ci_bars)
+    bars.extend(ax.bar(arange(high95bound, 538), ev_dist[high95bound:] *
+            float(100.0), 1.0, color="#8bd98b", edgecolor='#8bd98b'))
 
-assert len(ev_dist) == 538
-ev_dist_max = max(ev_dist)
+    # Draw a red line at 269 EV
+    (line,) = ax.plot((269, 269), (0, ev_dist_max * 105), '-r',
+            linewidth=1.5)
 
-# Get the boundaries for the 95% Confidence Interval
+    ax.set_xlim(220, 400)
+    ax.set_ylim(0, ev_dist_max * 105)
+    ax.set_xticks(arange(220, 420, 20))
 
-efile = open("../matlab/EV_estimates.csv")
-values = efile.read()[:-1].split(",")
-efile.close()
+    ax.grid(color='#aaaaaa')
+
+    return {"figure": figure, "axes": ax, "bars": bars,
+            "ci_facecolor": ci_bars[0].get_facecolor(), "line": line,
+            "texts": []}
+
+
+# Adds a label to the template at a height of scale times the tallest bar.
+# If under is given, as the first and last EV the label spans, the label
+# sits that much above the tallest bar under it.
+
+def add_text(template, inputs, x, scale, s, under=None, **kwargs):
+    t = template["axes"].text(x, text_height(inputs["ev_dist"], scale, under),
+            s, **kwargs)
+    template["texts"].append((t, scale, under))
+    return t
+
+
+def text_height(ev_dist, scale, under):
+    ev_dist_max = max(ev_dist)
+    if under is None:
+        return ev_dist_max * scale
+
+    (label_begins, label_ends) = under
+    max_height_under_label = max(ev_dist[label_begins:label_ends]) * 100
+    return ev_dist_max * scale + max_height_under_label
+
+
+# Updates the bars, the line, the labels and the timestamp of the template
+# to the inputs
+
+def update_histogram(template, inputs):
+    ev_dist = inputs["ev_dist"]
+    ev_dist_max = max(ev_dist)
+    low95bound = int(inputs["ev_estimates"][9])
+    high95bound = int(inputs["ev_estimates"][10])
+
+    # The outer 5% (2.5% on each side) are drawn in mint green
+    for (i, rect) in enumerate(template["bars"]):
+        rect.set_height(ev_dist[i] * float(100.0))
+        if i < low95bound-1 or i >= high95bound:
+            rect.set_facecolor("#8bd98b")
+            rect.set_edgecolor('#8bd98b')
+        else:
+            rect.set_facecolor(template["ci_facecolor"])
+            rect.set_edgecolor('blue')
+
+    template["line"].set_ydata((0, ev_dist_max * 105))
+    template["axes"].set_ylim(0, ev_dist_max * 105)
+
+    for (t, scale, under) in template["texts"]:
+        t.set_y(text_height(ev_dist, scale, under))
+
+    if "timestamp" in template:
+        template["timestamp"].set_text(
+                time.strftime(template["timestamp_format"]))
 
-low95bound = int(values[9])
-high95bound = int(values[10])
 
 ############################################################################
 #
@@ -59,48 +180,40 @@ high95bound = int(values[10])
 #
 ############################################################################
 
-subplot(111, axisbelow=True)
+def build_thumbnail(inputs):
+    template = build_histogram(inputs)
+    ax = template["axes"]
 
-# Split the histogram so that the outer 5% (2.5% on each side) are drawn
-# in mint green
-bar(arange(low95bound-1), ev_dist[:low95bound-1] * float(100.0), 1.0,
-		color="#8bd98b", edgecolor='#8bd98b')
-bar(arange(low95bound-1, high95bound), ev_dist[low95bound-1:high95bound]
-		* float(100.0), 1.0, edgecolor='blue')
-bar(arange(high95bound, 538), ev_dist[high95bound:] * float(100.0), 1.0,
-		color="#8bd98b", edgecolor='#8bd98b')
+    ax.set_xlabel('Obama EV', fontsize=26, fontweight='bold');
+    ax.set_ylabel('Probability (%)', fontsize=25, fontweight='bold')
+    ax.set_title('All possible outcomes', fontsize=27, fontweight='bold')
 
-# Draw a red line at 269 EV
-plot((269, 269), (0, ev_dist_max * 105), '-r', linewidth=1.5)
+    add_text(template, inputs, 223, 95, 'Romney', fontsize=24, fontweight='bold')
+    add_text(template, inputs, 223, 88, 'wins', fontsize=24, fontweight='bold')
+    add_text(template, inputs, 223, 79, 'today', fontsize=24, fontweight='bold')
+    add_text(template, inputs, 365, 95, 'Obama', fontsize=24, fontweight='bold')
+    add_text(template, inputs, 377, 88, 'wins', fontsize=24, fontweight='bold')
+    add_text(template, inputs, 372, 79, 'today', fontsize=24, fontweight='bold')
 
-xlim(220, 400)
-ylim(0, ev_dist_max * 105)
-xticks(arange(220, 420, 20))
+    label_begins = 222
+    label_ends = 280
 
-grid(color='#aaaaaa')
+    template["timestamp_format"] = "%d-%b\n%I:%M%p %Z"
+    template["timestamp"] = add_text(template, inputs, label_begins, 5, "",
+            (label_begins, label_ends), fontsize=21)
 
-xlabel('Obama EV', fontsize=26, fontweight='bold');
-ylabel('Probability (%)', fontsize=25, fontweight='bold')
-title('All possible outcomes', fontsize=27, fontweight='bold')
+    return template
 
-text(223, ev_dist_max * 95, 'Romney', fontsize=24, fontweight='bold')
-text(223, ev_dist_max * 88, 'wins', fontsize=24, fontweight='bold')
-text(223, ev_dist_max * 79, 'today', fontsize=24, fontweight='bold')
-text(365, ev_dist_max * 95, 'Obama', fontsize=24, fontweight='bold')
-text(377, ev_dist_max * 88, 'wins', fontsize=24, fontweight='bold')
-text(372, ev_dist_max * 79, 'today', fontsize=24, fontweight='bold')
 
-label_begins = 222
-label_ends = 280
-max_height_under_label = max(ev_dist[label_begins:label_ends]) * 100
+def draw_thumbnail(inputs):
+    template = plot_templates.load_template("EV_histogram_today-200px",
+            __file__, lambda: build_thumbnail(inputs))
+    update_histogram(template, inputs)
 
-text(label_begins, ev_dist_max * 5 + max_height_under_label,
-		time.strftime("%d-%b\n%I:%M%p %Z"), fontsize=21)
+    template["figure"].savefig('EV_histogram_today-200px.png', dpi=25)
 
-show()
-savefig(open('EV_histogram_today-200px.png', 'w'), dpi=25)
+    return ['EV_histogram_today-200px.png']
 
-clf()
 
 ############################################################################
 #
@@ -108,44 +221,55 @@ clf()
 #
 ############################################################################
 
-subplot(111, axisbelow=True)
+def build_large(inputs):
+    template = build_histogram(inputs)
+    ax = template["axes"]
+
+    ax.set_xlabel('Electoral votes for Obama', fontsize=16);
+    ax.set_ylabel('Probability of exact # of EV (%)', fontsize=16)
+    ax.set_title('Distribution of all possible outcomes', fontsize=18,
+            fontweight='bold')
+
+    add_text(template, inputs, 223, 99, 'Romney wins', fontsize=16,
+            fontweight='bold')
+    add_text(template, inputs, 223, 93, 'today', fontsize=16,
+            fontweight='bold')
+    add_text(template, inputs, 355, 99, 'Obama wins', fontsize=16,
+            fontweight='bold')
+    add_text(template, inputs, 379, 93, 'today', fontsize=16,
+            fontweight='bold')
+
+    label_begins = 222
+    label_ends = 285
+
+    template["timestamp_format"] = "%d-%b %I:%M%p %Z"
+    template["timestamp"] = add_text(template, inputs, label_begins, 13, "",
+            (label_begins, label_ends), fontsize=14)
+    add_text(template, inputs, label_begins, 7, 'election.princeton.edu',
+            (label_begins, label_ends), fontsize=14)
+
+    return template
 
-# Split the histogram so that the outer 5% (2.5% on each side) are drawn
-# in mint green
-bar(arange(low95bound-1), ev_dist[:low95bound-1] * float(100.0), 1.0,
-		color="#8bd98b", edgecolor='#8bd98b')
-bar(arange(low95bound-1, high95bound), ev_dist[low95bound-1:high95bound]
-		* float(100.0), 1.0, edgecolor='blue')
-bar(arange(high95bound, 538), ev_dist[high95bound:] * float(100.0), 1.0,
-		color="#8bd98b", edgecolor='#8bd98b')
 
-# Draw a red line at 269 EV
-plot((269, 269), (0, ev_dist_max * 105), '-r', linewidth=1.5)
+def draw_large(inputs):
+    template = plot_templates.load_template("EV_histogram_today", __file__,
+            lambda: build_large(inputs))
+    update_histogram(template, inputs)
 
-xlim(220, 400)
-ylim(0, ev_dist_max * 105)
-xticks(arange(220, 420, 20))
+    template["figure"].savefig('EV_histogram_today.png', dpi=62.5,
+            facecolor='#fcfcf4', edgecolor='#fcfcf4')
 
-grid(color='#aaaaaa')
+    return ['EV_histogram_today.png']
 
-xlabel('Electoral votes for Obama', fontsize=16);
-ylabel('Probability of exact # of EV (%)', fontsize=16)
-title('Distribution of all possible outcomes', fontsize=18, fontweight='bold')
 
-text(223, ev_dist_max * 99, 'Romney wins', fontsize=16, fontweight='bold')
-text(223, ev_dist_max * 93, 'today', fontsize=16, fontweight='bold')
-text(355, ev_dist_max * 99, 'Obama wins', fontsize=16, fontweight='bold')
-text(379, ev_dist_max * 93, 'today', fontsize=16, fontweight='bold')
+# The graphics, each a name and the function which draws it. Each function
+# returns the files it wrote.
 
-label_begins = 222
-label_ends = 285
-max_height_under_label = max(ev_dist[label_begins:label_ends]) * 100
+figures = [("EV_histogram_today-200px", draw_thumbnail),
+           ("EV_histogram_today", draw_large)]
 
-text(label_begins, ev_dist_max * 13 + max_height_under_label,
-		time.strftime("%d-%b %I:%M%p %Z"), fontsize=14)
-text(label_begins, ev_dist_max * 7  + max_height_under_label,
-		'election.princeton.edu', fontsize=14)
 
-show()
-savefig(open('EV_histogram_today.png', 'w'), dpi=62.5, facecolor='#fcfcf4',
-		edgecolor='#fcfcf4')
+if __name__ == '__main__':
+    inputs = load_inputs()
+    for (name, draw) in figures:
+        draw(inputs)
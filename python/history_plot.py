@@ -12,6 +12,14 @@
 # causes it to crash when attempting to plot this graphic in an automated
 # environment without a display.)
 #
+# The inputs are read by load_inputs, and each graphic is drawn by one of
+# the functions in figures, so that render.py can draw them together with
+# the other graphics. Run on its own, the script draws all of them.
+#
+# Each size of the graphic is drawn on a template from plot_templates.py,
+# which is built once with the axes and labels. For each day, only the
+# median, its 95% band, the prediction and the timestamp are updated.
+#
 # Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
 #
 # Script written for election.princeton.edu run by Samuel S.-H. Wang under
@@ -34,6 +42,8 @@ import matplotlib
 matplotlib.use('Agg')
 from pylab import *
 import datetime
+import ev_history
+import plot_templates
 
 def campaign_day(day):
     jan_one = datetime.date(datetime.date.today().year, 1, 1)
@@ -46,100 +56,164 @@ campaign_months.extend(map(
                         lambda m: campaign_day(datetime.date(2012, m, 1)),
                         xrange(6, 12))) # June - November
 
-hfile = open("../matlab/EV_estimate_history.csv")
-ev_hist = array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
-
-# Build a numpy array from the CSV file, except for the last entry
-for line in hfile:
-    if line[0] != '#':
-        ev_hist = append(ev_hist, [map(int, line[:-1].split(",")[:-1])], axis=0)
-
-hfile.close()
-ev_hist = delete(ev_hist, 0, 0)
-
-#    Each line of EV_estimate_history should contain:
-#    1 value - date code
-#    2 values - medianEV for the two candidates, where a margin>0 favors the
-#			first candidate (in our case, Obama);
-#    2 values - modeEV for the two candidates;
-#    3 values - assigned (>95% prob) EV for each candidate, with a third entry
-#			for undecided;
-#    4 values - confidence intervals for candidate 1's EV: +/-1 sigma, then
-#			95% band; and
-#    1 value - number of state polls used to make the estimates.
-#    1 value - metamargin
-
-dates = ev_hist[:,0]
-medianDem = ev_hist[:,1]
-modeDem = ev_hist[:,3]
-lowDem95 = ev_hist[:,10]
-highDem95 = ev_hist[:,11]
+election = campaign_day(datetime.date(2012, 11, 6))
+
+input_dir = "../matlab/"
+
+# The files in input_dir which the graphics are drawn from. render.py
+# draws the graphics again only when one of these, or this script, has
+# changed.
+input_files = ["EV_estimate_history.csv", "EV_prediction.csv"]
 
 ############################################################################
 #
-# Thumbnail-size graphic, 200px wide, for the right sidebar display
-# throughout the blog.
+# Inputs
 #
 ############################################################################
 
-subplot(111, axisbelow=True, axisbg='w')
+# Adds the inputs of the graphics to the dictionary inputs, unless they
+# are already there, and returns it
 
-plot((campaign_start-2, 320), (269, 269), '-r', linewidth=1)
+def load_inputs(inputs=None):
+    if inputs is None:
+        inputs = {}
 
-yticks(arange(160, 400, 20))
-xticks(campaign_months,
-		('      May','          Jun',
-		 '          Jul','          Aug','          Sep',
-		 '          Oct','        Nov'), fontsize=19)
+    if "history" not in inputs:
+        inputs["history"] = ev_history.load_history(input_dir +
+                                                    "EV_estimate_history.csv")
 
+    if "ev_prediction" not in inputs:
+        pfile = open(input_dir + "EV_prediction.csv")
+        prediction = {}
 
-grid(color='#aaaaaa')
+        (prediction["1sigma_low"], prediction["1sigma_high"],
+         prediction["2sigma_low"], prediction["2sigma_high"]) = \
+            map(int, pfile.read().strip().split(","))
 
-title("Median EV estimator", fontsize=27, fontweight='bold')
-ylabel("Obama EV", fontsize=25, fontweight='bold')
+        pfile.close()
+        inputs["ev_prediction"] = prediction
 
-plot(dates, medianDem, '-k', linewidth=2)
+    return inputs
 
-xs, ys = poly_between(dates, lowDem95, highDem95)
-fill(xs, ys, '#222222', alpha=0.075, edgecolor='none')
 
-#
-# hurricane tracker prediction ... functions would be nice :-(
-#
-pfile = open("../matlab/EV_prediction.csv")
-prediction = {}
+# Draws the median and its 95% band, and the hurricane tracker prediction
+# from the last day to election day, which both sizes share, and adds them
+# to the template
 
-(prediction["1sigma_low"], prediction["1sigma_high"], prediction["2sigma_low"],
-        prediction["2sigma_high"]) = map(int, pfile.read().strip().split(","))
+def build_history(template, inputs):
+    history = inputs["history"]
+    prediction = inputs["ev_prediction"]
+    ax = template["axes"]
 
-pfile.close()
+    dates = history["date"]
+    medianDem = history["median_dem"]
+    lowDem95 = history["low_95"]
+    highDem95 = history["high_95"]
+
+    (template["median"],) = ax.plot(dates, medianDem, '-k', linewidth=2)
+
+    xs, ys = poly_between(dates, lowDem95, highDem95)
+    (template["band"],) = ax.fill(xs, ys, '#222222', alpha=0.075,
+            edgecolor='none')
+
+    #
+    # hurricane tracker prediction
+    #
+    low = min(prediction["2sigma_low"], lowDem95[-1])
+    high = max(prediction["2sigma_high"], highDem95[-1])
+    xs, ys = poly_between([dates[-1], election], [lowDem95[-1], low], [highDem95[-1], high])
+    (template["2sigma_cone"],) = ax.fill(xs, ys, 'yellow', alpha=0.3,
+            edgecolor='none')
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    (template["2sigma_bar"],) = ax.fill(xs, ys, 'yellow', edgecolor='none')
+
+    low = prediction["1sigma_low"]
+    high = prediction["1sigma_high"]
+    xs, ys = poly_between([dates[-1], election], [medianDem[-1], low], [medianDem[-1]+1, high])
+    (template["1sigma_cone"],) = ax.fill(xs, ys, 'red', alpha=0.2,
+            edgecolor='red')
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    (template["1sigma_bar"],) = ax.fill(xs, ys, 'red', edgecolor='none')
 
-election = campaign_day(datetime.date(2012, 11, 6))
 
-low = min(prediction["2sigma_low"], lowDem95[-1])
-high = max(prediction["2sigma_high"], highDem95[-1])
-xs, ys = poly_between([dates[-1], election], [lowDem95[-1], low], [highDem95[-1], high])
-fill(xs, ys, 'yellow', alpha=0.3, edgecolor='none')
-xs, ys = poly_between([election, election+2], [low, low], [high, high])
-fill(xs, ys, 'yellow', edgecolor='none')
-
-low = prediction["1sigma_low"]
-high = prediction["1sigma_high"]
-xs, ys = poly_between([dates[-1], election], [medianDem[-1], low], [medianDem[-1]+1, high])
-fill(xs, ys, 'red', alpha=0.2, edgecolor='red')
-xs, ys = poly_between([election, election+2], [low, low], [high, high])
-fill(xs, ys, 'red', edgecolor='none')
+# Updates the median, its 95% band, the prediction and the timestamp of the
+# template to the inputs
+
+def update_history(template, inputs):
+    history = inputs["history"]
+    prediction = inputs["ev_prediction"]
+
+    dates = history["date"]
+    medianDem = history["median_dem"]
+    lowDem95 = history["low_95"]
+    highDem95 = history["high_95"]
+
+    template["median"].set_data(dates, medianDem)
+
+    xs, ys = poly_between(dates, lowDem95, highDem95)
+    template["band"].set_xy(column_stack((xs, ys)))
+
+    low = min(prediction["2sigma_low"], lowDem95[-1])
+    high = max(prediction["2sigma_high"], highDem95[-1])
+    xs, ys = poly_between([dates[-1], election], [lowDem95[-1], low], [highDem95[-1], high])
+    template["2sigma_cone"].set_xy(column_stack((xs, ys)))
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    template["2sigma_bar"].set_xy(column_stack((xs, ys)))
+
+    low = prediction["1sigma_low"]
+    high = prediction["1sigma_high"]
+    xs, ys = poly_between([dates[-1], election], [medianDem[-1], low], [medianDem[-1]+1, high])
+    template["1sigma_cone"].set_xy(column_stack((xs, ys)))
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    template["1sigma_bar"].set_xy(column_stack((xs, ys)))
+
+    if "timestamp" in template:
+        template["timestamp"].set_text(time.strftime("%d-%b-%Y %I:%M%p %Z"))
+
+
+############################################################################
 #
-# end hurricane tracker prediction
+# Thumbnail-size graphic, 200px wide, for the right sidebar display
+# throughout the blog.
 #
+############################################################################
 
-xlim(campaign_start, 320)
-ylim(157, 383)
+def build_thumbnail(inputs):
+    figure = plot_templates.new_figure()
+    ax = figure.add_subplot(111, axisbelow=True, axisbg='w')
+    template = {"figure": figure, "axes": ax}
 
-show()
-savefig(open('EV_history-200px.png', 'w'), dpi=25)
+    ax.plot((campaign_start-2, 320), (269, 269), '-r', linewidth=1)
+
+    ax.set_yticks(arange(160, 400, 20))
+    ax.set_xticks(campaign_months)
+    ax.set_xticklabels(('      May','          Jun',
+             '          Jul','          Aug','          Sep',
+             '          Oct','        Nov'), fontsize=19)
+
+
+    ax.grid(color='#aaaaaa')
+
+    ax.set_title("Median EV estimator", fontsize=27, fontweight='bold')
+    ax.set_ylabel("Obama EV", fontsize=25, fontweight='bold')
+
+    build_history(template, inputs)
+
+    ax.set_xlim(campaign_start, 320)
+    ax.set_ylim(157, 383)
+
+    return template
+
+
+def draw_thumbnail(inputs):
+    template = plot_templates.load_template("EV_history-200px", __file__,
+            lambda: build_thumbnail(inputs))
+    update_history(template, inputs)
+
+    template["figure"].savefig('EV_history-200px.png', dpi=25)
+
+    return ['EV_history-200px.png']
 
-clf()
 
 ############################################################################
 #
@@ -147,122 +221,135 @@ clf()
 #
 ############################################################################
 
-subplot(111, axisbelow=True, axisbg='w')
+def build_large(inputs):
+    figure = plot_templates.new_figure()
+    ax = figure.add_subplot(111, axisbelow=True, axisbg='w')
+    template = {"figure": figure, "axes": ax}
 
-plot((campaign_start-2, 320), (269, 269), '-r', linewidth=1)
+    ax.plot((campaign_start-2, 320), (269, 269), '-r', linewidth=1)
 
-yticks(arange(160, 400, 20))
-xticks(campaign_months,
-		('        May','            Jun',
-		 '            Jul','            Aug','            Sep',
-		 '            Oct','        Nov'), fontsize=16)
+    ax.set_yticks(arange(160, 400, 20))
+    ax.set_xticks(campaign_months)
+    ax.set_xticklabels(('        May','            Jun',
+             '            Jul','            Aug','            Sep',
+             '            Oct','        Nov'), fontsize=16)
 
 
-grid(color='#aaaaaa')
+    ax.grid(color='#aaaaaa')
 
-title("Median EV estimator", fontsize=18,
-		fontweight='bold')
-ylabel("Obama EV",fontsize=16)
-text(campaign_start+3, 172, time.strftime("%d-%b-%Y %I:%M%p %Z"), fontsize=14)
-text(campaign_start+3, 159, "election.princeton.edu", fontsize=14)
+    ax.set_title("Median EV estimator", fontsize=18,
+            fontweight='bold')
+    ax.set_ylabel("Obama EV",fontsize=16)
+    template["timestamp"] = ax.text(campaign_start+3, 172, "", fontsize=14)
+    ax.text(campaign_start+3, 159, "election.princeton.edu", fontsize=14)
 
-plot(dates, medianDem, '-k', linewidth=2)
+    build_history(template, inputs)
 
-xs, ys = poly_between(dates, lowDem95, highDem95)
-fill(xs, ys, '#222222', alpha=0.075, edgecolor='none')
+    ax.text(314, 327, "Prediction", fontsize=14, rotation='270')
 
-#
-# hurricane tracker prediction
-#
-election = campaign_day(datetime.date(2012, 11, 6))
+    ## Election Day indicator
+    ax.axvline(x=election, linestyle='--', color='black')
 
-low = min(prediction["2sigma_low"], lowDem95[-1])
-high = max(prediction["2sigma_high"], highDem95[-1])
-xs, ys = poly_between([dates[-1], election], [lowDem95[-1], low], [highDem95[-1], high])
-fill(xs, ys, 'yellow', alpha=0.3, edgecolor='none')
-xs, ys = poly_between([election, election+2], [low, low], [high, high])
-fill(xs, ys, 'yellow', edgecolor='none')
-
-low = prediction["1sigma_low"]
-high = prediction["1sigma_high"]
-xs, ys = poly_between([dates[-1], election], [medianDem[-1], low], [medianDem[-1]+1, high])
-fill(xs, ys, 'red', alpha=0.2, edgecolor='red')
-xs, ys = poly_between([election, election+2], [low, low], [high, high])
-fill(xs, ys, 'red', edgecolor='none')
-
-text(314, 327, "Prediction", fontsize=14, rotation='270')
-#
-# end hurricane tracker prediction
-#
+    ax.set_xlim(campaign_start, 320)
+    ax.set_ylim(157, 383)
+
+    return template
+
+
+def draw_large(inputs):
+    template = plot_templates.load_template("EV_history", __file__,
+            lambda: build_large(inputs))
+    update_history(template, inputs)
+    figure = template["figure"]
+
+    figure.savefig('EV_history-unlabeled.png', dpi=62.5, facecolor='#fcfcf4',
+            edgecolor='#fcfcf4')
 
-## Election Day indicator
-day=campaign_day(datetime.date(2012, 11, 6))
-axvline(x=day, linestyle='--', color='black')
+    # The annotations are placed by the median, so they are drawn anew each
+    # time, and taken off again to leave the template as it was
+    annotations = draw_annotations(template["axes"],
+                                   inputs["history"]["median_dem"])
 
-xlim(campaign_start, 320)
-ylim(157, 383)
+    figure.savefig('EV_history.png', dpi=62.5, facecolor='#fcfcf4',
+            edgecolor='#fcfcf4')
+
+    figure.savefig('EV_history-full_size.png', facecolor='#fcfcf4',
+            edgecolor='#fcfcf4')
+
+    for annotation in annotations:
+        annotation.remove()
+
+    return ['EV_history-unlabeled.png', 'EV_history.png',
+            'EV_history-full_size.png']
 
-show()
-savefig(open('EV_history-unlabeled.png', 'w'), dpi=62.5, facecolor='#fcfcf4',
-		edgecolor='#fcfcf4')
 
 ## Annotations 
 
-# July 12
-day=campaign_day(datetime.date(2012, 7, 12))
-annotate("Bain", xy=(day, 303), xytext=(float(day) + 0.01,
-	303-42), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# August 11
-day=campaign_day(datetime.date(2012, 8, 11))
-annotate("Ryan\nas VP", xy=(day, 333), xytext=(float(day) + 0.01,
-	333+42), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# August 30
-day=campaign_day(datetime.date(2012, 8, 30))
-annotate("RNC", xy=(day, medianDem[day-campaign_start]+2), xytext=(float(day) + 0.01,
-	medianDem[day-campaign_start]+42), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# Sept 6
-day=campaign_day(datetime.date(2012, 9, 6))
-annotate("DNC", xy=(day, medianDem[day-campaign_start]-2), xytext=(float(day) + 0.01,
-	medianDem[day-campaign_start]-42), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# Sept 17
-day=campaign_day(datetime.date(2012, 9, 17))
-annotate("47%", xy=(day, medianDem[day-campaign_start]-7), xytext=(float(day) + 0.01,
-	medianDem[day-campaign_start]-47), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# Oct 3
-day=campaign_day(datetime.date(2012, 10, 3))
-annotate("Debate #1",xy=(day, medianDem[day-campaign_start]+15), xytext=(float(day) + 0.01,
-	medianDem[day-campaign_start]+42), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# Oct 16
-day=campaign_day(datetime.date(2012, 10, 16))
-annotate("Debate #2", xy=(day, medianDem[day-campaign_start]-2), xytext=(float(day) + 0.01,
-	medianDem[day-campaign_start]-42), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='center', verticalalignment='top', fontsize=12)
-# Oct 22
-day=campaign_day(datetime.date(2012, 10, 22))
-annotate("Debate\n#3", xy=(day, medianDem[day-campaign_start]-7), xytext=(float(day) - 2.01,
-	medianDem[day-campaign_start]-34), textcoords='data', arrowprops=dict(facecolor='darkblue',
-	edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
-	horizontalalignment='left', verticalalignment='top', fontsize=12)
+def draw_annotations(ax, medianDem):
+    annotations = []
+
+    # July 12
+    day=campaign_day(datetime.date(2012, 7, 12))
+    annotations.append(ax.annotate("Bain", xy=(day, 303), xytext=(float(day) + 0.01,
+        303-42), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # August 11
+    day=campaign_day(datetime.date(2012, 8, 11))
+    annotations.append(ax.annotate("Ryan\nas VP", xy=(day, 333), xytext=(float(day) + 0.01,
+        333+42), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # August 30
+    day=campaign_day(datetime.date(2012, 8, 30))
+    annotations.append(ax.annotate("RNC", xy=(day, medianDem[day-campaign_start]+2), xytext=(float(day) + 0.01,
+        medianDem[day-campaign_start]+42), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # Sept 6
+    day=campaign_day(datetime.date(2012, 9, 6))
+    annotations.append(ax.annotate("DNC", xy=(day, medianDem[day-campaign_start]-2), xytext=(float(day) + 0.01,
+        medianDem[day-campaign_start]-42), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # Sept 17
+    day=campaign_day(datetime.date(2012, 9, 17))
+    annotations.append(ax.annotate("47%", xy=(day, medianDem[day-campaign_start]-7), xytext=(float(day) + 0.01,
+        medianDem[day-campaign_start]-47), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # Oct 3
+    day=campaign_day(datetime.date(2012, 10, 3))
+    annotations.append(ax.annotate("Debate #1",xy=(day, medianDem[day-campaign_start]+15), xytext=(float(day) + 0.01,
+        medianDem[day-campaign_start]+42), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # Oct 16
+    day=campaign_day(datetime.date(2012, 10, 16))
+    annotations.append(ax.annotate("Debate #2", xy=(day, medianDem[day-campaign_start]-2), xytext=(float(day) + 0.01,
+        medianDem[day-campaign_start]-42), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='center', verticalalignment='top', fontsize=12))
+    # Oct 22
+    day=campaign_day(datetime.date(2012, 10, 22))
+    annotations.append(ax.annotate("Debate\n#3", xy=(day, medianDem[day-campaign_start]-7), xytext=(float(day) - 2.01,
+        medianDem[day-campaign_start]-34), textcoords='data', arrowprops=dict(facecolor='darkblue',
+        edgecolor='darkblue', shrink=0.075, width=0.5, headwidth=4),
+        horizontalalignment='left', verticalalignment='top', fontsize=12))
+
+    return annotations
 
 ## End Annotations 
 
-show()
-savefig(open('EV_history.png', 'w'), dpi=62.5, facecolor='#fcfcf4',
-		edgecolor='#fcfcf4')
 
-show()
-savefig(open('EV_history-full_size.png', 'w'), facecolor='#fcfcf4',
-		edgecolor='#fcfcf4')
+# The graphics, each a name and the function which draws it. Each function
+# returns the files it wrote.
+
+figures = [("EV_history-200px", draw_thumbnail),
+           ("EV_history", draw_large)]
+
+
+if __name__ == '__main__':
+    inputs = load_inputs()
+    for (name, draw) in figures:
+        draw(inputs)
@@ -6,7 +6,7 @@
 # voters in different swing states have over the outcome of the election.
 # The influence statistic is normalized so that NJ voters, living in a
 # non-swing state have power 1.0, hence the term "jerseyvotes." The statistic
-# is calculated by the MATLAB script EV_jerseyvotes.m
+# is calculated by the MATLAB script EV_jerseyvotes.m, or by voter_power.py
 #
 # Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
 #
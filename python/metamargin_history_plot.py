@@ -2,6 +2,16 @@
 
 ############################################################################
 #
+# This script produces the history plot graphics for the meta-margin on
+# each day of the campaign season, with the prediction for election day.
+# The inputs are read by load_inputs, and each graphic is drawn by one of
+# the functions in figures, so that render.py can draw them together with
+# the other graphics. Run on its own, the script draws all of them.
+#
+# The graphic is drawn on a template from plot_templates.py, which is built
+# once with the axes and labels. For each day, only the meta-margin, the
+# prediction and the timestamp are updated.
+#
 # Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
 #
 # Script written for election.princeton.edu run by Samuel S.-H. Wang under
@@ -22,6 +32,8 @@ import matplotlib
 matplotlib.use('Agg')
 from pylab import *
 import datetime
+import ev_history
+import plot_templates
 
 def campaign_day(day):
     jan_one = datetime.date(datetime.date.today().year, 1, 1)
@@ -34,108 +46,164 @@ campaign_months.extend(map(
                         lambda m: campaign_day(datetime.date(2012, m, 1)),
                         xrange(6, 12))) # June - November
 
-hfile = open("../matlab/EV_estimate_history.csv")
-ev_hist = array([[0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]])
-metamargin = array([[ 0 ]])
-
-# Build a numpy array from the CSV file, except for the last entry
-for line in hfile:
-    if line[0] != '#':
-        ev_hist = append(ev_hist, [map(int, line[:-1].split(",")[:-1])], axis=0)
-        foo = line[:-1].split(",")[-1]
-        metamargin = append(metamargin, [[ float(foo) ]], axis=0)
-
-hfile.close()
-ev_hist = delete(ev_hist, 0, 0)
-metamargin = delete(metamargin, 0, 0)
-
-#    Each line of EV_estimate_history should contain:
-#    1 value - date code
-#    2 values - medianEV for the two candidates, where a margin>0 favors the
-#			first candidate (in our case, Obama);
-#    2 values - modeEV for the two candidates;
-#    3 values - assigned (>95% prob) EV for each candidate, with a third entry
-#			for undecided;
-#    4 values - confidence intervals for candidate 1's EV: +/-1 sigma, then
-#			95% band; and
-#    1 value - number of state polls used to make the estimates.
-#	 1 value - metamargin
-
-dates = ev_hist[:,0]
-medianBO = ev_hist[:,1]
-modeBO = ev_hist[:,3]
-lowBO95 = ev_hist[:,10]
-highBO95 = ev_hist[:,11]
-metamargin = metamargin[:,0]
+election = campaign_day(datetime.date(2012, 11, 6))
+
+input_dir = "../matlab/"
+
+# The files in input_dir which the graphics are drawn from. render.py
+# draws the graphics again only when one of these, or this script, has
+# changed.
+input_files = ["EV_estimate_history.csv", "EV_prediction_MM.csv"]
 
 ############################################################################
 #
-# Larger graphic, 500px wide, designed to fit in the center content column.
+# Inputs
 #
 ############################################################################
 
-subplot(111, axisbelow=True, axisbg='w')
+# Adds the inputs of the graphics to the dictionary inputs, unless they
+# are already there, and returns it
+
+def load_inputs(inputs=None):
+    if inputs is None:
+        inputs = {}
 
-plot((90, 320), (0, 0), '-r', linewidth=1)
+    if "history" not in inputs:
+        inputs["history"] = ev_history.load_history(input_dir +
+                                                    "EV_estimate_history.csv")
 
-yticks(arange(-2, 10, 2))
-xticks(campaign_months,
-		('        May','            Jun',
-		 '            Jul','            Aug','            Sep',
-		 '            Oct','        Nov'), fontsize=16)
+    if "mm_prediction" not in inputs:
+        pfile = open(input_dir + "EV_prediction_MM.csv")
+        prediction = {}
 
+        (prediction["1sigma_low"], prediction["1sigma_high"],
+         prediction["2sigma_low"], prediction["2sigma_high"]) = \
+            map(float, pfile.read().strip().split(","))
 
-grid(color='#aaaaaa')
+        pfile.close()
+        inputs["mm_prediction"] = prediction
 
-title("History of the Meta-Margin, 2012", fontsize=18,
-		fontweight='bold')
-ylabel("Obama-Romney Popular Meta-Margin (%)",fontsize=16)
-# y-coords for date label based on ylim below
-text(campaign_start+3, -2.5, time.strftime("%d-%b-%Y %I:%M%p %Z"), fontsize=14)
-text(campaign_start+3, -3.3, "election.princeton.edu", fontsize=14)
+    return inputs
 
-plot(dates, metamargin, '-k', linewidth=2)
 
+############################################################################
 #
-# hurricane tracker prediction ... functions would be nice :-(
+# Larger graphic, 500px wide, designed to fit in the center content column.
 #
-pfile = open("../matlab/EV_prediction_MM.csv")
-prediction = {}
+############################################################################
 
-(prediction["1sigma_low"], prediction["1sigma_high"], prediction["2sigma_low"],
-        prediction["2sigma_high"]) = map(float, pfile.read().strip().split(","))
+def build_large(inputs):
+    history = inputs["history"]
+    prediction = inputs["mm_prediction"]
 
-pfile.close()
+    dates = history["date"]
+    metamargin = history["metamargin"]
 
-election = campaign_day(datetime.date(2012, 11, 6))
+    figure = plot_templates.new_figure()
+    ax = figure.add_subplot(111, axisbelow=True, axisbg='w')
+    template = {"figure": figure, "axes": ax}
+
+    ax.plot((90, 320), (0, 0), '-r', linewidth=1)
+
+    ax.set_yticks(arange(-2, 10, 2))
+    ax.set_xticks(campaign_months)
+    ax.set_xticklabels(('        May','            Jun',
+             '            Jul','            Aug','            Sep',
+             '            Oct','        Nov'), fontsize=16)
+
+
+    ax.grid(color='#aaaaaa')
+
+    ax.set_title("History of the Meta-Margin, 2012", fontsize=18,
+            fontweight='bold')
+    ax.set_ylabel("Obama-Romney Popular Meta-Margin (%)",fontsize=16)
+    # y-coords for date label based on ylim below
+    template["timestamp"] = ax.text(campaign_start+3, -2.5, "", fontsize=14)
+    ax.text(campaign_start+3, -3.3, "election.princeton.edu", fontsize=14)
+
+    (template["metamargin"],) = ax.plot(dates, metamargin, '-k', linewidth=2)
+
+    #
+    # hurricane tracker prediction
+    #
+    low = prediction["2sigma_low"]
+    high = prediction["2sigma_high"]
+    xs, ys = poly_between([dates[-1], election], [metamargin[-1], low], [metamargin[-1], high])
+    (template["2sigma_cone"],) = ax.fill(xs, ys, 'yellow', alpha=0.3,
+            edgecolor='none')
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    (template["2sigma_bar"],) = ax.fill(xs, ys, 'yellow', edgecolor='none')
+
+    low = prediction["1sigma_low"]
+    high = prediction["1sigma_high"]
+    xs, ys = poly_between([dates[-1], election], [metamargin[-1], low], [metamargin[-1], high])
+    (template["1sigma_cone"],) = ax.fill(xs, ys, 'red', alpha=0.2,
+            edgecolor='red')
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    (template["1sigma_bar"],) = ax.fill(xs, ys, 'red', edgecolor='none')
+    #
+    # end hurricane tracker prediction
+    #
+
+    ## Election Day indicator
+    ax.axvline(x=election, linestyle='--', color='black')
+
+    ax.set_xlim(campaign_start, 320)
+    ax.set_ylim(-3.5, 9.5)
+
+    return template
+
+
+# Updates the meta-margin, the prediction and the timestamp of the template
+# to the inputs
+
+def update_large(template, inputs):
+    history = inputs["history"]
+    prediction = inputs["mm_prediction"]
+
+    dates = history["date"]
+    metamargin = history["metamargin"]
+
+    template["timestamp"].set_text(time.strftime("%d-%b-%Y %I:%M%p %Z"))
+    template["metamargin"].set_data(dates, metamargin)
+
+    low = prediction["2sigma_low"]
+    high = prediction["2sigma_high"]
+    xs, ys = poly_between([dates[-1], election], [metamargin[-1], low], [metamargin[-1], high])
+    template["2sigma_cone"].set_xy(column_stack((xs, ys)))
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    template["2sigma_bar"].set_xy(column_stack((xs, ys)))
+
+    low = prediction["1sigma_low"]
+    high = prediction["1sigma_high"]
+    xs, ys = poly_between([dates[-1], election], [metamargin[-1], low], [metamargin[-1], high])
+    template["1sigma_cone"].set_xy(column_stack((xs, ys)))
+    xs, ys = poly_between([election, election+2], [low, low], [high, high])
+    template["1sigma_bar"].set_xy(column_stack((xs, ys)))
+
+
+def draw_large(inputs):
+    template = plot_templates.load_template("MM_history", __file__,
+            lambda: build_large(inputs))
+    update_large(template, inputs)
+    figure = template["figure"]
+
+    figure.savefig('MM_history-unlabeled.png', dpi=62.5, facecolor='#fcfcf4',
+            edgecolor='#fcfcf4')
+
+    figure.savefig('MM_history-full_size.png', facecolor='#fcfcf4',
+            edgecolor='#fcfcf4')
+
+    return ['MM_history-unlabeled.png', 'MM_history-full_size.png']
 
-low = prediction["2sigma_low"]
-high = prediction["2sigma_high"]
-xs, ys = poly_between([dates[-1], election], [metamargin[-1], low], [metamargin[-1], high])
-fill(xs, ys, 'yellow', alpha=0.3, edgecolor='none')
-xs, ys = poly_between([election, election+2], [low, low], [high, high])
-fill(xs, ys, 'yellow', edgecolor='none')
-
-low = prediction["1sigma_low"]
-high = prediction["1sigma_high"]
-xs, ys = poly_between([dates[-1], election], [metamargin[-1], low], [metamargin[-1], high])
-fill(xs, ys, 'red', alpha=0.2, edgecolor='red')
-xs, ys = poly_between([election, election+2], [low, low], [high, high])
-fill(xs, ys, 'red', edgecolor='none')
-#
-# end hurricane tracker prediction
-#
 
-## Election Day indicator
-axvline(x=election, linestyle='--', color='black')
+# The graphics, each a name and the function which draws it. Each function
+# returns the files it wrote.
 
-xlim(campaign_start, 320)
-ylim(-3.5, 9.5)
+figures = [("MM_history", draw_large)]
 
-show()
-savefig(open('MM_history-unlabeled.png', 'w'), dpi=62.5, facecolor='#fcfcf4',
-		edgecolor='#fcfcf4')
 
-show()
-savefig(open('MM_history-full_size.png', 'w'), facecolor='#fcfcf4',
-		edgecolor='#fcfcf4')
+if __name__ == '__main__':
+    inputs = load_inputs()
+    for (name, draw) in figures:
+        draw(inputs)
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This module keeps the templates of the nightly graphics. A template is a
+# figure with everything that does not change from day to day already
+# drawn, such as the axes, ticks, grid, labels and the 538 bars of the
+# histogram, together with the artists which the plotting scripts update
+# with each day's data before saving the figure. A template is built once
+# and kept for the rest of the process, and is also pickled into cache_dir,
+# so that later runs start from it rather than building it again. The
+# pickled template is used as long as the script which built it and the
+# version of matplotlib are unchanged.
+#
+# The templates are matplotlib Figures which are not managed by pylab, so
+# the scripts draw on them with the methods of the figure and its axes.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, hashlib, cPickle
+
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+# render.py keeps its graphics in the same directory
+cache_dir = "render_cache"
+template_suffix = ".template"
+template_cache_version = 1
+
+templates = {}
+# templates is a dictionary with an entry for each template built or loaded
+# in this process, a dictionary holding the figure (as "figure") and the
+# artists the script updates
+
+############################################################################
+#
+# Templates
+#
+############################################################################
+
+# Returns a new figure to build a template on
+
+def new_figure():
+    figure = Figure()
+    FigureCanvasAgg(figure)
+    return figure
+
+
+# Returns the template called name. If there is no usable template, build
+# is called to make one, and it is kept. script is the file of the script
+# which builds the template.
+
+def load_template(name, script, build):
+    if name in templates:
+        return templates[name]
+
+    filename = os.path.join(cache_dir, name + template_suffix)
+    key = template_key(script)
+
+    template = load_template_cache(filename, key)
+    if template is None:
+        template = build()
+        save_template_cache(filename, key, template)
+
+    templates[name] = template
+    return template
+
+
+# Returns the key which a pickled template must match to be used
+
+def template_key(script):
+    f = open(os.path.splitext(script)[0] + ".py", "rb")
+    source = f.read()
+    f.close()
+
+    h = hashlib.sha1()
+    h.update("%d %s\n" % (template_cache_version, matplotlib.__version__))
+    h.update(source)
+    return h.hexdigest()
+
+
+############################################################################
+#
+# The cache
+#
+############################################################################
+
+# Returns the pickled template, or None if there is no usable one
+
+def load_template_cache(filename, key):
+    if not os.path.exists(filename):
+        return None
+
+    try:
+        f = open(filename, "rb")
+        (cached_key, template) = cPickle.load(f)
+        f.close()
+    except (IOError, EOFError, ValueError, AttributeError, ImportError,
+            cPickle.UnpicklingError):
+        return None
+
+    if cached_key != key:
+        return None
+
+    # The canvas is not pickled with the figure
+    FigureCanvasAgg(template["figure"])
+    return template
+
+
+# Writes the template under a temporary name and then renames it, as
+# ev_history.py does with its cache. A template which cannot be written is
+# not an error.
+
+def save_template_cache(filename, key, template):
+    if not os.path.isdir(cache_dir):
+        try:
+            os.mkdir(cache_dir)
+        except OSError:
+            # Another process may have made it first
+            pass
+
+    try:
+        f = open(filename + ".new", "wb")
+        cPickle.dump((key, template), f, cPickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(filename + ".new", filename)
+    except (IOError, OSError, TypeError, cPickle.PicklingError):
+        pass
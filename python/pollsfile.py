@@ -0,0 +1,242 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This module reads and writes the binary version of polls.median.txt (and
+# polls.mean.txt), the summary statistics for each state as of each day of
+# the campaign which update_polls.py produces for the estimators. The text
+# file has to be loaded in full and scanned to find a day; the binary file
+# has an index of its days and fixed-width records, so it can be
+# memory-mapped and any single day read on its own.
+#
+# File layout (all values little-endian):
+#
+#    header  - magic, format version, number of days, number of states
+#    states  - postal abbreviation of each state, in record order
+#    index   - for each day, newest first: the day's proleptic Gregorian
+#              ordinal, its day of the year, and the byte offset of its
+#              first record
+#    records - one record per (day, state), day-major, in index order
+#
+# Each record holds the same five fields as a line of the text file:
+#
+#    num     - number of polls used
+#    oldest  - day of the year of the oldest poll's mid date
+#    margin  - median (or mean) margin
+#    sem     - estimated SEM of the margin
+#    day     - day of the year the statistics were computed for
+#
+# together with flags recording which of margin and sem were integers, so
+# that the text file can be recreated exactly from the binary one.
+#
+# Usage: pollsfile.py polls.median.bin [day of year]
+# writes the file (or the one day) in the legacy text format to stdout.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, sys, datetime
+from numpy import *
+
+magic = "PECPOLLS"
+format_version = 1
+
+header_dtype = dtype([("magic", "S8"), ("version", "<u4"),
+                      ("num_days", "<u4"), ("num_states", "<u4"),
+                      ("reserved", "<u4")])
+state_dtype = dtype("S4")
+index_dtype = dtype([("ordinal", "<i4"), ("yday", "<i4"), ("offset", "<i8")])
+record_dtype = dtype([("num", "<i4"), ("oldest", "<i4"), ("margin", "<f8"),
+                      ("sem", "<f8"), ("day", "<i4"), ("flags", "<u4")])
+
+MARGIN_IS_INT = 1
+SEM_IS_INT = 2
+
+############################################################################
+#
+# Writing
+#
+############################################################################
+
+# Writes the binary file. days holds the days, newest first, as dates;
+# states the state abbreviations; and cells, for each day, the tuple
+# (num, oldest, margin, sem, day) of each state, as in a line of the text
+# file. The file is written under a temporary name and then renamed, so
+# readers never see a partly written file.
+
+def write_polls(filename, days, states, cells):
+    num_days = len(days)
+    num_states = len(states)
+
+    header = zeros(1, dtype=header_dtype)
+    header["magic"] = magic
+    header["version"] = format_version
+    header["num_days"] = num_days
+    header["num_states"] = num_states
+
+    records_start = header_dtype.itemsize + num_states * state_dtype.itemsize \
+                    + num_days * index_dtype.itemsize
+    day_size = num_states * record_dtype.itemsize
+
+    index = zeros(num_days, dtype=index_dtype)
+    index["ordinal"] = map(lambda x: x.toordinal(), days)
+    index["yday"] = map(lambda x: x.timetuple().tm_yday, days)
+    index["offset"] = records_start + arange(num_days) * day_size
+
+    records = zeros(num_days * num_states, dtype=record_dtype)
+    for i in xrange(num_days):
+        assert len(cells[i]) == num_states
+        for j in xrange(num_states):
+            (num, oldest, margin, sem, day) = cells[i][j]
+            flags = 0
+            if isinstance(margin, (int, long)):
+                flags |= MARGIN_IS_INT
+            if isinstance(sem, (int, long)):
+                flags |= SEM_IS_INT
+            records[i * num_states + j] = (num, oldest, margin, sem, day,
+                                           flags)
+
+    f = open(filename + ".new", "wb")
+    f.write(header.tostring())
+    f.write(array(states, dtype=state_dtype).tostring())
+    f.write(index.tostring())
+    f.write(records.tostring())
+    f.close()
+    os.rename(filename + ".new", filename)
+
+
+############################################################################
+#
+# Reading
+#
+############################################################################
+
+# Returns the file as a dictionary of the states, the index, and the
+# records, which are memory-mapped so that only the days which are used
+# are read from disk. The records of day i of the index are
+# records[i * len(states) : (i + 1) * len(states)].
+
+def load_polls(filename):
+    (header, states, index) = read_header(filename)
+
+    if header["num_days"] == 0:
+        records = zeros(0, dtype=record_dtype)
+    else:
+        records = memmap(filename, dtype=record_dtype, mode="r",
+                         offset=int(index["offset"][0]),
+                         shape=(header["num_days"] * header["num_states"],))
+
+    return {"states": states, "index": index, "records": records}
+
+
+# Reads the records of a single day without mapping the rest of the file.
+# The day is either a date, or a day of the year, as in the analysisdate
+# of the MATLAB scripts. Returns None if the file has no such day.
+
+def read_day(filename, day):
+    (header, states, index) = read_header(filename)
+
+    i = find_day(index, day)
+    if i is None:
+        return None
+
+    f = open(filename, "rb")
+    f.seek(index["offset"][i])
+    records = fromfile(f, dtype=record_dtype, count=header["num_states"])
+    f.close()
+
+    return records
+
+
+# Returns the records of a day from a file returned by load_polls, or
+# None if the file has no such day
+
+def day_records(polls, day):
+    i = find_day(polls["index"], day)
+    if i is None:
+        return None
+
+    num_states = len(polls["states"])
+    return polls["records"][i * num_states:(i + 1) * num_states]
+
+
+# Returns the position in the index of a day, given as a date or a day of
+# the year. If a day of the year occurs more than once, the newest is used.
+
+def find_day(index, day):
+    if isinstance(day, datetime.date):
+        matches = flatnonzero(index["ordinal"] == day.toordinal())
+    else:
+        matches = flatnonzero(index["yday"] == day)
+
+    if len(matches) == 0:
+        return None
+    return int(matches[0])
+
+
+def read_header(filename):
+    f = open(filename, "rb")
+    header = fromfile(f, dtype=header_dtype, count=1)
+    if len(header) != 1 or header["magic"][0] != magic:
+        f.close()
+        raise IOError("%s is not a binary polls file" % filename)
+    header = header[0]
+    if header["version"] != format_version:
+        f.close()
+        raise IOError("%s has unsupported format version %d" %
+                      (filename, header["version"]))
+
+    states = fromfile(f, dtype=state_dtype, count=header["num_states"])
+    index = fromfile(f, dtype=index_dtype, count=header["num_days"])
+    f.close()
+
+    return (header, states.tolist(), index)
+
+
+############################################################################
+#
+# Export to the text format
+#
+############################################################################
+
+# Writes records in the format of polls.median.txt, one line per record
+
+def export_text(records, pfile):
+    for record in records:
+        pfile.write(format_record(record))
+
+
+def format_record(record):
+    if record["flags"] & MARGIN_IS_INT:
+        margin = int(record["margin"])
+    else:
+        margin = float64(record["margin"])
+
+    if record["flags"] & SEM_IS_INT:
+        sem = int(record["sem"])
+    else:
+        sem = float64(record["sem"])
+
+    return "%s %s %s %s %s\n" % (record["num"], record["oldest"], margin, sem,
+                                 record["day"])
+
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        records = read_day(sys.argv[1], int(sys.argv[2]))
+        if records is None:
+            print >> sys.stderr, "No records for day %s" % sys.argv[2]
+            sys.exit(1)
+    elif len(sys.argv) == 2:
+        records = load_polls(sys.argv[1])["records"]
+    else:
+        print >> sys.stderr, "Usage: %s polls.bin [day of year]" % sys.argv[0]
+        sys.exit(2)
+
+    export_text(records, sys.stdout)
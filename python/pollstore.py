@@ -0,0 +1,176 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This module keeps a compiled copy of the polls in the archive of
+# Huffington Post feed pages, so that update_polls.py does not have to
+# re-parse every archive page on every run. The store is a directory of
+# NumPy arrays, one per column, which are memory-mapped when loaded:
+#
+#    margin   - Dem - GOP margin of the poll
+#    start    - start date, as a proleptic Gregorian ordinal
+#    end      - end date, as an ordinal
+#    mid      - mid date, as an ordinal
+#    pop      - number of respondents
+#    pollster - index into the table of pollster names
+#    state    - index into the table of state abbreviations
+#    poll_id  - Huffington Post poll id
+#
+# Alongside the arrays are the pollster and state tables, the analysis
+# CSV row for each record, and a manifest. The manifest lists the archive
+# files in the store, in order, with the size, modification time and MD5
+# hash of each file when it was parsed and the number of records it
+# produced. The records of each file are stored contiguously, in manifest
+# order.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, shutil, hashlib
+from numpy import *
+
+store_version = 1
+
+columns = ("margin", "start", "end", "mid", "pop", "pollster", "state",
+           "poll_id")
+
+############################################################################
+#
+# Loading and saving
+#
+############################################################################
+
+# Returns the store in store_dir as a dictionary, or None if there is no
+# usable store there. The columns are memory-mapped, read-only arrays.
+
+def load_store(store_dir):
+    manifest_filename = os.path.join(store_dir, "manifest.txt")
+    if not os.path.exists(manifest_filename):
+        return None
+
+    f = open(manifest_filename)
+    header = f.readline().split()
+    if header != ["#", "pollstore", str(store_version)]:
+        f.close()
+        return None
+
+    manifest = []
+    for line in f:
+        (fname, size, mtime, md5, count) = line.split()
+        manifest.append((fname, (int(size), float(mtime), md5), int(count)))
+    f.close()
+
+    store = {"manifest": manifest}
+    for name in columns:
+        store[name] = load_column(store_dir, name)
+
+    store["pollsters"] = read_strings(os.path.join(store_dir, "pollsters.txt"))
+    store["states"] = read_strings(os.path.join(store_dir, "states.txt"))
+
+    f = open(os.path.join(store_dir, "rows.txt"))
+    store["rows"] = f.readlines()
+    f.close()
+
+    if len(store["rows"]) != sum(map(lambda x: x[2], manifest)):
+        return None
+
+    return store
+
+
+def load_column(store_dir, name):
+    filename = os.path.join(store_dir, name + ".npy")
+
+    # numpy refuses to memory-map an empty array
+    try:
+        return load(filename, mmap_mode="r")
+    except ValueError:
+        return load(filename)
+
+
+# Writes a new store into store_dir. The store is first written to a
+# temporary directory which then replaces the old one, so a crash part way
+# through leaves the old store intact.
+
+def save_store(store_dir, data):
+    store_dir = store_dir.rstrip("/")
+    tmp_dir = store_dir + ".new"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.mkdir(tmp_dir)
+
+    for name in columns:
+        save_column(os.path.join(tmp_dir, name + ".npy"), data[name])
+
+    write_strings(os.path.join(tmp_dir, "pollsters.txt"), data["pollsters"])
+    write_strings(os.path.join(tmp_dir, "states.txt"), data["states"])
+
+    f = open(os.path.join(tmp_dir, "rows.txt"), "w")
+    f.writelines(data["rows"])
+    f.close()
+
+    f = open(os.path.join(tmp_dir, "manifest.txt"), "w")
+    f.write("# pollstore %d\n" % store_version)
+    for (fname, (size, mtime, md5), count) in data["manifest"]:
+        f.write("%s %d %r %s %d\n" % (fname, size, mtime, md5, count))
+    f.close()
+
+    if os.path.exists(store_dir):
+        shutil.rmtree(store_dir)
+    os.rename(tmp_dir, store_dir)
+
+
+def save_column(filename, values):
+    f = open(filename, "wb")
+    save(f, asarray(values, dtype=int32))
+    f.close()
+
+
+def read_strings(filename):
+    f = open(filename)
+    strings = map(lambda x: x[:-1].decode("utf-8"), f)
+    f.close()
+    return strings
+
+
+def write_strings(filename, strings):
+    f = open(filename, "w")
+    for s in strings:
+        f.write(unicode(s).encode("utf-8") + "\n")
+    f.close()
+
+
+############################################################################
+#
+# Invalidation
+#
+############################################################################
+
+# Returns the (size, mtime, md5) signature of an archive file. If the file
+# has the same size and modification time as the previous signature, the
+# previous signature is returned without re-reading the file.
+
+def file_signature(filename, previous=None):
+    st = os.stat(filename)
+
+    if previous is not None and previous[0] == st.st_size and \
+            previous[1] == st.st_mtime:
+        return previous
+
+    f = open(filename, "rb")
+    md5 = hashlib.md5(f.read()).hexdigest()
+    f.close()
+
+    return (st.st_size, st.st_mtime, md5)
+
+
+# An archive file's records in the store are still valid if the file has
+# the same size, and either the same modification time or the same hash
+
+def signature_matches(previous, current):
+    return previous[0] == current[0] and previous[2] == current[2]
@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script draws all of the nightly matplotlib graphics in one process:
+# the histogram of histogram.py, the EV history of history_plot.py and the
+# meta-margin history of metamargin_history_plot.py. matplotlib is imported
+# and every input file is read once, before the graphics are drawn, and the
+# graphics are spread over a pool of worker processes, which share the
+# inputs with the parent. Each graphic is drawn by one worker with all of
+# its sizes, and the time it took is reported.
+#
+# Graphics whose inputs have not changed are not drawn again. Each graphic
+# has a fingerprint: a hash of the contents of the input files of its
+# script, of the script itself, of this script and of the modules it draws
+# with, of the version of matplotlib, and of today's date, since the
+# graphics are stamped with it. The files drawn for each graphic are kept
+# in cache_dir with the fingerprint they were drawn from, and when the
+# fingerprint is unchanged the kept files are copied back rather than drawn
+# again. midday.sh reruns nightly.sh, and unless the polls have moved, the
+# midday graphics are those drawn earlier the same day, with their
+# timestamps. --force draws every graphic again.
+#
+# Usage: render.py [options] [GRAPHIC ...]
+# draws the named graphics, or all of them.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, time, optparse, shutil, hashlib, cPickle, multiprocessing
+
+import matplotlib
+matplotlib.use('Agg')
+
+import histogram, history_plot, metamargin_history_plot
+import ev_history, plot_templates
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+plot_modules = [histogram, history_plot, metamargin_history_plot]
+
+# Modules which the plotting scripts draw with, which are part of the
+# fingerprint of every graphic along with this script
+library_modules = [ev_history, plot_templates]
+
+# The inputs of all of the graphics, read before the workers are started
+render_inputs = {}
+
+cache_dir = plot_templates.cache_dir
+manifest_filename = "manifest"
+render_cache_version = 1
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] [GRAPHIC ...]")
+    parser.add_option("--processes", type="int", metavar="N",
+                      default=multiprocessing.cpu_count(),
+                      help="number of worker processes (default: %default)")
+    parser.add_option("--force", action="store_true", default=False,
+                      help="draw every graphic, even if its inputs have not "
+                      "changed")
+    parser.add_option("--list", action="store_true", default=False,
+                      help="list the graphics and exit")
+    (options, args) = parser.parse_args()
+
+    names = map(lambda x: x[0], all_figures())
+    if options.list:
+        print "\n".join(names)
+        return
+
+    for name in args:
+        if name not in names:
+            parser.error("unknown graphic %s" % name)
+    if len(args) > 0:
+        names = filter(lambda x: x in args, names)
+
+    start = time.time()
+    manifest = load_manifest()
+    fingerprints = dict(map(lambda x: (x, figure_fingerprint(x)), names))
+
+    hits = []
+    if not options.force:
+        hits = filter(lambda x: restore_figure(manifest, x, fingerprints[x]),
+                      names)
+    misses = filter(lambda x: x not in hits, names)
+
+    load_time = 0.0
+    results = []
+    if len(misses) > 0:
+        load_time = load_inputs()
+        results = render_figures(misses, options.processes)
+
+    for (name, files, elapsed) in results:
+        store_figure(manifest, name, fingerprints[name], files)
+    if len(results) > 0:
+        save_manifest(manifest)
+    total_time = time.time() - start
+
+    print "%-30s %.3fs" % ("(inputs)", load_time)
+    for name in hits:
+        print "%-30s hit     %s" % (name, " ".join(manifest[name][1]))
+    for (name, files, elapsed) in results:
+        print "%-30s %.3fs  %s" % (name, elapsed, " ".join(files))
+    print "%-30s %.3fs  (%d hits, %d misses)" % ("total", total_time,
+                                                 len(hits), len(misses))
+
+
+# Returns the graphics of all of the plotting scripts, each a name and the
+# function which draws it
+
+def all_figures():
+    figures = []
+    for module in plot_modules:
+        figures.extend(module.figures)
+    return figures
+
+
+# Returns the module of the script which draws the named graphic
+
+def figure_module(name):
+    for module in plot_modules:
+        if name in map(lambda x: x[0], module.figures):
+            return module
+
+
+# Reads the inputs of every graphic into render_inputs, and returns the time
+# it took
+
+def load_inputs():
+    start = time.time()
+    for module in plot_modules:
+        module.load_inputs(render_inputs)
+    return time.time() - start
+
+
+############################################################################
+#
+# Drawing
+#
+############################################################################
+
+# Draws the named graphics, and returns, in the order of names, the name,
+# the files written and the time taken for each
+
+def render_figures(names, processes=1):
+    if processes <= 1 or len(names) <= 1:
+        results = map(render_figure, names)
+    else:
+        # The workers are forked after the inputs have been read, so only
+        # the names are passed to them
+        pool = multiprocessing.Pool(min(processes, len(names)))
+        results = pool.map(render_figure, names, 1)
+        pool.close()
+        pool.join()
+
+    return results
+
+
+def render_figure(name):
+    draw = dict(all_figures())[name]
+
+    start = time.time()
+    files = draw(render_inputs)
+    return (name, files, time.time() - start)
+
+
+############################################################################
+#
+# Reusing graphics
+#
+############################################################################
+
+# Returns the fingerprint of the named graphic: a hash of everything it is
+# drawn from
+
+def figure_fingerprint(name):
+    module = figure_module(name)
+
+    h = hashlib.sha1()
+    h.update("%d %s %s %s\n" % (render_cache_version, name,
+                                 matplotlib.__version__,
+                                 time.strftime("%Y-%m-%d")))
+    for source in [module] + library_modules:
+        h.update(file_contents(os.path.splitext(source.__file__)[0] + ".py"))
+    h.update(file_contents(os.path.splitext(__file__)[0] + ".py"))
+    for fname in module.input_files:
+        h.update("%s\n" % fname)
+        h.update(file_contents(os.path.join(module.input_dir, fname)))
+    return h.hexdigest()
+
+
+def file_contents(filename):
+    f = open(filename, "rb")
+    contents = f.read()
+    f.close()
+    return contents
+
+
+# The manifest holds, for each graphic, the fingerprint it was last drawn
+# from and the files it wrote, which are kept in cache_dir
+
+def load_manifest():
+    filename = os.path.join(cache_dir, manifest_filename)
+    if not os.path.exists(filename):
+        return {}
+
+    try:
+        f = open(filename, "rb")
+        (version, manifest) = cPickle.load(f)
+        f.close()
+    except (IOError, EOFError, ValueError, cPickle.UnpicklingError):
+        return {}
+
+    if version != render_cache_version:
+        return {}
+    return manifest
+
+
+# Writes the manifest under a temporary name and then renames it, as
+# ev_history.py does with its cache
+
+def save_manifest(manifest):
+    filename = os.path.join(cache_dir, manifest_filename)
+
+    try:
+        f = open(filename + ".new", "wb")
+        cPickle.dump((render_cache_version, manifest), f,
+                     cPickle.HIGHEST_PROTOCOL)
+        f.close()
+        os.rename(filename + ".new", filename)
+    except (IOError, OSError):
+        pass
+
+
+# Copies the kept files of the named graphic back, if they were drawn from
+# the fingerprint, and returns whether they were
+
+def restore_figure(manifest, name, fingerprint):
+    if name not in manifest or manifest[name][0] != fingerprint:
+        return False
+
+    files = manifest[name][1]
+    for fname in files:
+        if not os.path.exists(os.path.join(cache_dir, fname)):
+            return False
+
+    for fname in files:
+        shutil.copyfile(os.path.join(cache_dir, fname), fname)
+    return True
+
+
+# Keeps the files of a newly drawn graphic. If they cannot be kept, the
+# graphic is drawn again next time.
+
+def store_figure(manifest, name, fingerprint, files):
+    try:
+        if not os.path.isdir(cache_dir):
+            os.mkdir(cache_dir)
+        for fname in files:
+            shutil.copyfile(fname, os.path.join(cache_dir, fname))
+    except (IOError, OSError):
+        manifest.pop(name, None)
+        return
+
+    manifest[name] = (fingerprint, files)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This module calculates the distribution of the number of seats won, from
+# the probability of winning each race, for chambers too large for the
+# chain of convolutions of senate_est.m, such as the 435 races of the
+# House. Each race is the polynomial (1 - p) + p x, and the distribution
+# is their product. The product is formed by divide and conquer: the races
+# are multiplied in pairs, then the pairs in pairs, and so on, with the
+# products of the longer polynomials taken by FFT. For n races, this takes
+# O(n log^2 n) operations rather than the O(n^2) of the chain, and every
+# row (for example, every day of the campaign) is multiplied at once.
+#
+# From the distribution it also calculates the probability of a majority,
+# and the influence of each race: the probability that it decides the
+# majority, which is the change in the probability of a majority per unit
+# change in the race's win probability.
+#
+# Usage: seats.py FILE
+# where each line of FILE is a day of the year followed by the probability
+# of winning each race on that day, comma-separated. It writes:
+#
+#    seats_estimates.csv  - for each day: the day, the median and modal
+#                           number of seats, and the probability of a
+#                           majority
+#    seats_histogram.csv  - the probability of each number of seats, from 0
+#                           up, for the newest day
+#    seats_influence.csv  - the influence of each race for the newest day
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import sys, time, optparse
+from numpy import *
+import ev_estimator
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+num_seats = 435
+majority_seats = 218
+
+# Products of polynomials shorter than this are taken directly rather than
+# by FFT
+fft_min_length = 32
+
+estimates_filename = "seats_estimates.csv"
+histogram_filename = "seats_histogram.csv"
+influence_filename = "seats_influence.csv"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    global majority_seats
+
+    parser = optparse.OptionParser(usage="%prog [options] FILE")
+    parser.add_option("--majority", type="int", metavar="N",
+                      default=majority_seats,
+                      help="seats needed for a majority (default: %default)")
+    parser.add_option("--benchmark", action="store_true", default=False,
+                      help="time against the chain of convolutions on "
+                      "random probabilities for %d races, and check that "
+                      "they agree" % num_seats)
+    (options, args) = parser.parse_args()
+
+    majority_seats = options.majority
+
+    if options.benchmark:
+        benchmark_distributions()
+        return
+
+    if len(args) != 1:
+        parser.error("expected a file of win probabilities")
+
+    data = loadtxt(args[0], delimiter=",", ndmin=2)
+    days = data[:, 0]
+    probs = data[:, 1:]
+
+    dists = seat_distributions(probs)
+    write_seat_estimates(days, dists)
+
+    # The histogram and the influence are for the newest day
+    newest = argmax(days)
+    write_seat_histogram(dists[newest])
+    write_influence(pivot_probabilities(probs[newest:newest + 1])[0])
+
+
+############################################################################
+#
+# The calculation
+#
+############################################################################
+
+# Returns the distribution of the number of seats won for each row of
+# probs, the probabilities of winning each race: element k of each row is
+# the probability of exactly k seats
+
+def seat_distributions(probs):
+    probs = atleast_2d(asarray(probs, dtype=float64))
+    (rows, num_races) = probs.shape
+
+    # The races are padded to a power of two with the polynomial 1
+    size = 1
+    while size < num_races:
+        size *= 2
+
+    polys = zeros((rows, size, 2))
+    polys[:, :, 0] = 1.0
+    polys[:, :num_races, 0] = 1 - probs
+    polys[:, :num_races, 1] = probs
+
+    # Each level multiplies the polynomials in pairs, doubling their length
+    while polys.shape[1] > 1:
+        polys = multiply_pairs(polys[:, 0::2], polys[:, 1::2])
+
+    dist = polys[:, 0, :num_races + 1]
+
+    # Round-off in the FFT can leave tiny negative probabilities
+    return maximum(dist, 0)
+
+
+# Returns the products of a and b, two arrays of polynomials of length n,
+# padded to length 2n. The last coefficient of each product is always 0.
+
+def multiply_pairs(a, b):
+    n = a.shape[-1]
+
+    if n < fft_min_length:
+        product = zeros(a.shape[:-1] + (2 * n,))
+        for j in xrange(n):
+            product[..., j:j + n] += a[..., j:j + 1] * b
+        return product
+
+    return fft.irfft(fft.rfft(a, 2 * n) * fft.rfft(b, 2 * n), 2 * n)
+
+
+# Returns the probability of at least majority seats for each distribution
+
+def majority_probabilities(dists, majority=None):
+    if majority is None:
+        majority = majority_seats
+    return sum(atleast_2d(dists)[:, majority:], axis=1)
+
+
+# Returns the median and the modal number of seats for each distribution
+
+def seat_summaries(dists):
+    dists = atleast_2d(dists)
+    cumulative_prob = cumsum(dists, axis=1)
+    return (sum(cumulative_prob < 0.5, axis=1), argmax(dists, axis=1))
+
+
+# Returns, for each row of probs, the probability that each race decides
+# the majority: that the other races win exactly majority - 1 seats. As in
+# voter_power.py, the distribution of the races before each race and of
+# the races after it are built once, and each race's probability is a dot
+# product of the two.
+
+def pivot_probabilities(probs, majority=None):
+    if majority is None:
+        majority = majority_seats
+    probs = atleast_2d(asarray(probs, dtype=float64))
+    (rows, num_races) = probs.shape
+    needed = majority - 1
+
+    # suffixes[i] is the distribution of the races from i on. Only the
+    # coefficients up to needed seats can make up a pivot, so the
+    # distributions are cut down to those.
+    suffixes = [None] * (num_races + 1)
+    suffix = ones((rows, 1))
+    suffixes[num_races] = suffix
+    for i in xrange(num_races - 1, -1, -1):
+        suffix = multiply_race(suffix, probs[:, i:i + 1], needed + 1)
+        suffixes[i] = suffix
+
+    pivots = zeros((rows, num_races))
+    prefix = ones((rows, 1))
+    for i in xrange(num_races):
+        # The other races win needed seats when the races before i win k
+        # and the races after i win needed - k
+        suffix = suffixes[i + 1]
+        k = arange(max(needed - suffix.shape[1] + 1, 0),
+                   min(prefix.shape[1], needed + 1))
+        pivots[:, i] = sum(prefix[:, k] * suffix[:, needed - k], axis=1)
+
+        prefix = multiply_race(prefix, probs[:, i:i + 1], needed + 1)
+
+    return pivots
+
+
+# Multiplies distributions of seats by a race's polynomial, keeping at most
+# length coefficients
+
+def multiply_race(dist, prob, length):
+    result = zeros((dist.shape[0], min(dist.shape[1] + 1, length)))
+    kept = min(dist.shape[1], length)
+    result[:, :kept] = (1 - prob) * dist[:, :kept]
+    result[:, 1:] += prob * dist[:, :result.shape[1] - 1]
+    return result
+
+
+# Times seat_distributions against the chain of convolutions for a
+# campaign's worth of days, and checks that they agree
+
+def benchmark_distributions(num_days=170):
+    rand = random.RandomState(2012)
+    probs = rand.uniform(size=(num_days, num_seats))
+
+    start = time.time()
+    chain = ev_estimator.ev_distributions(1 - probs,
+                                          ones(num_seats, dtype=int))
+    chain_time = time.time() - start
+
+    start = time.time()
+    dists = seat_distributions(probs)
+    fft_time = time.time() - start
+
+    start = time.time()
+    pivots = pivot_probabilities(probs[:1])
+    pivot_time = time.time() - start
+
+    # The influence of a race, by finite differences of the majority
+    # probability
+    step = 1e-6
+    moved = repeat(probs[:1], num_seats, axis=0)
+    moved[arange(num_seats), arange(num_seats)] += step
+    by_difference = (majority_probabilities(seat_distributions(moved))
+                     - majority_probabilities(dists[:1])) / step
+
+    print "%d days of %d races" % (num_days, num_seats)
+    print "chain       %.4fs" % chain_time
+    print "fft         %.4fs" % fft_time
+    print "influence   %.4fs (one day)" % pivot_time
+    print "largest difference in the distributions %g" % \
+          abs(dists - chain).max()
+    print "largest difference in the influence %g" % \
+          abs(pivots[0] - by_difference).max()
+
+
+############################################################################
+#
+# Output
+#
+############################################################################
+
+def write_seat_estimates(days, dists):
+    (medians, modes) = seat_summaries(dists)
+    majorities = majority_probabilities(dists)
+
+    f = open(estimates_filename, "w")
+    for i in xrange(len(days)):
+        f.write(",".join(map(ev_estimator.dlm_format,
+                             [days[i], medians[i], modes[i],
+                              majorities[i]])) + "\n")
+    f.close()
+
+
+def write_seat_histogram(dist):
+    f = open(histogram_filename, "w")
+    for p in dist:
+        f.write(ev_estimator.dlm_format(p) + "\n")
+    f.close()
+
+
+def write_influence(pivots):
+    f = open(influence_filename, "w")
+    for i in xrange(len(pivots)):
+        f.write("%d,%s\n" % (i + 1, ev_estimator.dlm_format(pivots[i])))
+    f.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script is a NumPy port of senate_est.m which reads the Senate polls
+# from the archive of the HuffPo feed kept by update_polls.py, rather than
+# from margins typed into the script. For each race, the polls are cleaned
+# and windowed as update_polls.py cleans and windows each state's
+# presidential polls, and the median margin and its SEM are computed in the
+# same way. As in senate_est.m, the probability that the Democrat wins each
+# race follows a t-distribution with as many degrees of freedom as there
+# are polls, and the distribution of Democratic seats is averaged over a
+# range of biases of every race's margin. It writes the same files as
+# senate_est.m:
+#
+#    Sen_histogram.csv - the number of Democratic seats and its
+#                        probability (in percent), one line for each of the
+#                        histogram_seats numbers of seats around the mode
+#    Sen_estimates.csv - the modal number of Democratic and of Republican
+#                        seats, and the probability (in percent) of at
+#                        least supermajority_seats Democratic seats
+#
+# The win probabilities for all of the races at all of the biases are
+# calculated as one array, and the seat distributions for all of the biases
+# as one stacked convolution.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import os, sys, datetime, optparse
+from numpy import *
+import update_polls, ev_estimator, ev_prediction
+from update_polls import strpdate
+
+try:
+    from xml.etree.cElementTree import iterparse
+except ImportError:
+    from xml.etree.ElementTree import iterparse
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+senate_topic = "2012-senate"
+
+# Seats which are not up in this cycle. Independents who caucus with the
+# Democrats are counted as Democrats.
+dem_holdovers = 30
+gop_holdovers = 37
+total_seats = 100
+supermajority_seats = 60
+
+# The parties of the responses whose values make up each side's share.
+# Independents who caucus with the Democrats are listed by choice.
+dem_parties = ["Dem", "D", "Democrat"]
+gop_parties = ["Rep", "R", "Republican"]
+dem_independents = ["Sanders", "King"]
+
+# The races in this cycle, with the approximate (Dem - GOP) margin of the
+# last election for the seat, which stands in for the polls until a race
+# has been polled, as prev_outcome does in update_polls.py
+race_prev_margins = {
+    "AZ": -10, "CA": 24, "CT": 40, "DE": 41, "FL": 22, "HI": 24, "IN": -87,
+    "MA": 38, "MD": 10, "ME": -53, "MI": 16, "MN": 20, "MO": 3, "MS": -29,
+    "MT": 1, "ND": 40, "NE": 28, "NJ": 9, "NM": 42, "NV": -14, "NY": 36,
+    "OH": 12, "PA": 18, "RI": 8, "TN": -3, "TX": -26, "UT": -31, "VA": 0,
+    "VT": 33, "WA": 17, "WI": 37, "WV": 30, "WY": -40,
+    }
+races = sorted(race_prev_margins)
+assert dem_holdovers + gop_holdovers + len(races) == total_seats
+
+# The effective SEM of a race is at least sqrt(min_sem_variance / polls)
+# and includes undecided_sd, as in senate_est.m
+min_sem_variance = 1 / 500.0
+undecided_sd = 0
+
+bias_low = -2.0
+bias_high = 2.0
+bias_steps_per_point = 5
+
+# Sen_histogram.csv holds this many numbers of seats, around the mode, as
+# senate_est.m's did for its 6 races
+histogram_seats = 7
+
+senate_polls = {}
+# senate_polls is a dictionary with an entry for each race, a list of
+# tuples of the same form as the entries of update_polls.state_polls:
+# (margin, start date, end date, mid date, population, polling organization)
+
+poll_ids = set()
+
+histogram_filename = "Sen_histogram.csv"
+estimates_filename = "Sen_estimates.csv"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--archive", metavar="DIR",
+                      default=update_polls.archive_dir,
+                      help="directory of archived feed pages (default: "
+                      "%default)")
+    parser.add_option("--analysisdate", type="int", metavar="DAY", default=0,
+                      help="day of the year to analyze (default: today)")
+    (options, args) = parser.parse_args()
+
+    day = datetime.date.today()
+    if options.analysisdate > 0:
+        day = datetime.date(2012, 1, 1) + \
+              datetime.timedelta(options.analysisdate - 1)
+
+    for race in races:
+        senate_polls[race] = []
+    load_senate_polls(options.archive)
+
+    (margins, sems, num_polls) = race_statistics(day)
+    estimate = senate_estimate(margins, sems, num_polls)
+    write_senate_estimate(estimate)
+
+
+############################################################################
+#
+# Parsing the archive
+#
+############################################################################
+
+# Adds the Senate polls in every page of the archive to senate_polls
+
+def load_senate_polls(archive_dir):
+    fnames = sorted(os.listdir(archive_dir),
+                    key=lambda x: int(x.split(".")[0]))
+    for fname in fnames:
+        parse_senate_pollfile(os.path.join(archive_dir, fname))
+
+
+# Parses a page in a single pass, as update_polls.stream_pollfile does, and
+# handles each poll as soon as it has been read. A poll which appears on
+# more than one page is only counted once.
+
+def parse_senate_pollfile(filename):
+    depth = 0
+    for (event, elem) in iterparse(filename, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+
+        depth -= 1
+
+        # Only the direct children of the root element are polls
+        if depth != 1:
+            continue
+
+        poll_id = int(update_polls.stream_opt_subelem(elem, "id", "0"))
+        if poll_id not in poll_ids:
+            poll_ids.add(poll_id)
+            process_senate_poll(elem)
+        elem.clear()
+
+
+def process_senate_poll(poll):
+    questions = []
+    for q in poll.iter():
+        for topic in q.findall("topic"):
+            if topic.text == senate_topic:
+                questions.append(q)
+
+    for q in questions:
+        state = update_polls.stream_opt_subelem(q, "state", "")
+        if state not in senate_polls:
+            continue
+
+        poll_org = poll.find(".//pollster").text
+        start_date = strpdate(poll.find(".//start_date").text)
+        end_date = strpdate(poll.find(".//end_date").text)
+        mid_date = start_date + ((end_date - start_date) / 2)
+
+        # Likely voters are preferred, as in update_polls.py
+        subpops = q.findall(".//subpopulation")
+        if len(subpops) >= 2:
+            subpops = filter(lambda x: update_polls.stream_opt_subelem(
+                x, "name", "") == "Likely Voter", subpops)
+
+        for subpop in subpops:
+            margin = subpop_margin(subpop)
+            if margin is None:
+                continue
+
+            pop = int(update_polls.stream_opt_subelem(subpop, "observations",
+                                                      "0"))
+            senate_polls[state].append((margin, start_date, end_date,
+                                        mid_date, pop, poll_org))
+
+
+# Returns the Democratic margin of a subpopulation's responses, or None if
+# it does not have both a Democratic and a Republican response
+
+def subpop_margin(subpop):
+    dem = None
+    gop = None
+
+    for r in subpop.findall(".//response"):
+        choice = update_polls.stream_opt_subelem(r, "choice", "")
+        party = update_polls.stream_opt_subelem(r, "party", "")
+        value = float(update_polls.stream_opt_subelem(r, "value", "0"))
+
+        if party in dem_parties or choice in dem_independents:
+            dem = (dem or 0) + value
+        elif party in gop_parties:
+            gop = (gop or 0) + value
+
+    if dem is None or gop is None:
+        return None
+    return dem - gop
+
+
+############################################################################
+#
+# The calculation
+#
+############################################################################
+
+# Returns the margin, SEM and number of polls of each race as of the day.
+# The polls are those which ended before the day, cleaned of overlapping
+# polls and windowed as update_polls.py does for each state.
+
+def race_statistics(day):
+    subsets = []
+    for race in races:
+        window = filter(lambda x: x[2] < day, senate_polls[race])
+        window = update_polls.drop_overlapping_polls(window)
+
+        if len(window) == 0:
+            window = [prev_race_outcome(race)]
+
+        (working_subset, oldest_mid_date) = \
+            update_polls.select_working_subset(window)
+        subsets.append(working_subset)
+
+    stats = update_polls.subset_statistics(subsets, ["median"])["median"]
+    margins = array(map(lambda x: x[0], stats), dtype=float64)
+    sems = array(map(lambda x: x[1], stats), dtype=float64)
+    num_polls = array(map(len, subsets))
+
+    return (margins, sems, num_polls)
+
+
+def prev_race_outcome(race):
+    election = datetime.date(2006, 11, 7)
+    return (race_prev_margins[race], election, election, election, 1000000,
+            "Election 2006")
+
+
+def senate_biases():
+    low = int(round(bias_low * bias_steps_per_point))
+    high = int(round(bias_high * bias_steps_per_point))
+    return arange(low, high + 1) / float(bias_steps_per_point)
+
+
+# Returns the probability of a Democratic win in each race (as columns) at
+# each bias (as rows)
+
+def race_probabilities(margins, sems, num_polls, biases):
+    scale = maximum(sqrt(sems * sems + undecided_sd * undecided_sd),
+                    sqrt(min_sem_variance / num_polls))
+    z = (margins + biases[:, newaxis]) / scale
+    return ev_prediction.t_cdf(z, num_polls)
+
+
+# Returns the seat distribution, in percent, averaged over the biases, with
+# the mode and the probability of a supermajority. Element i of the
+# distribution is the probability of dem_holdovers + i Democratic seats.
+
+def senate_estimate(margins, sems, num_polls, biases=None):
+    if biases is None:
+        biases = senate_biases()
+
+    probs = race_probabilities(margins, sems, num_polls, biases)
+
+    # Each race is a polynomial in the number of Democratic seats, with the
+    # Republican win as the constant term
+    dists = ev_estimator.ev_distributions(1 - probs,
+                                          ones(len(races), dtype=int))
+    histogram = mean(dists, axis=0) * 100
+
+    seats = dem_holdovers + arange(len(histogram))
+    mode_dem = seats[argmax(histogram)]
+
+    return {"probs": mean(probs, axis=0), "histogram": histogram,
+            "seats": seats, "mode_dem": mode_dem,
+            "mode_gop": total_seats - mode_dem,
+            "prob_supermajority":
+                sum(histogram[seats >= supermajority_seats])}
+
+
+############################################################################
+#
+# Output
+#
+############################################################################
+
+# Returns the indices of the histogram_seats numbers of seats written to
+# Sen_histogram.csv: centered on the mode, and moved in from either end of
+# the possible numbers of seats
+
+def histogram_window(estimate):
+    num_seats = len(estimate["histogram"])
+    width = min(histogram_seats, num_seats)
+    low = argmax(estimate["histogram"]) - width / 2
+    low = max(min(low, num_seats - width), 0)
+    return arange(low, low + width)
+
+
+def write_senate_estimate(estimate):
+    dlm_format = ev_estimator.dlm_format
+    shown = histogram_window(estimate)
+
+    f = open(histogram_filename, "w")
+    for i in shown:
+        f.write(",".join(map(dlm_format, [estimate["seats"][i],
+                                          estimate["histogram"][i]])) + "\n")
+    f.close()
+
+    f = open(estimates_filename, "w")
+    f.write(",".join(map(dlm_format, [estimate["mode_dem"],
+                                      estimate["mode_gop"],
+                                      estimate["prob_supermajority"]])))
+    f.write("\n")
+    f.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -32,8 +32,16 @@
 #    
 ############################################################################
 
-import os, sys, urllib2, datetime, time, xml.dom.minidom, socket
+import os, sys, datetime, time, xml.dom.minidom, socket, optparse
+import StringIO, httplib, urlparse, threading, Queue, zlib
+import bisect, cPickle, collections
 from numpy import *
+import pollstore, pollsfile
+
+try:
+    from xml.etree.cElementTree import iterparse, tostring
+except ImportError:
+    from xml.etree.ElementTree import iterparse, tostring
 
 ############################################################################
 #
@@ -41,13 +49,21 @@ from numpy import *
 #
 ############################################################################
 
-output_filename = "polls.median.txt"
-midtype = "median"
+output_filename_format = "polls.%s.txt"
+estimators = ["median"]
+trimmed_fraction = 0.2
+# Each estimator in estimators (see estimator_functions) writes its
+# statistics to output_filename_format % name. The polls are parsed and
+# windowed once however many estimators there are.
 num_recent_polls_to_use = 3
 huffpo_base_url = ""
 huffpo_childNodes_per_page = 21 # 10 polls per page, plus space childNode on either side
 archive_dir = "archive/"
 
+# Either "stream", which parses each page in a single pass with iterparse,
+# or "minidom", which builds the full DOM tree for each page
+xml_parser = "stream"
+
 state_polls = {}
 # state_polls is a dictionary with each an entry for each state. Each entry
 # is a list of tuples. Each tuple represents one poll and is of the form:
@@ -58,9 +74,58 @@ prev_outcome = {}
 # the outcome from the previous election for states which have had sparse
 # polling, if any, during the current campaign
 
-poll_ids = []
+poll_ids = set()
+# poll_ids holds the id of every poll seen during this run
+
+archived_ids = set()
+poll_index_filename = "archive.ids"
+# archived_ids holds the id of every poll written to archive/. It is kept on
+# disk in poll_index_filename, next to archive/, so that polls in the feed
+# which are already archived can be skipped without parsing them
+
 max_filenum = 0
 
+use_poll_store = True
+poll_store_dir = "archive.store/"
+poll_store = None
+store_records = None
+# Rather than re-parsing every file in archive/ on each run, the polls are
+# loaded from a compiled store (see pollstore.py), and only archive files
+# which are new or have changed since they were stored are parsed. While
+# a file is parsed for the store, its records are collected in
+# store_records instead of being added directly to state_polls.
+
+fetch_concurrency = 4
+fetch_rate = fetch_concurrency
+fetch_retries = 3
+# Pages of the feed are fetched by fetch_concurrency worker threads, each
+# holding its own keep-alive connection. Across all of the workers, no more
+# than fetch_rate requests are started per second. By default that is one
+# request per second for each worker, the pace of the one-at-a-time crawl,
+# so that the crawl is about fetch_concurrency times faster; --rate sets
+# another limit. A failed request is retried up to fetch_retries times with
+# exponential backoff and jitter.
+
+incremental_stop_pages = 0
+crawl_state_filename = "archive.hwm"
+# In an incremental crawl, fetching stops at the first page of the feed on
+# which every poll id is at or below the high-water mark of the previous
+# crawl, since the feed lists the newest polls first. Failing that (with no
+# usable mark), fetching stops once incremental_stop_pages consecutive
+# pages contain only polls which are already archived. Zero means the whole
+# feed is crawled. After each crawl, the high-water mark (the largest
+# archived poll id and the last page fetched) is recorded in
+# crawl_state_filename.
+
+use_history_cache = True
+history_cache_filename = "polls.cache"
+history_cache_version = 3
+# The output statistics of each estimator for each (day, state) are cached,
+# together with the polls they were computed from, in
+# history_cache_filename. A run then recomputes only the cells which its
+# new or changed polls can affect: those for the days after each such poll
+# ended.
+
 # Files for exploratory analysis
 state_filename = "2012_StatePolls.csv"
 state_file = None
@@ -75,41 +140,100 @@ national_file = None
 
 def main():
     global max_filenum
-    global midtype
-    global output_filename
+    global estimators
     global huffpo_base_url
+    global xml_parser
+    global incremental_stop_pages
+    global fetch_concurrency, fetch_rate
+    global use_poll_store, use_history_cache
     global state_file, national_file
 
-    try:
-        if sys.argv[1] == "--mean":
-            midtype = "mean"
-            output_filename = "polls.mean.txt"
-    except:
-        pass
+    parser = optparse.OptionParser()
+    parser.add_option("--mean", action="store_true", default=False,
+                      help="average the polls with the mean, not the median")
+    parser.add_option("--estimators", metavar="NAMES", default=None,
+                      help="comma-separated estimators to write, from: %s" %
+                      ", ".join(sorted(estimator_functions)))
+    parser.add_option("--minidom", action="store_true", default=False,
+                      help="parse the poll feed with xml.dom.minidom")
+    parser.add_option("--incremental", type="int", metavar="N", default=0,
+                      help="stop fetching after N consecutive pages with "
+                      "no new polls")
+    parser.add_option("--concurrency", type="int", metavar="N",
+                      default=fetch_concurrency,
+                      help="fetch up to N pages of the feed at once")
+    parser.add_option("--rate", type="float", metavar="R", default=None,
+                      help="start at most R requests per second (default: "
+                      "one per second for each of the concurrent fetches)")
+    parser.add_option("--url", metavar="URL", default=None,
+                      help="base url of the poll feed (default: the "
+                      "contents of .huffpo.url)")
+    parser.add_option("--no-store", action="store_true", default=False,
+                      help="parse every archive file instead of loading "
+                      "the compiled poll store")
+    parser.add_option("--rebuild-store", action="store_true", default=False,
+                      help="rebuild the compiled poll store from archive/")
+    parser.add_option("--rebuild-index", action="store_true", default=False,
+                      help="rebuild the index of archived poll ids")
+    parser.add_option("--full", action="store_true", default=False,
+                      help="regenerate every day of the output instead of "
+                      "only the days affected by new polls")
+    parser.add_option("--benchmark-parse", action="store_true",
+                      default=False, help="time the streaming and minidom "
+                      "parsers on the archive, then exit")
+    (options, args) = parser.parse_args()
+
+    if options.mean:
+        estimators = ["mean"]
+
+    if options.estimators is not None:
+        estimators = options.estimators.split(",")
+        for name in estimators:
+            if name not in estimator_functions:
+                parser.error("unknown estimator %s" % name)
+
+    if options.minidom:
+        xml_parser = "minidom"
+
+    incremental_stop_pages = options.incremental
+    use_poll_store = not options.no_store
+    use_history_cache = not options.full
+    fetch_concurrency = max(options.concurrency, 1)
+    fetch_rate = fetch_concurrency
+    if options.rate is not None:
+        fetch_rate = options.rate
 
     for state in state_names:
         state_polls[state] = []
 
+    if options.benchmark_parse:
+        benchmark_parsers()
+        return
+
     state_file = init_analysis_file(state_filename)
     national_file = init_analysis_file(national_filename)
     store_prev_outcome()
     
     # load base url
-    huffpo_config = open(".huffpo.url")
-    huffpo_base_url = huffpo_config.readline()[:-1]
-    huffpo_config.close()
+    if options.url is not None:
+        huffpo_base_url = options.url
+    else:
+        huffpo_config = open(".huffpo.url")
+        huffpo_base_url = huffpo_config.readline()[:-1]
+        huffpo_config.close()
 
     # process archive of polls
-    for fname in os.listdir(archive_dir):
-        n = int(fname.split(".")[0])
-        if n > max_filenum:
-            max_filenum = n
-        parse_pollfile(archive_dir + fname)
+    load_archive(options.rebuild_store)
+
+    load_poll_index(options.rebuild_index)
 
     # get the latest polls
     socket.setdefaulttimeout(5)
     fetch_latest_polls()
 
+    if poll_store is not None and poll_store["changed"]:
+        save_poll_store()
+
     process_polls()
 
     state_file.close()
@@ -128,7 +252,9 @@ def init_analysis_file(filename):
 
 ############################################################################
 #
-# Returns the median and std. error
+# Returns the median and std. error. The statistics for every (day, state)
+# window of polls are computed at once instead of making a handful of tiny
+# NumPy calls per window
 #
 ############################################################################
 
@@ -141,41 +267,99 @@ def init_analysis_file(filename):
 #
 # The MAD is defined as median( abs[samples - median(samples)] )
 # invcdf(0.75) is approximately 0.6745
+#
+# Each estimator takes the margins of many windows of polls which all have
+# the same number of polls, one window per row, and returns arrays of the
+# average margin and its estimated SEM for each window. Reducing along the
+# rows sums the margins in the same order as reducing each window alone
+# would, so the median and mean agree to the last bit with those of the
+# original per-window get_statistics, kept in benchmark_history.py.
 
-def get_statistics(set):
-    [margins, sdates, edates, mdates, pop, poll_orgs] = zip(*set)
-    set = array(margins)
+def median_estimator(margins):
+    num = margins.shape[1]
+    medians = median(margins, axis=1)
+    mads = median(abs(margins - medians[:, newaxis]), axis=1)
 
-    num = set.size
-    assert num >= 3
+    return (medians, mads/0.6745/sqrt(num))
 
-    if midtype == "median":
-        median_margin = median(set)
-        mad = median(abs(set - median_margin))
-        sem_est = mad/0.6745/sqrt(num)
 
-        return (median_margin, sem_est)
+def mean_estimator(margins):
+    num = margins.shape[1]
+
+    return (mean(margins, axis=1), std(margins, axis=1) / sqrt(num))
+
+
+# The trimmed mean drops the trimmed_fraction highest and lowest margins in
+# each window. Its SEM is estimated from the winsorized std. deviation, as
+# in Tukey and McLaughlin. Windows too small to trim just use the mean.
+
+def trimmed_mean_estimator(margins):
+    num = margins.shape[1]
+    trim = int(trimmed_fraction * num)
+    if trim == 0:
+        return mean_estimator(margins)
+
+    ordered = sort(margins, axis=1)
+    trimmed_means = mean(ordered[:, trim:num - trim], axis=1)
+
+    lowest_kept = ordered[:, trim:trim + 1]
+    highest_kept = ordered[:, num - trim - 1:num - trim]
+    winsorized = maximum(minimum(ordered, highest_kept), lowest_kept)
+    sems = std(winsorized, axis=1) / ((1 - 2.0 * trim / num) * sqrt(num))
+
+    return (trimmed_means, sems)
+
+
+estimator_functions = {"median": median_estimator,
+                       "mean": mean_estimator,
+                       "trimmed": trimmed_mean_estimator}
 
-    else:
-        assert midtype == "mean"
 
-        mean_margin = mean(set)
-        sem = std(set) / sqrt(num)
+# Returns, for each of the named estimators, the (margin, SEM) pair for
+# each working subset, as the original write_statistics computed them (see
+# benchmark_history.py): the 1-poll, 2-poll and 3-or-more-poll rules are
+# each applied to all of the subsets they cover at once. The 1-poll and
+# 2-poll rules do not depend on the estimator.
 
-        return (mean_margin, sem)
+def subset_statistics(subsets, names):
+    results = {}
+    for name in names:
+        results[name] = [None] * len(subsets)
 
-# Special case for when only two polls are available
+    ones = filter(lambda i: len(subsets[i]) == 1, xrange(len(subsets)))
+    twos = filter(lambda i: len(subsets[i]) == 2, xrange(len(subsets)))
 
-def get_two_statistics(set):
-    [margins, sdates, edates, mdates, pop, poll_args] = zip(*set)
-    set = array(margins)
+    if len(ones) > 0:
+        pops = array(map(lambda i: subsets[i][0][4], ones), dtype=float64)
+        sems = sqrt(1.0 / pops)
+        for (j, i) in enumerate(ones):
+            for name in names:
+                results[name][i] = (subsets[i][0][0], sems[j])
 
-    assert set.size == 2
+    if len(twos) > 0:
+        margins = array(map(lambda i: (subsets[i][0][0], subsets[i][1][0]),
+                            twos), dtype=float64)
+        means = mean(margins, axis=1)
+        sems = std(margins, axis=1) / sqrt(2)
+        for (j, i) in enumerate(twos):
+            for name in names:
+                results[name][i] = (means[j], max(sems[j], 3))
 
-    mean_margin = mean(set)
-    sem = max(std(set) / sqrt(set.size), 3)
+    # Working subsets of three or more polls are grouped by size
+    sizes = {}
+    for i in xrange(len(subsets)):
+        if len(subsets[i]) >= 3:
+            sizes.setdefault(len(subsets[i]), []).append(i)
 
-    return (mean_margin, sem)
+    for (num, group) in sizes.iteritems():
+        margins = array(map(lambda i: map(lambda x: x[0], subsets[i]), group))
+
+        for name in names:
+            (mids, sems) = estimator_functions[name](margins)
+            for (j, i) in enumerate(group):
+                results[name][i] = (mids[j], sems[j])
+
+    return results
 
 
 ############################################################################
@@ -192,25 +376,23 @@ def get_two_statistics(set):
 #    - average margin where margin>0 is Obama ahead of Romney
 #    - estimated SEM of margin
 #    - analysisdate (written by the 'process_polls' method)
+#
+# The same statistics are also written, in the binary format described in
+# pollsfile.py, to polls.median.bin (or polls.mean.bin, and so on)
 
-# Remember, the format of the tuple for each list:
-# (margin, start date, end date, mid date, pop, polling organization)
+# Returns the polls which the statistics are computed from, and the middle
+# date of the oldest of them
 
-def write_statistics(pfile, polls):
+def select_working_subset(polls):
     # Number of polls available on this date for this state
     num = len(polls)
 
     if num == 0:
         assert False
     elif num == 1:
-        pfile.write("%s " % num)
-        pfile.write("%s " % int(polls[0][3].strftime("%j")))
-        pfile.write("%s " % polls[0][0])
-        pfile.write("%s " % sqrt(1.0/polls[0][4]))
+        return (polls, polls[0][3])
     elif num == 2:
-        pfile.write("%s " % num)
-        pfile.write("%s " % int(polls[1][3].strftime("%j")))
-        pfile.write("%s %s " % get_two_statistics(polls))
+        return (polls, polls[1][3])
     else:
         # We want to use only the three most recent polls, as defined by the
         # midpoint date, and allowing for ties
@@ -230,73 +412,231 @@ def write_statistics(pfile, polls):
         else:
             working_subset = last_three
 
-        pfile.write("%s " % len(working_subset))
-        pfile.write("%s " % int(working_subset[-1][3].strftime("%j")))
-        pfile.write("%s %s " % get_statistics(working_subset))
+        return (working_subset, working_subset[-1][3])
 
 
-def drop_overlapping_polls(polls):
-    if len(polls) <= 1:
-        return polls
+def process_polls():
+    days = list(campaign_season())
+    states = sorted(state_names, key=lambda x: state_names[x])
 
-    cleaned_polls = []
+    cache = None
+    if use_history_cache:
+        cache = load_history_cache(history_cache_filename)
 
-    # sort by: pollster, start date (old to new), end date (old to new)
-    by_pollster = sorted(polls, key=lambda x: (x[5], x[1], x[2]))
+    columns = compute_history(days, estimators, cache)
 
-    prev_pollster = by_pollster[0][5]
-    prev_start    = by_pollster[0][1]
-    prev_end      = by_pollster[0][2]
-    prev_poll     = by_pollster[0]
-    cleaned_polls.append(by_pollster[0])
+    for name in estimators:
+        cells = map(lambda x: map(lambda y:
+                                  columns[y]["cells"][name][x.toordinal()],
+                                  states), days)
+        output_filename = output_filename_format % name
 
-    for poll in by_pollster[1:]:
-        if prev_pollster != poll[5]:
-            prev_pollster = poll[5]
-        else:
-            if prev_end > poll[1]:
-                cleaned_polls.pop()
+        pfile = open(output_filename, "w")
+        for day_cells in cells:
+            pfile.writelines(map(format_cell, day_cells))
+        pfile.close()
 
-        prev_start    = poll[1]
-        prev_end      = poll[2]
-        prev_poll     = poll
-        cleaned_polls.append(poll)
+        # The same statistics in the binary, indexed format of pollsfile.py
+        pollsfile.write_polls(os.path.splitext(output_filename)[0] + ".bin",
+                              days, states, cells)
 
-    # write_statistics expects polls to be sorted from newest to oldest
-    # by mid-date
-    cleaned_polls.sort(key=lambda x: x[3], reverse=True)
-    return cleaned_polls
+    save_history_cache(history_cache_filename, columns)
 
-def process_polls():
-    pfile = open(output_filename, "w")
 
-    # Make sure the polls are sorted with most recent first
-    for state in state_polls.keys():
+# Each line of the output is the tuple
+# (num, oldest mid date, margin, sem, day), with the dates as days of the year
+
+def format_cell(cell):
+    return "%s %s %s %s %s\n" % cell
+
+
+# Computes the output statistics of each of the named estimators for each
+# state as of each of the given days. Returns a dictionary, by state, of
+# the state's polls, its previous outcome, and its cells for each
+# estimator, keyed by the ordinal of their day.
+#
+# Rather than re-filtering and re-sorting every state's polls for every day,
+# each state is swept forward in time once. Each poll enters the sweep on
+# the day after it ends, and the overlap-cleaned window of polls, ordered
+# from newest to oldest by mid-date, is updated as it does. The output is
+# the same as that of the original per-day generation, which is kept in
+# benchmark_history.py to check and time this against.
+#
+# If the cache from a previous run is given, the cells it holds which are
+# unaffected by any change in the polls are reused rather than recomputed.
+
+def compute_history(days, names, cache=None):
+    states = sorted(state_names, key=lambda x: state_names[x])
+    forward_days = days[::-1]
+    subsets = []
+    cells = []
+    columns = {}
+
+    for state in states:
         polls = state_polls[state]
-        polls.sort(key=lambda x: x[2], reverse=True)
+        column = {}
+        for name in names:
+            column[name] = {}
+        columns[state] = {"polls": list(polls),
+                          "prev": prev_outcome.get(state), "cells": column}
+
+        if cache is not None and state in cache:
+            cached = cache[state]
+            valid_through = cells_valid_through(cached, polls,
+                                                prev_outcome.get(state))
+            for name in names:
+                for (day, cell) in cached["cells"].get(name, {}).iteritems():
+                    if day <= valid_through:
+                        column[name][day] = cell
+
+        needed = []
+        for day in forward_days:
+            for name in names:
+                if day.toordinal() not in column[name]:
+                    needed.append(day)
+                    break
+        if len(needed) == 0:
+            continue
+
+        # The sweep only needs to run as far as the last day to recompute
+        last_needed = needed[-1]
+        needed = set(needed)
+        for (day, window) in sweep_windows(polls, forward_days):
+            if day > last_needed:
+                break
+            if day not in needed:
+                continue
+
+            if len(window) == 0:
+                window = [ prev_outcome[state] ]
+
+            (working_subset, oldest_mid_date) = select_working_subset(window)
+            subsets.append(working_subset)
+            cells.append((state, len(working_subset),
+                          oldest_mid_date.timetuple().tm_yday, day))
+
+    # The statistics for every (day, state) are computed together
+    stats = subset_statistics(subsets, names)
+
+    for name in names:
+        for (cell, stat) in zip(cells, stats[name]):
+            (state, num, oldest_mid_yday, day) = cell
+            columns[state]["cells"][name][day.toordinal()] = \
+                (num, oldest_mid_yday, stat[0], stat[1],
+                 day.timetuple().tm_yday)
+
+    return columns
+
+
+# Returns the ordinal of the last day for which a state's cached cells are
+# still valid. A poll only enters the windows of the days after it ended,
+# so the cells of the days up to the earliest end date of any poll which
+# was added, changed or removed since the cache was written are unaffected.
+
+def cells_valid_through(cached, polls, prev):
+    if cached["prev"] != prev:
+        return 0
+
+    old_polls = collections.Counter(cached["polls"])
+    new_polls = collections.Counter(polls)
+    changed = (old_polls - new_polls) + (new_polls - old_polls)
+
+    if len(changed) == 0:
+        return datetime.date.max.toordinal()
+
+    return min(map(lambda x: x[2], changed)).toordinal()
+
+
+# The cache is only used if it was written in the same format and with the
+# same settings
+
+def history_cache_settings():
+    return (history_cache_version, num_recent_polls_to_use, trimmed_fraction)
+
+
+def load_history_cache(filename):
+    if not os.path.exists(filename):
+        return None
+
+    try:
+        f = open(filename, "rb")
+        (settings, cache) = cPickle.load(f)
+        f.close()
+    except (EOFError, ValueError, cPickle.UnpicklingError):
+        print "History cache %s is unreadable, ignoring it" % filename
+        return None
 
-    # Write the 51 lines of output statistics for each day, from now
-    # back to May 22
-    for day in campaign_season():
-        for state in sorted(state_names, key=lambda x: state_names[x]):
-            polls = state_polls[state]
+    if settings != history_cache_settings():
+        return None
 
-            # Remember, the format of the tuple for each list:
-            # (margin, start date, end date, mid date, pop, polling org)
-            polls_ended_before_day = filter(lambda x: x[2] < day, polls)
+    return cache
 
-            #  reject two polls by the same pollster if their
-            # [startdate,enddate] intervals overlap (i.e. if older
-            # enddate>=newer startdate).
-            cleaned_polls = drop_overlapping_polls(polls_ended_before_day)
 
-            if len(cleaned_polls) == 0:
-                cleaned_polls = [ prev_outcome[state] ]
+def save_history_cache(filename, cache):
+    f = open(filename + ".new", "wb")
+    cPickle.dump((history_cache_settings(), cache), f, cPickle.HIGHEST_PROTOCOL)
+    f.close()
+    os.rename(filename + ".new", filename)
 
-            write_statistics(pfile, cleaned_polls)
-            pfile.write("%s\n" % int(day.strftime("%j")))
 
-    pfile.close()
+# Yields (day, window) for each of the days, which must be in chronological
+# order. The window holds the polls which ended before the day, less those
+# rejected by drop_overlapping_polls (see benchmark_history.py), in the order
+# that drop_overlapping_polls returns them. Only as much of the window as
+# select_working_subset will look at is yielded.
+#
+# Within each pollster's polls, sorted by start and end date, a poll is
+# rejected when the next poll overlaps it. So adding a poll can only change
+# whether it and the poll before it are rejected.
+
+def sweep_windows(polls, days):
+    by_end_date = sorted(xrange(len(polls)), key=lambda i: polls[i][2])
+    by_pollster = {}
+    window = []
+
+    # Polls with equal mid-dates are ordered as drop_overlapping_polls
+    # leaves them: by pollster, start date, end date, then original order
+    def window_key(i):
+        poll = polls[i]
+        return (-poll[3].toordinal(), poll[5], poll[1], poll[2], i)
+
+    n = 0
+    for day in days:
+        while n < len(by_end_date) and polls[by_end_date[n]][2] < day:
+            i = by_end_date[n]
+            poll = polls[i]
+            n += 1
+
+            group = by_pollster.setdefault(poll[5], [])
+            key = (poll[1], poll[2], i)
+            pos = bisect.bisect(group, key)
+            group.insert(pos, key)
+
+            if pos + 1 == len(group) or not (poll[2] > group[pos + 1][0]):
+                bisect.insort(window, window_key(i))
+
+            if pos > 0:
+                prev = group[pos - 1]
+                was_kept = pos + 1 == len(group) or \
+                           not (prev[1] > group[pos + 1][0])
+                is_kept = not (prev[1] > poll[1])
+
+                if was_kept and not is_kept:
+                    window.pop(bisect.bisect_left(window, window_key(prev[2])))
+                elif is_kept and not was_kept:
+                    bisect.insort(window, window_key(prev[2]))
+
+        # select_working_subset only looks at the polls with mid-dates on or
+        # after the earlier of the third newest mid-date and the week
+        # before the newest
+        num = len(window)
+        if num >= 3:
+            oldest = max(window[num_recent_polls_to_use - 1][0],
+                         window[0][0] + 7)
+            num = bisect.bisect_left(window, (oldest + 1,))
+
+        yield (day, map(lambda x: polls[x[-1]], window[:num]))
+
 
 ############################################################################
 #
@@ -305,44 +645,257 @@ def process_polls():
 ############################################################################
 
 
-def url_fetcher(page_num):
-    tries = 0
-    while True:
+# Fetches pages of the feed with a pool of worker threads. Pages are
+# requested with submit() and collected with get(), which returns the
+# pages in whatever order they are asked for, so the archive is always
+# written in page order however the requests complete.
+
+class PageFetcher:
+    def __init__(self, base_url, concurrency, rate):
+        url = urlparse.urlsplit(base_url)
+        self.scheme = url.scheme
+        self.host = url.netloc
+        self.path_prefix = base_url[len(url.scheme + "://" + url.netloc):]
+        if not self.path_prefix.startswith("/"):
+            self.path_prefix = "/" + self.path_prefix
+
+        if rate > 0:
+            self.interval = 1.0 / rate
+        else:
+            self.interval = 0.0
+        self.next_request = time.time()
+
+        self.tasks = Queue.Queue()
+        self.results = {}
+        self.lock = threading.Lock()
+        self.done = threading.Condition(self.lock)
+        self.closed = False
+
+        self.workers = []
+        for i in range(concurrency):
+            worker = threading.Thread(target=self.work)
+            worker.setDaemon(True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, page_num):
+        self.tasks.put(page_num)
+
+    def get(self, page_num):
+        self.done.acquire()
         try:
-            f = urllib2.urlopen(huffpo_base_url + str(page_num))
-            return f
-        except urllib2.URLError:
-            if tries < 3:
-                tries += 1
-                time.sleep(2)
-            else:
-                print "FAIL on page %d (tried three times)" % page_num
-                sys.stdout.flush()
-                raise
+            while page_num not in self.results:
+                self.done.wait(1)
+            (page, error) = self.results.pop(page_num)
+        finally:
+            self.done.release()
+
+        if error is not None:
+            raise error
+        return page
+
+    def close(self):
+        self.closed = True
+        for worker in self.workers:
+            self.tasks.put(None)
+        for worker in self.workers:
+            worker.join()
+
+    def work(self):
+        conn = None
+        while True:
+            page_num = self.tasks.get()
+            if page_num is None:
+                break
+            if self.closed:
+                continue
+
+            page = None
+            error = None
+            tries = 0
+            while True:
+                try:
+                    if conn is None:
+                        conn = self.connect()
+                    page = self.fetch(conn, page_num)
+                    break
+                except (httplib.HTTPException, socket.error, IOError,
+                        zlib.error), e:
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                    if tries < fetch_retries and not self.closed:
+                        tries += 1
+                        # exponential backoff, with jitter so that the
+                        # workers do not retry in lockstep
+                        time.sleep(2 ** tries * random.uniform(0.5, 1.5))
+                    else:
+                        if not self.closed:
+                            print "FAIL on page %d (tried %d times)" % \
+                                    (page_num, tries + 1)
+                            sys.stdout.flush()
+                        error = e
+                        break
+                except Exception, e:
+                    # Anything else is not worth retrying, but is still
+                    # handed to get(), rather than killing the worker and
+                    # leaving get() waiting for the page forever
+                    if conn is not None:
+                        conn.close()
+                        conn = None
+                    if not self.closed:
+                        print "FAIL on page %d (%s)" % (page_num, e)
+                        sys.stdout.flush()
+                    error = e
+                    break
+
+            self.done.acquire()
+            self.results[page_num] = (page, error)
+            self.done.notifyAll()
+            self.done.release()
+
+        if conn is not None:
+            conn.close()
+
+    def connect(self):
+        if self.scheme == "https":
+            return httplib.HTTPSConnection(self.host,
+                                           timeout=socket.getdefaulttimeout())
+        return httplib.HTTPConnection(self.host,
+                                      timeout=socket.getdefaulttimeout())
+
+    # Waits for this worker's turn under the politeness rate
+    def throttle(self):
+        self.lock.acquire()
+        now = time.time()
+        start = max(now, self.next_request)
+        self.next_request = start + self.interval
+        self.lock.release()
+
+        if start > now:
+            time.sleep(start - now)
+
+    def fetch(self, conn, page_num):
+        self.throttle()
+        conn.request("GET", self.path_prefix + str(page_num),
+                     headers={"Accept-Encoding": "gzip",
+                              "Connection": "keep-alive"})
+        response = conn.getresponse()
+        data = response.read()
+
+        if response.status != 200:
+            raise IOError("HTTP status %d for page %d" %
+                          (response.status, page_num))
+
+        if response.getheader("Content-Encoding", "") == "gzip":
+            data = zlib.decompress(data, 16 + zlib.MAX_WBITS)
+
+        # The server may close the connection after this response
+        if response.will_close:
+            conn.close()
+
+        return StringIO.StringIO(data)
 
 
 def fetch_latest_polls():
     global max_filenum
     stop = False
     page_num = 0
+    pages_without_new_polls = 0
+
+    mark = read_high_water_mark()
+    if mark is not None:
+        print "Previous high-water mark: poll %d, page %d" % mark
+
+    # Keep fetch_concurrency pages in flight ahead of the page being parsed.
+    # A few pages past the end of the feed may be fetched and then ignored.
+    fetcher = PageFetcher(huffpo_base_url, fetch_concurrency, fetch_rate)
+    for next_page in range(1, fetch_concurrency + 1):
+        fetcher.submit(next_page)
 
     while (not stop):
         page_num += 1
         print "Fetching page: " + str(page_num)
-        page = url_fetcher(page_num)
+        try:
+            page = fetcher.get(page_num)
+        except:
+            fetcher.close()
+            raise
 
-        (xmldoc, stop) = parse_pollfile(page)
-        xmldoc.childNodes[0].normalize()
+        next_page += 1
+        fetcher.submit(next_page)
 
-        if len(xmldoc.childNodes[0].childNodes) > 1:
+        below_mark = False
+        if incremental_stop_pages > 0 and mark is not None:
+            ids = page_poll_ids(page)
+            below_mark = len(ids) > 0 and max(ids) <= mark[0]
+
+        (num_polls, stop) = parse_new_page(page, str(max_filenum + 1) + ".xml")
+
+        if num_polls > 0:
             max_filenum += 1
-            f = open(archive_dir + str(max_filenum) + ".xml", 'w')
-            xmldoc.writexml(f)
-            f.close()
-            print "Wrote %d polls to %s" % (0.5 * (len(xmldoc.childNodes[0].childNodes) - 1), str(max_filenum))
+            print "Wrote %d polls to %s" % (num_polls, str(max_filenum))
+            pages_without_new_polls = 0
+        elif not stop:
+            pages_without_new_polls += 1
+
+        if below_mark and not stop:
+            print "Reached the high-water mark, stopping"
+            stop = True
+
+        if incremental_stop_pages > 0 and \
+                pages_without_new_polls >= incremental_stop_pages:
+            print "No new polls on the last %d pages, stopping" % \
+                    pages_without_new_polls
+            stop = True
+
+    fetcher.close()
+    write_high_water_mark(page_num)
+
+
+# Returns the ids of the polls on a page of the feed, leaving the page to
+# be parsed again from the start
+
+def page_poll_ids(page):
+    ids = []
+    depth = 0
+    for (event, elem) in iterparse(page, events=("start", "end")):
+        if event == "start":
+            depth += 1
+            continue
+
+        depth -= 1
+        if depth == 2 and elem.tag == "id":
+            ids.append(int(elem.text))
+        elif depth == 1:
+            elem.clear()
+
+    page.seek(0)
+    return ids
+
+
+# The high-water mark file holds one line: the largest archived poll id
+# and the last page fetched by the most recent crawl. A mark above every
+# archived poll id, as after archive/ has been removed, is not used.
 
-        if not stop:
-            time.sleep(1)
+def read_high_water_mark():
+    if not os.path.exists(crawl_state_filename):
+        return None
+
+    f = open(crawl_state_filename)
+    mark = tuple(map(int, f.readline().split()))
+    f.close()
+
+    if len(mark) != 2 or mark[0] > max(archived_ids or [0]):
+        return None
+    return mark
+
+
+def write_high_water_mark(page_num):
+    f = open(crawl_state_filename + ".new", "w")
+    f.write("%d %d\n" % (max(archived_ids or [0]), page_num))
+    f.close()
+    os.rename(crawl_state_filename + ".new", crawl_state_filename)
 
 
 ############################################################################
@@ -354,13 +907,37 @@ def fetch_latest_polls():
 ############################################################################
 
 
-def parse_pollfile(filename):
-    (xmldoc, stop) = unique_polls(filename)
+# Parses one page of the feed, adding its new polls to state_polls. If
+# archive_filename is given, the new polls are also written there (the file
+# is only created if there is at least one new poll). Returns the number of
+# new polls and whether the page was past the end of the feed.
+
+def parse_pollfile(filename, archive_filename=None):
+    if xml_parser == "stream":
+        return stream_pollfile(filename, archive_filename)
+
+    if archive_filename is not None:
+        (xmldoc, stop) = unique_polls(filename, archived_ids)
+    else:
+        (xmldoc, stop) = unique_polls(filename)
     process_pollfile(xmldoc)
-    return (xmldoc, stop)
 
+    polls = xmldoc.childNodes[0]
+    polls.normalize()
+    num_polls = len(filter(lambda x: x.nodeType == x.ELEMENT_NODE,
+                           polls.childNodes))
+
+    if archive_filename is not None and num_polls > 0:
+        f = open(archive_filename, 'w')
+        xmldoc.writexml(f)
+        f.close()
+        add_to_poll_index(map(lambda x: int(x.childNodes[0].nodeValue),
+                              xmldoc.getElementsByTagName("id")))
+
+    return (num_polls, stop)
 
-def unique_polls(filename):
+
+def unique_polls(filename, known_ids=()):
     xmldoc = xml.dom.minidom.parse(filename)
     
     pi_nodes = xmldoc.getElementsByTagName("id")
@@ -371,12 +948,12 @@ def unique_polls(filename):
     for pi_node in pi_nodes:
         poll_id = int(pi_node.childNodes[0].nodeValue)
 
-        if poll_id in poll_ids:
+        if poll_id in poll_ids or poll_id in known_ids:
             poll_node = pi_node.parentNode
             polls = poll_node.parentNode
             polls.removeChild(poll_node)
         else:
-            poll_ids.append(poll_id)
+            poll_ids.add(poll_id)
     
     return (xmldoc, False)
 
@@ -407,30 +984,45 @@ def subpop_parse(subpop):
     return (vtype, pop, values)
 
 
-def process_subpop(poll_org, method, state, start_date, end_date, subpop):
-    global state_file, national_file
-
+def process_subpop(poll_id, poll_org, method, state, start_date, end_date,
+                   subpop):
     (vtype, pop, values) = subpop_parse(subpop)
+    record_subpop(poll_id, poll_org, method, state, start_date, end_date,
+                  vtype, pop, values)
+
 
+def record_subpop(poll_id, poll_org, method, state, start_date, end_date,
+                  vtype, pop, values):
     mid_date = start_date + ((end_date - start_date) / 2)
     margin = int(values["Obama"]) - int(values["Romney"]) 
-    f = None
 
-    if state != "US":
-        state_polls[state].append((margin, start_date, end_date,
-                                   mid_date, pop, poll_org))
-        f = state_file
-    else:
-        f = national_file
+    poll = (margin, start_date, end_date, mid_date, pop, poll_org)
 
     d = (start_date.month, start_date.day,start_date.year,
          end_date.month, end_date.day, end_date.year,
          mid_date.month, mid_date.day, mid_date.year)
-    f.write("%s,\"%s\",%d,\"%s\",\"%s\"," % (state, poll_org, pop, vtype, method))
-    f.write("%d,%d,%d,%d,%d,%d," % d[:6])
-    f.write("%s,%s,%s,%s," % (values["Romney"], values["Obama"],
-        values["Other"], values["Undecided"]))
-    f.write("%s/%s/%s,%s/%s/%s,%s/%s/%s\n" % d)
+    row = "%s,\"%s\",%d,\"%s\",\"%s\"," % (state, poll_org, pop, vtype, method)
+    row += "%d,%d,%d,%d,%d,%d," % d[:6]
+    row += "%s,%s,%s,%s," % (values["Romney"], values["Obama"],
+        values["Other"], values["Undecided"])
+    row += "%s/%s/%s,%s/%s/%s,%s/%s/%s\n" % d
+
+    if store_records is not None:
+        store_records.append((state, poll, poll_id, row))
+    else:
+        apply_record(state, poll, row)
+
+
+# Adds one poll to state_polls, and its row to the analysis CSV files
+
+def apply_record(state, poll, row):
+    global state_file, national_file
+
+    if state != "US":
+        state_polls[state].append(poll)
+        state_file.write(row)
+    else:
+        national_file.write(row)
 
 
 def process_pollfile(xmldoc):
@@ -443,6 +1035,7 @@ def process_pollfile(xmldoc):
 
     for q in questions:
         poll = q.parentNode.parentNode
+        poll_id = int(get_opt_subelem(poll, "id", "0"))
         poll_org = poll.getElementsByTagName("pollster")[0].childNodes[0].nodeValue
         method = get_opt_subelem(poll, "method", "")
         state = q.getElementsByTagName("state")[0].childNodes[0].nodeValue
@@ -455,10 +1048,444 @@ def process_pollfile(xmldoc):
             for subpop in subpops:
                 vtype = get_opt_subelem(subpop, "name", "")
                 if vtype == "Likely Voter":
-                    process_subpop(poll_org, method, state, start_date, end_date, subpop)
+                    process_subpop(poll_id, poll_org, method, state,
+                                   start_date, end_date, subpop)
         else:
             for subpop in subpops:
-                process_subpop(poll_org, method, state, start_date, end_date, subpop)
+                process_subpop(poll_id, poll_org, method, state,
+                               start_date, end_date, subpop)
+
+
+############################################################################
+#
+# Streaming versions of the functions above. Rather than building the DOM
+# tree for a whole page and searching it with getElementsByTagName, the page
+# is read in a single pass with iterparse. Each poll is handled as soon as
+# its closing tag is seen and then discarded, so memory use does not grow
+# with the size of the page. The resulting state_polls tuples and analysis
+# CSV rows are the same as those produced by the minidom functions.
+#
+# A poll's id is checked as soon as it has been read, so the rest of a
+# duplicate poll is skipped without being parsed.
+#
+############################################################################
+
+
+def stream_pollfile(filename, archive_filename=None):
+    # Polls from the feed are also checked against the archive index
+    if archive_filename is not None:
+        known_ids = archived_ids
+    else:
+        known_ids = ()
+
+    root = None
+    depth = 0
+    num_ids = 0
+    num_polls = 0
+    kept_polls = []
+    kept_ids = []
+    skip_poll = False
+
+    for (event, elem) in iterparse(filename, events=("start", "end")):
+        if event == "start":
+            if root is None:
+                root = elem
+            depth += 1
+            continue
+
+        depth -= 1
+        if elem.tag == "id":
+            num_ids += 1
+
+            # The id of a poll, rather than of something within it
+            if depth == 2:
+                poll_id = int(elem.text)
+                if poll_id in poll_ids or poll_id in known_ids:
+                    skip_poll = True
+                else:
+                    poll_ids.add(poll_id)
+                    kept_ids.append(poll_id)
+
+        # Only the direct children of the root element are polls
+        if depth != 1:
+            continue
+
+        if skip_poll:
+            skip_poll = False
+            elem.clear()
+            continue
+
+        stream_process_poll(elem)
+        num_polls += 1
+
+        if archive_filename is not None:
+            kept_polls.append(tostring(elem))
+        elem.clear()
+
+    if root is not None:
+        root.clear()
+
+    if archive_filename is not None and num_polls > 0:
+        f = open(archive_filename, 'w')
+        f.write('<?xml version="1.0" ?><%s>' % root.tag)
+        f.write("".join(kept_polls))
+        f.write('</%s>' % root.tag)
+        f.close()
+        add_to_poll_index(kept_ids)
+
+    return (num_polls, num_ids == 0)
+
+
+def stream_opt_subelem(elem, name, default):
+    tmp = elem.find(".//" + name)
+    if tmp is not None and tmp.text is not None:
+        return tmp.text
+    return default
+
+
+def stream_subpop_parse(subpop):
+    values = {"Obama":"", "Romney":"", "Other":"", "Undecided":""}
+
+    vtype = stream_opt_subelem(subpop, "name", "")
+    pop = int(stream_opt_subelem(subpop, "observations", "0"))
+
+    for r in subpop.findall(".//response"):
+        candidate = r.find(".//choice").text
+        value = r.find(".//value").text
+        values[candidate] = value
+
+    assert(values["Obama"] != "")
+    assert(values["Romney"] != "")
+
+    return (vtype, pop, values)
+
+
+def stream_process_poll(poll):
+    questions = []
+    for q in poll.iter():
+        for topic in q.findall("topic"):
+            if topic.text == "2012-president":
+                questions.append(q)
+
+    for q in questions:
+        poll_id = int(stream_opt_subelem(poll, "id", "0"))
+        poll_org = poll.find(".//pollster").text
+        method = stream_opt_subelem(poll, "method", "")
+        state = q.find(".//state").text
+        start_date = strpdate(poll.find(".//start_date").text)
+        end_date = strpdate(poll.find(".//end_date").text)
+
+        subpops = q.findall(".//subpopulation")
+
+        if len(subpops) >= 2:
+            for subpop in subpops:
+                vtype = stream_opt_subelem(subpop, "name", "")
+                if vtype == "Likely Voter":
+                    (vtype, pop, values) = stream_subpop_parse(subpop)
+                    record_subpop(poll_id, poll_org, method, state,
+                                  start_date, end_date, vtype, pop, values)
+        else:
+            for subpop in subpops:
+                (vtype, pop, values) = stream_subpop_parse(subpop)
+                record_subpop(poll_id, poll_org, method, state,
+                              start_date, end_date, vtype, pop, values)
+
+
+# Parses the whole archive with each parser in turn, reporting the time
+# taken and whether the two parsers produced the same state_polls tuples
+# and analysis CSV rows.
+
+def benchmark_parsers():
+    global xml_parser, state_file, national_file
+
+    filenames = map(lambda x: archive_dir + x, os.listdir(archive_dir))
+    results = {}
+
+    for parser in ("minidom", "stream"):
+        xml_parser = parser
+        poll_ids.clear()
+        for state in state_names:
+            state_polls[state] = []
+        state_file = StringIO.StringIO()
+        national_file = StringIO.StringIO()
+
+        start = time.time()
+        for fname in filenames:
+            parse_pollfile(fname)
+        elapsed = time.time() - start
+
+        results[parser] = (dict(state_polls), state_file.getvalue(),
+                           national_file.getvalue())
+        print "%-8s %8.3fs for %d archive files" % (parser, elapsed,
+                                                    len(filenames))
+
+    if results["minidom"] == results["stream"]:
+        print "Both parsers produced identical output"
+    else:
+        print "MISMATCH between minidom and stream parser output"
+
+
+############################################################################
+#
+# Functions to maintain the compiled poll store
+#
+############################################################################
+
+# Loads the polls in archive/ into state_polls and the analysis CSV files.
+# Archive files whose records in the store are still valid are taken from
+# the store; the rest are parsed and the store is updated.
+
+def load_archive(rebuild_store=False):
+    global max_filenum, poll_store
+
+    fnames = sorted(os.listdir(archive_dir),
+                    key=lambda x: int(x.split(".")[0]))
+    for fname in fnames:
+        max_filenum = max(max_filenum, int(fname.split(".")[0]))
+
+    if not use_poll_store:
+        for fname in fnames:
+            parse_pollfile(archive_dir + fname)
+        return
+
+    store = None
+    if not rebuild_store:
+        store = pollstore.load_store(poll_store_dir)
+
+    poll_store = {"segments": [], "pollsters": [], "states": [],
+                  "changed": store is None}
+    stored_files = {}
+
+    if store is not None:
+        poll_store["pollsters"] = store["pollsters"]
+        poll_store["states"] = store["states"]
+        offset = 0
+        for (fname, sig, count) in store["manifest"]:
+            stored_files[fname] = (sig, offset, count)
+            offset += count
+
+    poll_store["pollster_ids"] = dict(map(lambda x: (x[1], x[0]),
+                                          enumerate(poll_store["pollsters"])))
+    poll_store["state_ids"] = dict(map(lambda x: (x[1], x[0]),
+                                       enumerate(poll_store["states"])))
+
+    segments = poll_store["segments"]
+    stale_files = []
+
+    for fname in fnames:
+        if fname in stored_files:
+            (sig, offset, count) = stored_files.pop(fname)
+            current = pollstore.file_signature(archive_dir + fname, sig)
+
+            if pollstore.signature_matches(sig, current):
+                if current != sig:
+                    poll_store["changed"] = True
+                columns = {}
+                for name in pollstore.columns:
+                    columns[name] = store[name][offset:offset + count]
+                segments.append({"fname": fname, "sig": current,
+                                  "columns": columns,
+                                  "rows": store["rows"][offset:offset + count]})
+                continue
+
+        stale_files.append((len(segments), fname))
+        segments.append(None)
+
+    # Archive files which have been removed
+    if len(stored_files) > 0:
+        poll_store["changed"] = True
+
+    # Stale files are deduplicated against the polls in the valid files
+    for segment in segments:
+        if segment is not None:
+            poll_ids.update(segment["columns"]["poll_id"].tolist())
+
+    for (i, fname) in stale_files:
+        sig = pollstore.file_signature(archive_dir + fname)
+        (records, num_polls, stop) = parse_to_records(archive_dir + fname)
+        segments[i] = records_to_segment(fname, sig, records)
+        poll_store["changed"] = True
+
+    for segment in segments:
+        apply_segment(segment)
+
+
+# Parses a page of the feed, collecting its polls as records for the store
+
+def parse_to_records(filename, archive_filename=None):
+    global store_records
+
+    store_records = []
+    try:
+        (num_polls, stop) = parse_pollfile(filename, archive_filename)
+        records = store_records
+    finally:
+        store_records = None
+
+    return (records, num_polls, stop)
+
+
+# Parses a page fetched from the feed, saving its new polls as the archive
+# file fname and adding them to the store
+
+def parse_new_page(page, fname):
+    if poll_store is None:
+        return parse_pollfile(page, archive_dir + fname)
+
+    (records, num_polls, stop) = parse_to_records(page, archive_dir + fname)
+
+    if num_polls > 0:
+        sig = pollstore.file_signature(archive_dir + fname)
+        segment = records_to_segment(fname, sig, records)
+        poll_store["segments"].append(segment)
+        poll_store["changed"] = True
+        apply_segment(segment)
+
+    return (num_polls, stop)
+
+
+def records_to_segment(fname, sig, records):
+    columns = {}
+    for name in pollstore.columns:
+        columns[name] = []
+    rows = []
+
+    for (state, poll, poll_id, row) in records:
+        (margin, start_date, end_date, mid_date, pop, poll_org) = poll
+        columns["margin"].append(margin)
+        columns["start"].append(start_date.toordinal())
+        columns["end"].append(end_date.toordinal())
+        columns["mid"].append(mid_date.toordinal())
+        columns["pop"].append(pop)
+        columns["pollster"].append(store_string_id("pollster", poll_org))
+        columns["state"].append(store_string_id("state", state))
+        columns["poll_id"].append(poll_id)
+
+        if isinstance(row, unicode):
+            row = row.encode("utf-8")
+        rows.append(row)
+
+    for name in pollstore.columns:
+        columns[name] = array(columns[name], dtype=int32)
+
+    return {"fname": fname, "sig": sig, "columns": columns, "rows": rows}
+
+
+def store_string_id(table, value):
+    ids = poll_store[table + "_ids"]
+    if value not in ids:
+        ids[value] = len(poll_store[table + "s"])
+        poll_store[table + "s"].append(value)
+    return ids[value]
+
+
+# Adds the records of one segment of the store to state_polls and the
+# analysis CSV files
+
+def apply_segment(segment):
+    columns = {}
+    for name in pollstore.columns:
+        columns[name] = segment["columns"][name].tolist()
+
+    pollsters = poll_store["pollsters"]
+    states = poll_store["states"]
+    fromordinal = datetime.date.fromordinal
+
+    for i in xrange(len(segment["rows"])):
+        poll = (columns["margin"][i], fromordinal(columns["start"][i]),
+                fromordinal(columns["end"][i]), fromordinal(columns["mid"][i]),
+                columns["pop"][i], pollsters[columns["pollster"][i]])
+        apply_record(states[columns["state"][i]], poll, segment["rows"][i])
+
+    poll_ids.update(columns["poll_id"])
+
+
+def save_poll_store():
+    segments = poll_store["segments"]
+
+    data = {"pollsters": poll_store["pollsters"],
+            "states": poll_store["states"],
+            "rows": [],
+            "manifest": []}
+
+    for name in pollstore.columns:
+        data[name] = concatenate([array([], dtype=int32)] +
+                                 map(lambda x: x["columns"][name], segments))
+
+    for segment in segments:
+        data["rows"].extend(segment["rows"])
+        data["manifest"].append((segment["fname"], segment["sig"],
+                                 len(segment["rows"])))
+
+    pollstore.save_store(poll_store_dir, data)
+
+
+############################################################################
+#
+# Functions to maintain the index of archived poll ids
+#
+############################################################################
+
+# Loads the index from disk. The index is rebuilt from archive/ if it is
+# missing, if any archive file is newer than it, or if asked to.
+
+def load_poll_index(rebuild=False):
+    global archived_ids
+
+    if rebuild or not poll_index_is_current():
+        archived_ids = scan_archive_ids()
+        f = open(poll_index_filename, "w")
+        for poll_id in sorted(archived_ids):
+            f.write("%d\n" % poll_id)
+        f.close()
+        return
+
+    f = open(poll_index_filename)
+    archived_ids = set(map(int, f))
+    f.close()
+
+
+def poll_index_is_current():
+    if not os.path.exists(poll_index_filename):
+        return False
+
+    index_mtime = os.path.getmtime(poll_index_filename)
+    for fname in os.listdir(archive_dir):
+        if os.path.getmtime(archive_dir + fname) > index_mtime:
+            return False
+
+    return True
+
+
+def scan_archive_ids():
+    ids = set()
+
+    for fname in os.listdir(archive_dir):
+        depth = 0
+        for (event, elem) in iterparse(archive_dir + fname,
+                                       events=("start", "end")):
+            if event == "start":
+                depth += 1
+                continue
+
+            depth -= 1
+            if depth == 2 and elem.tag == "id":
+                ids.add(int(elem.text))
+            elif depth == 1:
+                elem.clear()
+
+    return ids
+
+
+# Records the ids of polls which have just been written to the archive
+
+def add_to_poll_index(ids):
+    archived_ids.update(ids)
+
+    f = open(poll_index_filename, "a")
+    for poll_id in ids:
+        f.write("%d\n" % poll_id)
+    f.close()
 
 
 ############################################################################
@@ -0,0 +1,253 @@
+#!/usr/bin/env python
+
+############################################################################
+#
+# This script is a NumPy port of EV_jerseyvotes.m. It calculates the power
+# of a voter in each state to influence the outcome of the election: the
+# change in the probability of a Republican win when the state's margin
+# moves 0.1 points towards the Republican, per thousand voters in the
+# state, normalized so that the most powerful state is 100. It writes
+# jerseyvotes.csv, which jerseyvotes.py displays, with one line for each
+# state, most powerful first:
+#
+#    index, state abbreviation, voter power
+#
+# As in EV_jerseyvotes.m, the margins are first shifted by the meta-margin,
+# so that the power is measured at a tied election.
+#
+# EV_jerseyvotes.m re-runs the whole 51-state convolution for each state.
+# Instead, the products of the states' EV polynomials before and after each
+# state are built once. Moving one state's margin only changes its own
+# polynomial, so the probability of a Republican win after the move
+# follows from the other 50 states' distribution, which is the product of
+# the two, and only two of its tail probabilities are needed. Each is a
+# single dot product of the two partial products.
+#
+# Author: Andrew Ferguson <adferguson@alumni.princeton.edu>
+#
+# Script written for election.princeton.edu run by Samuel S.-H. Wang under
+# noncommercial-use-only license:
+# You may use or modify this software, but only for noncommericial purposes.
+# To seek a commercial-use license, contact sswang@princeton.edu
+#
+############################################################################
+
+import time, optparse
+from numpy import *
+import ev_estimator
+from ev_estimator import state_abbrevs, state_evs, num_states, total_evs
+
+############################################################################
+#
+# Global configuration and variables
+#
+############################################################################
+
+# Actual number of voters in the previous election, in state order
+# data from: http://presidentelect.org/e2008.html
+voters = array([2099819, 326197, 2293475, 1086617, 13464495, 2401361, 1646783,
+    265853, 412412, 8390744, 3921693, 453568, 655032, 5513635, 2751054,
+    1530386, 1235801, 1826620, 1960761, 731163, 2622549, 3080985, 5001766,
+    2900873, 1289865, 2925205, 490109, 798444, 961581, 707611, 3868237,
+    830158, 7590551, 4296847, 316621, 5697927, 1462661, 1814251, 5992384,
+    471766, 1920969, 381975, 2599749, 8077795, 942678, 325046, 3716905,
+    3036878, 713451, 2976356, 253137])
+
+# How far each state's margin is moved towards the Republican
+margin_step = 0.1
+
+# The power of NJ voters is not rounded
+nj_index = state_abbrevs.index("NJ")
+
+jerseyvotes_filename = "jerseyvotes.csv"
+
+############################################################################
+#
+# Main
+#
+############################################################################
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("--polls", metavar="FILE",
+                      default=ev_estimator.polls_filename,
+                      help="summary statistics to read, either text or a "
+                      "pollsfile.py binary file (default: %default)")
+    parser.add_option("--analysisdate", type="int", metavar="DAY", default=0,
+                      help="day of the year to analyze (default: the newest)")
+    parser.add_option("--benchmark", action="store_true", default=False,
+                      help="time against re-running the convolution for "
+                      "each state, and check that they agree")
+    (options, args) = parser.parse_args()
+
+    polldata = ev_estimator.load_polldata(options.polls, options.analysisdate)
+    (margins, sems) = ev_estimator.polldata_margins(polldata)
+    estimate = ev_estimator.run_estimator(polldata)
+
+    # Measure at a tied election
+    bias = -estimate["metamargin"]
+
+    if options.benchmark:
+        benchmark_differences(margins, sems, bias)
+        return
+
+    write_jerseyvotes(jerseyvotes(gop_win_differences(margins, sems, bias)))
+
+
+############################################################################
+#
+# The calculation
+#
+############################################################################
+
+# Returns, for each state, the change in the probability of a Republican
+# win when the state's margin is moved margin_step towards the Republican,
+# times 10000. A Republican win is the Democrat getting from 1 to 269 EV,
+# as the cumulative probability in EV_jerseyvotes.m counts it.
+
+def gop_win_differences(margins, sems, bias=0.0):
+    probs = ev_estimator.win_probabilities(margins, sems, bias)
+    moved = ev_estimator.win_probabilities(margins - margin_step, sems, bias)
+
+    # prefixes[i] is the distribution of the Republican EV of the states
+    # before state i, and suffixes[i] the cumulative distribution of the
+    # states from state i on, with a leading zero
+    prefixes = [array([1.0])]
+    for i in xrange(num_states):
+        prefixes.append(multiply_state(prefixes[-1], probs[i], state_evs[i]))
+
+    suffix = array([1.0])
+    suffixes = [None] * (num_states + 1)
+    suffixes[num_states] = cumulative(suffix)
+    for i in xrange(num_states - 1, -1, -1):
+        suffix = multiply_state(suffix, probs[i], state_evs[i])
+        suffixes[i] = cumulative(suffix)
+
+    # The Democrat gets 1 to 269 EV when the Republican gets 269 to 537
+    lowest = total_evs - 269
+    highest = total_evs - 1
+    midpoint = window_probability(prefixes[num_states], suffixes[num_states],
+                                  lowest, highest)
+
+    differences = zeros(num_states)
+    for i in xrange(num_states):
+        ev = state_evs[i]
+
+        # The probability that the other 50 states leave the Republican
+        # needing 0 or ev EV from state i
+        without = window_probability(prefixes[i], suffixes[i + 1],
+                                     lowest, highest)
+        with_state = window_probability(prefixes[i], suffixes[i + 1],
+                                        lowest - ev, highest - ev)
+
+        win = moved[i] * without + (1 - moved[i]) * with_state
+        differences[i] = (win - midpoint) * 10000
+
+    return differences
+
+
+# Multiplies a distribution of Republican EV by a state's polynomial
+
+def multiply_state(dist, prob, ev):
+    result = zeros(len(dist) + ev)
+    result[:len(dist)] = prob * dist
+    result[ev:] += (1 - prob) * dist
+    return result
+
+
+def cumulative(dist):
+    return concatenate(([0.0], cumsum(dist)))
+
+
+# Returns the probability that the sum of two independent EV counts, with
+# distribution dist and cumulative distribution cum (with a leading zero),
+# is from low to high
+
+def window_probability(dist, cum, low, high):
+    size = len(cum) - 1
+    evs = arange(len(dist))
+    upper = cum[clip(high - evs + 1, 0, size)]
+    lower = cum[clip(low - evs, 0, size)]
+    return dot(dist, upper - lower)
+
+
+# EV_jerseyvotes.m's calculation, which re-runs the whole convolution for
+# each state. Kept as a reference for gop_win_differences.
+
+def gop_win_differences_by_recompute(margins, sems, bias=0.0):
+    def gop_win(margins):
+        result = ev_estimator.ev_medians(margins[newaxis], sems[newaxis],
+                                         [bias])
+        return result["probability_GOP_win"][0]
+
+    midpoint = gop_win(margins)
+    differences = zeros(num_states)
+    for i in xrange(num_states):
+        moved = margins.copy()
+        moved[i] = moved[i] - margin_step
+        differences[i] = (gop_win(moved) - midpoint) * 10000
+
+    return differences
+
+
+# Returns the voter power in each state, per thousand voters, normalized so
+# that the most powerful state is 100, and rounded to the nearest tenth
+# except in NJ
+
+def jerseyvotes(differences):
+    kvoters = ev_estimator.matlab_round(voters / 1000.0)
+    power = differences / kvoters
+    power = 100 * power / power.max()
+
+    for i in xrange(num_states):
+        if i != nj_index:
+            power[i] = 0.1 * ev_estimator.matlab_round(power[i] / 0.1)
+
+    return power
+
+
+def benchmark_differences(margins, sems, bias):
+    start = time.time()
+    by_recompute = gop_win_differences_by_recompute(margins, sems, bias)
+    recompute_time = time.time() - start
+
+    start = time.time()
+    differences = gop_win_differences(margins, sems, bias)
+    products_time = time.time() - start
+
+    print "recompute   %.4fs" % recompute_time
+    print "products    %.4fs" % products_time
+    print "largest difference %g" % abs(differences - by_recompute).max()
+
+    # The voter power as it is written to jerseyvotes.csv
+    formatted = map(ev_estimator.num2str, jerseyvotes(differences))
+    formatted_by_recompute = map(ev_estimator.num2str,
+                                 jerseyvotes(by_recompute))
+
+    if formatted == formatted_by_recompute:
+        print "Both produced identical voter power"
+    else:
+        print "MISMATCH between the voter power of the two methods"
+
+
+############################################################################
+#
+# Output
+#
+############################################################################
+
+# Writes one line for each state, most powerful first. Ties are listed in
+# the reverse of state order, as EV_jerseyvotes.m lists them.
+
+def write_jerseyvotes(power):
+    order = argsort(power, kind="mergesort")
+
+    f = open(jerseyvotes_filename, "w")
+    for i in order[::-1]:
+        f.write("%d,%s,%s\n" % (i + 1, state_abbrevs[i],
+                                ev_estimator.num2str(power[i])))
+    f.close()
+
+
+if __name__ == '__main__':
+    main()
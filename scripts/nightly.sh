@@ -4,7 +4,7 @@
 #
 # This script is run at 12:01am each morning by the Unix cron daemon to
 # update the site. It first uses the Python update_polls.py script to
-# prepare the summary statistics which are used by the MATLAB scripts it
+# prepare the summary statistics which are used by the estimators it
 # calls next. Then, it updates the automatically generated text and graphics
 # which display the calculations using additional Python scripts.
 #
@@ -18,24 +18,27 @@
 ############################################################################
 
 cd ~/python/
-./update_polls.py
+./update_polls.py --incremental 3
 
 cd ..
 mv -f python/polls.median.txt matlab/polls.median.txt
 
 cd matlab
 tail -2 EV_estimate_history.csv
-/raid/software/matlab-7.1/bin/matlab -nodisplay -nojvm -r EV_runner 2>&1 > /dev/null
+# The steps of EV_runner.m, with the NumPy ports of its MATLAB scripts:
+# EV_estimator, EV_jerseyvotes, EV_prediction and senate_est
+../python/ev_estimator.py
+../python/voter_power.py
+../python/ev_prediction.py
+../python/senate.py --archive ../python/archive/
 tail -2 EV_estimate_history.csv
 ls -l EV_estimate_history.csv
 
 cd ../python
 ./current_ev.py
-./histogram.py
-./history_plot.py
+./render.py
 ./jerseyvotes.py
 ./ev_map.py
-./metamargin_history_plot.py
 #./sen_current.py     # Added Nov. 2, 2008
 #./sen_histogram.py   # Added Nov. 2, 2008
 
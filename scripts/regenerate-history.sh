@@ -13,33 +13,13 @@
 #
 ############################################################################
 
-HISTORY=EV_estimate_history.csv
-
-cd ~/matlab
-rm $HISTORY
-touch $HISTORY
-
 cd ~/python/
 ./update_polls.py
 
 cd ..
-mv -f python/polls.median.txt bin/polls.median.txt
-cd bin
-
-last_day=$((`wc -l polls.median.txt | cut -d\  -f 1` / 51))
-day=1
-
-while [ $day -le $last_day ]; do
-    amount=$((day*51))
-    echo "Day: $day, Amount: $amount"
-
-	tail -$amount polls.median.txt > ~/matlab/polls.median.txt
-
-	cd ~/matlab/
-	/raid/software/matlab-7.1/bin/matlab -nodisplay -nojvm -r EV_runner 2>&1 > /dev/null
-    cd ~/bin/
-
-	day=$((day+1))
-done
+mv -f python/polls.median.txt matlab/polls.median.txt
 
-rm polls.median.txt
+# Every day's EV estimates and meta-margin are computed together, and
+# EV_estimate_history.csv is rewritten in one go
+cd matlab
+../python/ev_estimator.py --history